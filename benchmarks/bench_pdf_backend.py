@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""对比PDF处理方式的耗时
+
+旧方式：PyPDF2解析全部页面提取文本，文本少于50字时再用PyMuPDF重新打开并渲染所有页面。
+新方式：PyMuPDF只打开一次文档，逐页判断是否有可用文本层，只渲染没有文本层的页面。
+
+默认只测量解析和渲染的耗时（不包含OCR，两种方式的OCR调用次数由需要渲染的页数决定）。
+不指定PDF文件时，会在临时目录中生成一个纯文本PDF和一个扫描件PDF。
+
+用法:
+    python benchmarks/bench_pdf_backend.py [PDF文件或目录 ...] [--repeat 3]
+"""
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from id_card_extractor import PAGE_TEXT_MIN_CHARS, has_text_layer
+
+def legacy_pass(pdf_path):
+    """旧方式，返回渲染的页数"""
+    import PyPDF2
+
+    text = ""
+    with open(pdf_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for page in reader.pages:
+            text += page.extract_text() or ""
+
+    rendered = 0
+    if len(text.strip()) < PAGE_TEXT_MIN_CHARS:
+        doc = fitz.open(pdf_path)
+        for page in doc:
+            pix = page.get_pixmap()
+            Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            rendered += 1
+        doc.close()
+    return rendered
+
+def single_parse_pass(pdf_path):
+    """新方式，返回渲染的页数"""
+    rendered = 0
+    doc = fitz.open(pdf_path)
+    for page in doc:
+        if not has_text_layer(page.get_text()):
+            pix = page.get_pixmap()
+            Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            rendered += 1
+    doc.close()
+    return rendered
+
+def make_sample_pdfs(directory, pages=30):
+    """生成纯文本PDF和扫描件PDF各一个"""
+    text_pdf = directory / 'text_only.pdf'
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 50 + line * 18), f"Page {page_num + 1} line {line + 1}: sample text layer content")
+    doc.save(text_pdf)
+    doc.close()
+
+    scanned_pdf = directory / 'scanned.pdf'
+    doc = fitz.open()
+    for page_num in range(pages):
+        image = Image.new('L', (1240, 1754), 255)
+        draw = ImageDraw.Draw(image)
+        for line in range(60):
+            draw.text((80, 80 + line * 26), f"scanned page {page_num + 1} line {line + 1}", fill=0)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=80)
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    doc.save(scanned_pdf)
+    doc.close()
+    return [text_pdf, scanned_pdf]
+
+def collect_pdfs(paths):
+    pdf_list = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            pdf_list.extend(sorted(path.rglob('*.pdf')))
+        elif path.suffix.lower() == '.pdf':
+            pdf_list.append(path)
+    return pdf_list
+
+def measure(func, pdf_path, repeat):
+    """返回多次运行中最快的一次耗时和渲染页数"""
+    best = None
+    rendered = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rendered = func(pdf_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rendered
+
+def main():
+    parser = argparse.ArgumentParser(description='对比PyPDF2+PyMuPDF与单次PyMuPDF解析的耗时')
+    parser.add_argument('paths', nargs='*', help='PDF文件或目录')
+    parser.add_argument('--repeat', type=int, default=3, help='每个文件重复运行的次数，取最快一次')
+    args = parser.parse_args()
+
+    try:
+        import PyPDF2  # noqa: F401
+    except ImportError:
+        print("需要安装PyPDF2才能运行旧方式的对比: pip install PyPDF2")
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_list = collect_pdfs(args.paths) if args.paths else make_sample_pdfs(Path(temp_dir))
+        if not pdf_list:
+            print("没有找到PDF文件")
+            return
+
+        print(f"{'文件':<30} {'页数':>6} {'旧方式(秒)':>12} {'新方式(秒)':>12} {'加速比':>8} {'渲染页数(旧/新)':>16}")
+        for pdf_path in pdf_list:
+            with fitz.open(pdf_path) as doc:
+                page_count = len(doc)
+            legacy_time, legacy_rendered = measure(legacy_pass, pdf_path, args.repeat)
+            new_time, new_rendered = measure(single_parse_pass, pdf_path, args.repeat)
+            speedup = legacy_time / new_time if new_time else float('inf')
+            print(f"{pdf_path.name:<30} {page_count:>6} {legacy_time:>12.3f} {new_time:>12.3f} "
+                  f"{speedup:>7.1f}x {legacy_rendered:>8}/{new_rendered}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""对比图像预处理前后的OCR耗时和识别准确率
+
+样本图像的文件名（不含扩展名）应为正确的身份证号码，例如本工具重命名后的文件。
+不指定样本时，会在临时目录中生成模拟手机拍摄的证件照片：分辨率高、有阴影、噪点和倾斜。
+
+需要安装Tesseract；没有Tesseract时只测量预处理本身的耗时。
+
+用法:
+    python benchmarks/bench_preprocess.py [图像文件或目录 ...] [--repeat 1] [--crop-content]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from id_candidates import ID_CARD_CHECK_CODES, ID_CARD_WEIGHTS
+from id_card_extractor import SUPPORTED_IMAGE_SUFFIXES, ExtractOptions, find_valid_id_number, ocr_image
+from image_preprocess import preprocess_image
+
+FONT_NAMES = ['DejaVuSans.ttf', 'arial.ttf', 'simhei.ttf', 'msyh.ttc']
+
+def load_font(size):
+    for name in FONT_NAMES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+def make_id_number(rng):
+    body = f"110101{rng.randint(1950, 2005)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}{rng.randint(0, 999):03d}"
+    total = sum(int(digit) * weight for digit, weight in zip(body, ID_CARD_WEIGHTS))
+    return body + ID_CARD_CHECK_CODES[total % 11]
+
+def make_photo(id_number, rng, size=(4000, 3000)):
+    """生成一张模拟手机拍摄的证件照片"""
+    width, height = size
+    card = Image.new('RGB', (2400, 1500), (236, 232, 220))
+    draw = ImageDraw.Draw(card)
+    font = load_font(90)
+    draw.text((120, 150), "Name  ZHANG SAN", fill=(30, 30, 30), font=font)
+    draw.text((120, 350), "Sex  M     Born  1974.07.02", fill=(30, 30, 30), font=font)
+    draw.text((120, 550), "Address  Sample Road 1", fill=(30, 30, 30), font=font)
+    draw.text((120, 1200), id_number, fill=(20, 20, 20), font=load_font(110))
+    card = card.rotate(rng.uniform(-4, 4), resample=Image.Resampling.BICUBIC, expand=True, fillcolor=(90, 80, 70))
+
+    photo = Image.new('RGB', size, (90, 80, 70))
+    photo.paste(card, ((width - card.width) // 2, (height - card.height) // 2))
+
+    # 从左上到右下逐渐变暗的阴影和随机噪点
+    pixels = np.asarray(photo).astype(np.float32)
+    shade = np.linspace(1.0, 0.55, width)[np.newaxis, :] * np.linspace(1.0, 0.8, height)[:, np.newaxis]
+    pixels *= shade[:, :, np.newaxis]
+    noise = np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 12, pixels.shape)
+    pixels = np.clip(pixels + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+def make_samples(directory, count):
+    rng = random.Random(0)
+    samples = []
+    for _ in range(count):
+        id_number = make_id_number(rng)
+        path = directory / f"{id_number}.jpg"
+        make_photo(id_number, rng).save(path, quality=90)
+        samples.append(path)
+    return samples
+
+def collect_images(paths):
+    image_list = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            image_list.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() in SUPPORTED_IMAGE_SUFFIXES))
+        elif path.suffix.lower() in SUPPORTED_IMAGE_SUFFIXES:
+            image_list.append(path)
+    return image_list
+
+def run_ocr(image, options):
+    """返回 (OCR耗时, 识别出的号码)"""
+    start = time.perf_counter()
+    text = ocr_image(image, options)
+    return time.perf_counter() - start, find_valid_id_number(text)
+
+def main():
+    parser = argparse.ArgumentParser(description='对比图像预处理前后的OCR耗时和准确率')
+    parser.add_argument('paths', nargs='*', help='以正确号码命名的图像文件或目录')
+    parser.add_argument('--samples', type=int, default=5, help='不指定样本时生成的图像数量')
+    parser.add_argument('--repeat', type=int, default=1, help='每张图像重复运行的次数，取最快一次')
+    parser.add_argument('--crop-content', action='store_true', help='预处理时裁剪到文字区域')
+    args = parser.parse_args()
+
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        has_tesseract = True
+    except Exception:
+        print("没有找到Tesseract，只测量预处理耗时")
+        has_tesseract = False
+
+    options = ExtractOptions(cascade=False)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_list = collect_images(args.paths) if args.paths else make_samples(Path(temp_dir), args.samples)
+        if not image_list:
+            print("没有找到图像文件")
+            return
+
+        totals = {'preprocess': 0.0, 'raw_ocr': 0.0, 'pre_ocr': 0.0, 'raw_ok': 0, 'pre_ok': 0}
+        header = f"{'文件':<28} {'尺寸':>11} {'预处理(秒)':>10}"
+        if has_tesseract:
+            header += f" {'原图OCR(秒)':>12} {'预处理后OCR(秒)':>15} {'识别(原/预)':>12}"
+        print(header)
+        for image_path in image_list:
+            expected = image_path.stem.upper()
+            image = Image.open(image_path)
+            image.load()
+
+            pre_time = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                processed = preprocess_image(image, crop_content=args.crop_content)
+                elapsed = time.perf_counter() - start
+                pre_time = elapsed if pre_time is None else min(pre_time, elapsed)
+            totals['preprocess'] += pre_time
+
+            row = f"{image_path.name:<28} {image.width:>5}x{image.height:<5} {pre_time:>10.3f}"
+            if has_tesseract:
+                raw_time, raw_id = run_ocr(image, options)
+                pre_ocr_time, pre_id = run_ocr(processed, options)
+                totals['raw_ocr'] += raw_time
+                totals['pre_ocr'] += pre_ocr_time
+                totals['raw_ok'] += raw_id == expected
+                totals['pre_ok'] += pre_id == expected
+                marks = f"{'Y' if raw_id == expected else 'N'}/{'Y' if pre_id == expected else 'N'}"
+                row += f" {raw_time:>12.3f} {pre_ocr_time:>15.3f} {marks:>12}"
+            print(row)
+
+        count = len(image_list)
+        print(f"\n共{count}张图像，预处理平均 {totals['preprocess'] / count:.3f} 秒")
+        if has_tesseract:
+            print(f"原图: OCR平均 {totals['raw_ocr'] / count:.3f} 秒，识别正确 {totals['raw_ok']}/{count}")
+            print(f"预处理后: OCR平均 {(totals['preprocess'] + totals['pre_ocr']) / count:.3f} 秒（含预处理），"
+                  f"识别正确 {totals['pre_ok']}/{count}")
+
+if __name__ == '__main__':
+    main()
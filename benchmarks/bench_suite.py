@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""在合成语料上运行完整的识别流程，报告吞吐量、各阶段耗时、内存峰值和识别准确率
+
+语料由 make_corpus.py 按固定的随机种子生成（不指定 --corpus 时生成到临时目录），
+识别参数与命令行默认值相同，但不使用识别缓存，也不重命名文件。
+
+指定 --baseline 时与之前保存的结果比较：吞吐量、p95耗时、内存峰值变差超过容差，
+或者准确率下降，都视为性能回退，程序以退出码1结束，可以在升级Tesseract或修改参数后运行。
+
+用法:
+    python benchmarks/bench_suite.py [--corpus 目录] [-j 4] [--save 结果.json] [--baseline 基准.json]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from id_card_extractor import ExtractOptions, get_engine_version, iter_results_parallel, iter_results_serial
+from instrumentation import STATS, peak_memory, percentile
+from make_corpus import MANIFEST_NAME, make_corpus, read_manifest
+
+# 与基准比较时允许的变化：吞吐量下降、p95耗时和内存峰值增加的比例，准确率下降的百分点
+THROUGHPUT_TOLERANCE = 0.10
+LATENCY_TOLERANCE = 0.15
+MEMORY_TOLERANCE = 0.20
+ACCURACY_TOLERANCE = 0.0
+
+def run_corpus(directory, manifest, jobs):
+    """识别语料中的所有文件，返回汇总结果"""
+    expected = {str(Path(directory) / entry['file']): entry for entry in manifest}
+    options = ExtractOptions(cache_dir=None, trace=True)
+    files = list(expected)
+
+    start = time.perf_counter()
+    if jobs > 1:
+        results = list(iter_results_parallel(files, jobs, options))
+    else:
+        results = list(iter_results_serial(files, options))
+    elapsed = time.perf_counter() - start
+
+    file_seconds = []
+    stage_seconds = {}
+    pages = 0
+    correct = {}
+    totals = {}
+    misses = []
+    for result in results:
+        entry = expected[str(result['path'])]
+        trace = result.get('trace') or {'seconds': 0.0, 'pages': 0, 'stages': {}}
+        file_seconds.append(trace['seconds'])
+        pages += entry['pages']
+        for name, values in trace['stages'].items():
+            stage_seconds.setdefault(name, []).append(values['seconds'])
+        kind = entry['kind']
+        totals[kind] = totals.get(kind, 0) + 1
+        if result['id_number'] == entry['id_number']:
+            correct[kind] = correct.get(kind, 0) + 1
+        else:
+            misses.append((entry['file'], entry['id_number'], result['id_number']))
+
+    peaks = list(STATS.peaks.values()) or [peak_memory() or 0]
+    file_seconds.sort()
+    summary = {
+        'tesseract': get_engine_version(options.ocr_backend),
+        'jobs': jobs,
+        'files': len(results),
+        'pages': pages,
+        'seconds': elapsed,
+        'files_per_second': len(results) / elapsed,
+        'pages_per_second': pages / elapsed,
+        'file_p50': percentile(file_seconds, 0.5),
+        'file_p95': percentile(file_seconds, 0.95),
+        'peak_rss_mb': max(peaks) / 1024 / 1024,
+        'accuracy': sum(correct.values()) / len(results) * 100,
+        'accuracy_by_kind': {kind: correct.get(kind, 0) / count * 100 for kind, count in totals.items()},
+        'stages': {},
+    }
+    for name, values in stage_seconds.items():
+        values.sort()
+        summary['stages'][name] = {'files': len(values), 'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+    return summary, misses
+
+def print_summary(summary, misses):
+    print(f"\nTesseract {summary['tesseract']}，{summary['jobs']}个进程")
+    print(f"共{summary['files']}个文件、{summary['pages']}页，耗时{summary['seconds']:.2f}秒")
+    print(f"吞吐量: {summary['files_per_second']:.2f}个文件/秒，{summary['pages_per_second']:.2f}页/秒")
+    print(f"每个文件耗时: p50 {summary['file_p50']:.3f}秒，p95 {summary['file_p95']:.3f}秒")
+    print(f"内存峰值: {summary['peak_rss_mb']:.1f}MB")
+    by_kind = "，".join(f"{kind} {accuracy:.1f}%" for kind, accuracy in summary['accuracy_by_kind'].items())
+    print(f"识别准确率: {summary['accuracy']:.1f}%（{by_kind}）")
+    print(f"\n{'阶段':<28} {'文件数':>6} {'p50(秒)':>10} {'p95(秒)':>10}")
+    for name, stage in summary['stages'].items():
+        print(f"{name:<28} {stage['files']:>6} {stage['p50']:>10.3f} {stage['p95']:>10.3f}")
+    if misses:
+        print("\n识别错误的文件:")
+        for name, expected, actual in misses:
+            print(f"  {name}: 应为 {expected}，识别为 {actual}")
+
+def compare(summary, baseline):
+    """与基准比较，打印各项指标的变化，返回是否有回退"""
+    # (指标, 说明, 越大越好, 容差)
+    checks = [
+        ('files_per_second', '文件/秒', True, THROUGHPUT_TOLERANCE),
+        ('pages_per_second', '页/秒', True, THROUGHPUT_TOLERANCE),
+        ('file_p95', '文件耗时p95(秒)', False, LATENCY_TOLERANCE),
+        ('peak_rss_mb', '内存峰值(MB)', False, MEMORY_TOLERANCE),
+    ]
+    print(f"\n与基准比较（基准: Tesseract {baseline.get('tesseract')}，{baseline.get('jobs')}个进程）:")
+    print(f"{'指标':<20} {'基准':>10} {'本次':>10} {'变化':>9}")
+    regressed = False
+    for key, label, higher_is_better, tolerance in checks:
+        old, new = baseline[key], summary[key]
+        change = (new - old) / old if old else 0.0
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        regressed = regressed or worse
+        print(f"{label:<20} {old:>10.3f} {new:>10.3f} {change:>+8.1%}{'  回退' if worse else ''}")
+    accuracy_drop = baseline['accuracy'] - summary['accuracy']
+    worse = accuracy_drop > ACCURACY_TOLERANCE
+    regressed = regressed or worse
+    print(f"{'准确率(%)':<20} {baseline['accuracy']:>10.1f} {summary['accuracy']:>10.1f} {summary['accuracy'] - baseline['accuracy']:>+8.1f}"
+          f"{'  回退' if worse else ''}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='在合成语料上测试识别的性能和准确率')
+    parser.add_argument('--corpus', help='语料目录，不存在清单时在其中生成语料（默认生成到临时目录）')
+    parser.add_argument('--seed', type=int, default=0, help='生成语料的随机种子')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='并行处理的进程数')
+    parser.add_argument('--save', metavar='FILE', help='把本次结果保存为JSON，可以作为以后比较的基准')
+    parser.add_argument('--baseline', metavar='FILE', help='与之前保存的结果比较，性能回退时以退出码1结束')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(args.corpus or temp_dir)
+        if not (directory / MANIFEST_NAME).exists():
+            print(f"正在生成语料: {directory}")
+            make_corpus(directory, args.seed)
+        manifest = read_manifest(directory)
+        summary, misses = run_corpus(directory, manifest, max(1, args.jobs))
+
+    print_summary(summary, misses)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.save}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(summary, baseline):
+            print("\n性能或准确率有回退")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""生成用于性能测试的合成身份证语料
+
+同样的随机种子总是生成同样的文件：号码都是校验位正确的身份证号码，文件名不包含号码，
+正确答案记录在 manifest.json 中。语料包括：
+    - 证件图像：不同分辨率（DPI）、旋转角度、小角度倾斜和噪点强度的组合
+    - 带文本层的PDF：号码在文本层中，不需要OCR
+    - 多页扫描PDF：每页是一张扫描图像，号码只在其中一页的证件上
+
+生成的图像依赖系统中可用的字体（见 bench_preprocess.FONT_NAMES），在不同机器上比较结果时应使用同一份语料。
+
+用法:
+    python benchmarks/make_corpus.py 输出目录 [--seed 0]
+"""
+
+import argparse
+import io
+import json
+import random
+from pathlib import Path
+
+import fitz
+import numpy as np
+from PIL import Image, ImageDraw
+
+from bench_preprocess import load_font, make_id_number
+
+# 证件尺寸（毫米）和生成的各种组合
+CARD_SIZE_MM = (85.6, 54.0)
+CARD_DPIS = (150, 200, 300)
+CARD_ROTATIONS = (0, 90, 180, 270)
+CARD_NOISE_LEVELS = (0, 8, 20)
+# 部分图像额外倾斜的最大角度（度）
+CARD_SKEW = 2.0
+TEXT_PDF_COUNT = 6
+SCANNED_PDF_COUNT = 4
+SCANNED_PDF_PAGES = 6
+SCAN_DPI = 150
+
+MANIFEST_NAME = 'manifest.json'
+
+def render_card(id_number, dpi, rng):
+    """按指定分辨率绘制一张证件，号码在右下方（与默认的号码区域一致）"""
+    width = round(CARD_SIZE_MM[0] / 25.4 * dpi)
+    height = round(CARD_SIZE_MM[1] / 25.4 * dpi)
+    card = Image.new('RGB', (width, height), (236, 232, 220))
+    draw = ImageDraw.Draw(card)
+    font = load_font(max(10, height // 16))
+    draw.text((width * 0.06, height * 0.10), "Name  ZHANG SAN", fill=(30, 30, 30), font=font)
+    draw.text((width * 0.06, height * 0.25), f"Sex  M    Born  {id_number[6:10]}.{id_number[10:12]}.{id_number[12:14]}",
+              fill=(30, 30, 30), font=font)
+    draw.text((width * 0.06, height * 0.40), f"Address  Sample Road {rng.randint(1, 999)}", fill=(30, 30, 30), font=font)
+    draw.text((width * 0.06, height * 0.80), "ID No.", fill=(30, 30, 30), font=font)
+    draw.text((width * 0.30, height * 0.78), id_number, fill=(20, 20, 20), font=load_font(max(12, height // 12)))
+    return card
+
+def add_noise(image, sigma, rng):
+    if not sigma:
+        return image
+    pixels = np.asarray(image).astype(np.float32)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, sigma, pixels.shape)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8))
+
+def make_card_image(id_number, dpi, rotation, noise, skew, rng):
+    card = render_card(id_number, dpi, rng)
+    if skew:
+        card = card.rotate(skew, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=(236, 232, 220))
+    if rotation:
+        card = card.rotate(rotation, expand=True)
+    return add_noise(card, noise, rng)
+
+def image_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+def save_pdf(doc, path):
+    """保存PDF，去掉创建时间和随机的文件ID，同样的内容总是得到同样的文件"""
+    doc.set_metadata({'creator': 'make_corpus', 'producer': 'make_corpus', 'creationDate': '', 'modDate': ''})
+    doc.save(str(path), no_new_id=True)
+    doc.close()
+
+def make_text_pdf(path, id_number, rng):
+    """带文本层的PDF，号码在随机的一页上，返回页数"""
+    pages = rng.randint(1, 3)
+    target_page = rng.randrange(pages)
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        for line in range(30):
+            page.insert_text((50, 60 + line * 20), f"Application form page {page_num + 1}, line {line + 1}: sample content")
+        if page_num == target_page:
+            page.insert_text((50, 700), f"ID number: {id_number}")
+    save_pdf(doc, path)
+    return pages
+
+def make_scanned_pdf(path, id_number, rng):
+    """多页扫描PDF，每页是一张图像，证件在随机的一页上，返回页数"""
+    page_width, page_height = round(8.27 * SCAN_DPI), round(11.69 * SCAN_DPI)
+    target_page = rng.randrange(SCANNED_PDF_PAGES)
+    doc = fitz.open()
+    for page_num in range(SCANNED_PDF_PAGES):
+        scan = Image.new('RGB', (page_width, page_height), (250, 250, 248))
+        draw = ImageDraw.Draw(scan)
+        font = load_font(SCAN_DPI // 8)
+        for line in range(25):
+            draw.text((SCAN_DPI, SCAN_DPI + line * SCAN_DPI // 3), f"Scanned page {page_num + 1} line {line + 1}",
+                      fill=(40, 40, 40), font=font)
+        if page_num == target_page:
+            card = render_card(id_number, SCAN_DPI, rng)
+            scan.paste(card, (SCAN_DPI, page_height // 2))
+        scan = add_noise(scan, 6, rng)
+        page = doc.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=image_bytes(scan))
+    save_pdf(doc, path)
+    return SCANNED_PDF_PAGES
+
+def make_corpus(directory, seed=0):
+    """在目录中生成语料，返回清单：每个文件的相对路径、正确号码、类型、页数和生成参数"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = []
+
+    index = 0
+    for dpi in CARD_DPIS:
+        for rotation in CARD_ROTATIONS:
+            for noise in CARD_NOISE_LEVELS:
+                id_number = make_id_number(rng)
+                skew = round(rng.uniform(-CARD_SKEW, CARD_SKEW), 2) if index % 2 else 0.0
+                image = make_card_image(id_number, dpi, rotation, noise, skew, rng)
+                name = f"card_{index:03d}.{'png' if noise == 0 else 'jpg'}"
+                image.save(directory / name, quality=85)
+                manifest.append({'file': name, 'id_number': id_number, 'kind': 'card_image', 'pages': 1,
+                                 'dpi': dpi, 'rotation': rotation, 'noise': noise, 'skew': skew})
+                index += 1
+
+    for number in range(TEXT_PDF_COUNT):
+        id_number = make_id_number(rng)
+        name = f"text_{number:03d}.pdf"
+        pages = make_text_pdf(directory / name, id_number, rng)
+        manifest.append({'file': name, 'id_number': id_number, 'kind': 'text_pdf', 'pages': pages})
+
+    for number in range(SCANNED_PDF_COUNT):
+        id_number = make_id_number(rng)
+        name = f"scanned_{number:03d}.pdf"
+        pages = make_scanned_pdf(directory / name, id_number, rng)
+        manifest.append({'file': name, 'id_number': id_number, 'kind': 'scanned_pdf', 'pages': pages, 'dpi': SCAN_DPI})
+
+    with open(directory / MANIFEST_NAME, 'w', encoding='utf-8') as file:
+        json.dump({'seed': seed, 'files': manifest}, file, ensure_ascii=False, indent=2)
+    return manifest
+
+def read_manifest(directory):
+    with open(Path(directory) / MANIFEST_NAME, 'r', encoding='utf-8') as file:
+        return json.load(file)['files']
+
+def main():
+    parser = argparse.ArgumentParser(description='生成用于性能测试的合成身份证语料')
+    parser.add_argument('directory', help='输出目录')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子，同样的种子生成同样的语料')
+    args = parser.parse_args()
+
+    manifest = make_corpus(args.directory, args.seed)
+    kinds = {}
+    for entry in manifest:
+        kinds[entry['kind']] = kinds.get(entry['kind'], 0) + 1
+    print(f"已生成{len(manifest)}个文件: " + "，".join(f"{kind} {count}个" for kind, count in kinds.items()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+
+# 后台遍历最多领先处理的文件数，避免把整个目录树的文件列表都放在内存中
+WALK_QUEUE_SIZE = 10000
+
+# 遍历结束标记
+_END = object()
+
+def matches_any(rel_path, name, patterns):
+    """文件名或相对路径是否匹配任意一个glob模式"""
+    return any(fnmatch(name, pattern) or fnmatch(rel_path, pattern) for pattern in patterns)
+
+def iter_files(directory_path, suffixes, recursive=False, include=None, exclude=None, max_depth=None):
+    """用os.scandir遍历目录，边遍历边产出扩展名受支持的文件
+
+    include/exclude 为glob模式列表，匹配文件名或相对于起始目录的路径（使用/分隔）。
+    exclude 同样作用于子目录，匹配的子目录整个跳过，不会被遍历。
+    max_depth 为最多进入的子目录层数，0表示只处理起始目录；不递归时固定为0。
+    每个目录内按名称排序，保证多次运行的处理顺序一致。
+    """
+    directory_path = Path(directory_path)
+    include = include or []
+    exclude = exclude or []
+    if not recursive:
+        max_depth = 0
+
+    # 栈中保存 (目录路径, 相对路径, 深度)
+    stack = [(directory_path, '', 0)]
+    while stack:
+        current, rel_dir, depth = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"无法读取目录: {current}, 错误: {e}")
+            continue
+
+        sub_dirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (max_depth is None or depth < max_depth) and not matches_any(rel_path, entry.name, exclude):
+                        sub_dirs.append((Path(entry.path), rel_path, depth + 1))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            if os.path.splitext(entry.name)[1].lower() not in suffixes:
+                continue
+            if include and not matches_any(rel_path, entry.name, include):
+                continue
+            if matches_any(rel_path, entry.name, exclude):
+                continue
+            yield Path(entry.path)
+
+        # 倒序入栈，使子目录按名称顺序处理
+        stack.extend(reversed(sub_dirs))
+
+class BackgroundWalker:
+    """在后台线程中遍历目录，处理线程可以在遍历结束前就开始处理文件
+
+    discovered 为目前已经发现的文件数，done 表示遍历是否已经结束。
+    """
+
+    def __init__(self, file_iter, max_pending=WALK_QUEUE_SIZE):
+        self.queue = queue.Queue(max_pending)
+        self.discovered = 0
+        self.done = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, args=(file_iter,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stopped:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, file_iter):
+        try:
+            for file_path in file_iter:
+                if self.stopped:
+                    break
+                self.discovered += 1
+                if not self._put(file_path):
+                    break
+        except Exception as e:
+            print(f"遍历目录时出错: {e}")
+        finally:
+            self.done = True
+            self._put(_END)
+
+    def __iter__(self):
+        while not self.stopped:
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            yield item
+
+    def stop(self):
+        """停止遍历，正在等待下一个文件的迭代随即结束"""
+        self.stopped = True
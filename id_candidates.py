@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import re
+
+# 身份证号码校验位（GB 11643）的加权因子和校验码
+ID_CARD_WEIGHTS = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
+ID_CARD_CHECK_CODES = '10X98765432'
+
+# OCR常见的字符混淆，校验前先按此表纠正为数字
+OCR_CONFUSIONS = {
+    'O': '0', 'o': '0', 'D': '0', 'Q': '0',
+    'l': '1', 'I': '1', 'i': '1', '|': '1',
+    'B': '8',
+    'S': '5', 's': '5',
+    'Z': '2', 'z': '2',
+}
+_CONFUSABLE = ''.join(re.escape(c) for c in OCR_CONFUSIONS)
+# 18个数字或易混淆字符，最后一位还可以是X；前后不能紧接数字，
+# 避免从银行卡号、账号等更长的数字串中截取出恰好能通过校验的18位
+CANDIDATE_PATTERN = f'(?<![0-9])(?=([0-9{_CONFUSABLE}]{{17}}[0-9Xx{_CONFUSABLE}])(?![0-9Xx]))'
+# 按 6-8-4（地址码、出生日期、顺序码和校验位）分组、组间只有一个空格的号码，识别前去掉组间的空格
+_DIGIT = f'[0-9{_CONFUSABLE}]'
+GROUPED_PATTERN = (f'(?<![0-9Xx{_CONFUSABLE}])({_DIGIT}{{6}}) ({_DIGIT}{{8}}) '
+                   f'({_DIGIT}{{3}}[0-9Xx{_CONFUSABLE}])(?![0-9Xx{_CONFUSABLE}])')
+# 纠正的字符多于这个数量时不再视为号码，避免把普通单词当作号码
+MAX_CORRECTIONS = 3
+
+# 省级行政区划代码（号码前两位）
+PROVINCE_CODES = {
+    '11', '12', '13', '14', '15', '21', '22', '23', '31', '32', '33', '34', '35', '36', '37',
+    '41', '42', '43', '44', '45', '46', '50', '51', '52', '53', '54', '61', '62', '63', '64', '65',
+    '71', '81', '82',
+}
+# 号码前面出现这些文字时，更可能是证件上的号码
+ID_LABELS = ['公民身份号码', '身份证号', '身份号码']
+LABEL_WINDOW = 20
+
+# 候选号码的评分
+SCORE_CHECKSUM = 100
+SCORE_BIRTH_DATE = 20
+SCORE_PROVINCE = 10
+SCORE_LABEL = 15
+SCORE_REPEAT = 3
+PENALTY_CORRECTION = 5
+
+class IdCandidate:
+    """候选身份证号码
+
+    valid 表示校验位和出生日期都正确；score 越高越可能是证件上的号码。
+    count 为在文本中出现的次数。
+    """
+
+    def __init__(self, number, corrections=0, labeled=False):
+        self.number = number
+        self.corrections = corrections
+        self.labeled = labeled
+        self.count = 1
+        self.checksum_ok = is_checksum_valid(number)
+        self.birth_date_ok = is_birth_date_valid(number)
+
+    @property
+    def valid(self):
+        return self.checksum_ok and self.birth_date_ok
+
+    @property
+    def score(self):
+        score = 0
+        if self.checksum_ok:
+            score += SCORE_CHECKSUM
+        if self.birth_date_ok:
+            score += SCORE_BIRTH_DATE
+        if self.number[:2] in PROVINCE_CODES:
+            score += SCORE_PROVINCE
+        if self.labeled:
+            score += SCORE_LABEL
+        score += SCORE_REPEAT * (self.count - 1)
+        score -= PENALTY_CORRECTION * self.corrections
+        return score
+
+    def merge(self, other):
+        """合并同一号码的另一次出现"""
+        self.count += other.count
+        self.corrections = min(self.corrections, other.corrections)
+        self.labeled = self.labeled or other.labeled
+
+    def __repr__(self):
+        return f"IdCandidate({self.number}, score={self.score}, valid={self.valid})"
+
+def is_checksum_valid(id_number):
+    """按GB 11643校验身份证号码的校验位"""
+    if len(id_number) != 18 or not id_number[:17].isdigit():
+        return False
+    total = sum(int(digit) * weight for digit, weight in zip(id_number[:17], ID_CARD_WEIGHTS))
+    return ID_CARD_CHECK_CODES[total % 11] == id_number[17].upper()
+
+def is_birth_date_valid(id_number):
+    """号码中的出生日期是否为1900年以后、不晚于今天的真实日期"""
+    try:
+        birth_date = datetime.date(int(id_number[6:10]), int(id_number[10:12]), int(id_number[12:14]))
+    except ValueError:
+        return False
+    return datetime.date(1900, 1, 1) <= birth_date <= datetime.date.today()
+
+def is_valid_id_number(id_number):
+    """校验位和出生日期都正确的身份证号码"""
+    return is_checksum_valid(id_number) and is_birth_date_valid(id_number)
+
+def correct_confusions(raw):
+    """把易混淆字符纠正为数字，返回 (纠正后的号码, 纠正的字符数)"""
+    chars = []
+    corrections = 0
+    for index, char in enumerate(raw):
+        if index == 17 and char in 'Xx':
+            chars.append('X')
+        elif char in OCR_CONFUSIONS:
+            chars.append(OCR_CONFUSIONS[char])
+            corrections += 1
+        else:
+            chars.append(char)
+    return ''.join(chars), corrections
+
+def extract_candidates(text):
+    """从文本中找出所有候选号码，纠正常见的OCR混淆，同一号码只保留一个
+    
+    号码只在同一行内查找，不会把相邻两行的数字（如电话号码和其他编号）拼成号码；
+    行内只去掉按 6-8-4 分组的号码组间的单个空格。号码前面（包括前几行）
+    LABEL_WINDOW 个非空白字符内出现"公民身份号码"等文字时视为带标签的号码。
+    """
+    candidates = {}
+    # 前面各行去掉空白后的最后 LABEL_WINDOW 个字符
+    previous = ''
+    for line in text.splitlines():
+        line = re.sub(GROUPED_PATTERN, r'\1\2\3', line)
+        for match in re.finditer(CANDIDATE_PATTERN, line):
+            number, corrections = correct_confusions(match.group(1))
+            if corrections > MAX_CORRECTIONS or number[0] == '0':
+                continue
+            context = (previous + re.sub(r'\s+', '', line[:match.start(1)]))[-LABEL_WINDOW:]
+            labeled = any(label in context for label in ID_LABELS)
+            candidate = IdCandidate(number, corrections, labeled)
+            if number in candidates:
+                candidates[number].merge(candidate)
+            else:
+                candidates[number] = candidate
+        previous = (previous + re.sub(r'\s+', '', line))[-LABEL_WINDOW:]
+    return list(candidates.values())
+
+def best_candidate(candidates):
+    """返回得分最高的有效候选号码，没有有效号码时返回None"""
+    valid = [candidate for candidate in candidates if candidate.valid]
+    if not valid:
+        return None
+    return max(valid, key=lambda candidate: candidate.score)
+
+def select_id_number(text):
+    """在文本中选出最可能的有效身份证号码，没有时返回None"""
+    candidate = best_candidate(extract_candidates(text))
+    return candidate.number if candidate else None
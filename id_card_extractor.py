@@ -1,59 +1,639 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
 import os
 import re
+import sys
 import argparse
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-import PyPDF2
 import pytesseract
+import PIL
 from PIL import Image
-import fitz  # PyMuPDF，用于从PDF提取图像
+import fitz  # PyMuPDF，用于提取PDF文本和渲染页面
+from ocr_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB, file_sha256, open_cache
+from instrumentation import (
+    PROFILER, SLOW_FILE_SECONDS, STATS, FileMetrics, Timer, add_trace_stage, limit_memory, merge_traces, peak_memory,
+    profile_call,
+)
+from ocr_backends import BACKENDS, DEFAULT_BACKEND, check_backend, get_backend
+from file_walker import BackgroundWalker, iter_files
+from watch_folder import POLL_INTERVAL, SETTLE_SECONDS, FolderWatcher
+from image_preprocess import TARGET_CHAR_HEIGHT, preprocess_image
+from id_candidates import is_valid_id_number, select_id_number
+from layout_region import find_number_band, layout_band, layout_key, region_box, remember_layout, words_to_text
+from pipeline import PIPELINE_QUEUE_SIZE, REPORT_INTERVAL, Pipeline, Stage
+from pdf_split import SPLIT_CHUNK_PAGES, format_ranges, group_pages, page_chunks, write_pages
+from rename_plan import (
+    CONFLICT_SKIP, CONFLICT_STRATEGIES, STATUS_PLANNED, TargetResolver,
+    apply_plan, move_no_replace, plan_entry, print_entry, read_plan, write_plan,
+)
+from rename_journal import (
+    STATUS_ALREADY_NAMED, STATUS_NO_ID, STATUS_RENAME_FAILED, STATUS_RENAMED, STATUS_TARGET_EXISTS,
+    RenameJournal, completed_files, journal_key, undo_journal,
+)
 
 # 中国大陆身份证号码正则表达式
 ID_CARD_PATTERN = r'[1-9]\d{5}(?:18|19|20)\d{2}(?:0[1-9]|10|11|12)(?:0[1-9]|[1-2]\d|30|31)\d{3}[\dXx]'
 
-def extract_text_from_image(image_path):
+# 支持的文件类型
+SUPPORTED_IMAGE_SUFFIXES = ['.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']
+SUPPORTED_SUFFIXES = ['.pdf'] + SUPPORTED_IMAGE_SUFFIXES
+
+# 并行模式下每个进程最多预先排队的任务数
+PENDING_PER_JOB = 4
+# 并行模式下页数不少于这个数量的PDF按页面分段交给多个进程识别，每段的页数为 PAGE_TASK_PAGES
+PAGE_TASK_MIN_PAGES = 8
+PAGE_TASK_PAGES = 4
+# 可以中途停止时，等待任务完成期间检查是否停止的间隔（秒）
+TASK_POLL_SECONDS = 0.1
+# 流水线模式下同时读取文件的线程数
+PIPELINE_READERS = 4
+
+# OCR语言和PDF渲染分辨率
+OCR_LANG = 'chi_sim'
+RENDER_DPI = 200
+# 自适应分辨率：先用低分辨率渲染，未识别出有效号码时再用高分辨率重新渲染
+ADAPTIVE_DPI_TIERS = (150, 300)
+
+# PDF页面文本层少于这个字数时，认为该页是扫描件，需要OCR识别
+PAGE_TEXT_MIN_CHARS = 50
+
+# 未压缩图像每个像素的字节数，用于在解码前只读取裁剪区域所在的行
+RAW_BYTES_PER_PIXEL = {'1': 0, 'L': 1, 'P': 1, 'RGB': 3, 'BGR': 3, 'RGBA': 4, 'BGRA': 4, 'RGBX': 4, 'BGRX': 4}
+# 解码前裁剪依赖Pillow的 tile 结构和私有的 _size 属性，只在验证过的版本范围内使用（主版本号, 次版本号）
+CROP_DECODE_PILLOW_VERSIONS = ((9, 5), (12, 99))
+
+# 嵌入图像至少覆盖页面面积的这个比例时，直接取出图像代替渲染页面
+EMBEDDED_IMAGE_MIN_COVERAGE = 0.9
+# 可以直接交给Pillow解码的嵌入图像格式
+PIL_IMAGE_EXTENSIONS = ['jpeg', 'jpg', 'png', 'tiff', 'tif', 'bmp', 'jpx']
+
+# 第一层快速识别：只识别号码所在区域（按图像宽高的比例），仅允许数字和X，单行模式
+NUMBER_BAND = (0.25, 0.7, 1.0, 1.0)
+FAST_LANG = 'eng'
+FAST_PSM = 7
+FAST_WHITELIST = '0123456789X'
+
+# 自动旋转：未识别出有效号码时依次尝试的旋转角度（逆时针），以及尝试时把图像缩小到的最长边
+ORIENTATION_ANGLES = (180, 90, 270)
+ORIENTATION_MAX_SIDE = 1600
+# 每个进程记住的各扫描仪/模板的旋转角度，键见 image_template 和 page_template
+_orientation_hints = {}
+ORIENTATION_HINTS_LIMIT = 1000
+
+# 每个进程缓存的OCR引擎版本号，键为引擎名称
+_engine_versions = {}
+# 子进程中使用的识别参数和断点续传信息，由进程池初始化函数设置
+_worker_options = None
+_worker_need_hash = False
+_worker_skip_files = None
+
+# 视为处理成功的状态
+SUCCESS_STATUSES = {STATUS_RENAMED, STATUS_ALREADY_NAMED}
+
+class ExtractOptions:
+    """识别参数
+
+    所有属性都是可序列化的普通值，可以直接传递给进程池中的子进程。
+    """
+
+    def __init__(self, lang=OCR_LANG, ocr_backend=DEFAULT_BACKEND, region=None, max_pages=None, early_exit=True, embedded_images=True,
+                 dpi=RENDER_DPI, grayscale=False, adaptive_dpi=False, dpi_tiers=ADAPTIVE_DPI_TIERS,
+                 cascade=True, number_band=NUMBER_BAND, fast_lang=FAST_LANG, fast_psm=FAST_PSM,
+                 max_image_side=None, auto_rotate=True, auto_region=True, preprocess=False, char_height=TARGET_CHAR_HEIGHT, binarize=True, deskew=True,
+                 crop_content=False,
+                 cache_dir=None, cache_size_mb=DEFAULT_CACHE_SIZE_MB, trace=False, profile=False):
+        self.lang = lang
+        # OCR引擎名称，见 ocr_backends.BACKENDS
+        self.ocr_backend = ocr_backend
+        # 裁剪区域 (x1, y1, x2, y2)，按图像宽高的比例（0到1），不同分辨率的扫描件可以共用；
+        # 任意一个值大于1时按原始图像像素处理（旧版本的区域），见 layout_region.region_box
+        self.region = region
+        # PDF只处理前N页，为None时处理所有页
+        self.max_pages = max_pages
+        # 逐页识别时，找到身份证号码后不再处理后续页面
+        self.early_exit = early_exit
+        # 扫描页直接取出嵌入的图像，不渲染页面
+        self.embedded_images = embedded_images
+        # 渲染PDF页面的分辨率和颜色空间
+        self.dpi = dpi
+        self.grayscale = grayscale
+        self.adaptive_dpi = adaptive_dpi
+        self.dpi_tiers = tuple(dpi_tiers)
+        # 图像文件解码后（裁剪区域后）的最长边上限（像素），为None时按原始分辨率识别
+        self.max_image_side = max_image_side
+        # 未识别出有效号码时尝试旋转90°、180°、270°
+        self.auto_rotate = auto_rotate
+        # 全页识别时按单词位置找出号码或"公民身份号码"标签，记住号码区域在该模板中的位置，
+        # 之后同一模板（宽高比相同）的文件先只识别该区域
+        self.auto_region = auto_region
+        # 两层识别：先在号码区域做仅含数字的快速识别，未得到有效号码时再做全页识别
+        self.cascade = cascade
+        self.number_band = number_band
+        self.fast_lang = fast_lang
+        self.fast_psm = fast_psm
+        # OCR前的图像预处理，见 image_preprocess.preprocess_image
+        self.preprocess = preprocess
+        self.char_height = char_height
+        self.binarize = binarize
+        self.deskew = deskew
+        self.crop_content = crop_content
+        # 识别结果缓存目录，为None时不使用缓存
+        self.cache_dir = cache_dir
+        self.cache_size_mb = cache_size_mb
+        # 逐文件记录各阶段的耗时和CPU时间，结果附在 recognize_task 的结果字典中，见 instrumentation.FileMetrics
+        self.trace = trace
+        # 子进程在cProfile下执行每个任务，统计随结果交回主进程合并，见 instrumentation.BatchProfiler
+        self.profile = profile
+
+    def render_dpis(self):
+        """依次尝试的渲染分辨率"""
+        return self.dpi_tiers if self.adaptive_dpi else (self.dpi,)
+
+    def ocr_params(self):
+        """影响识别结果的参数，作为缓存键的一部分"""
+        return {
+            'tesseract': get_engine_version(self.ocr_backend),
+            'backend': self.ocr_backend,
+            'lang': self.lang,
+            'region': list(self.region) if self.region else None,
+            'dpi': list(self.render_dpis()),
+            'grayscale': self.grayscale,
+            'max_image_side': self.max_image_side,
+            'auto_rotate': self.auto_rotate,
+            'auto_region': self.auto_region,
+            'max_pages': self.max_pages,
+            # 提前结束时只识别到找到号码的页面，文本与 --full-scan 不同
+            'early_exit': self.early_exit,
+            'embedded_images': self.embedded_images,
+            'cascade': [self.number_band, self.fast_lang, self.fast_psm] if self.cascade else None,
+            'preprocess': [self.char_height, self.binarize, self.deskew, self.crop_content] if self.preprocess else None,
+        }
+
+def get_engine_version(backend_name):
+    """获取OCR引擎的Tesseract版本号（每个进程只查询一次）"""
+    if backend_name not in _engine_versions:
+        try:
+            _engine_versions[backend_name] = get_backend(backend_name).version()
+        except Exception:
+            _engine_versions[backend_name] = 'unknown'
+    return _engine_versions[backend_name]
+
+def get_cache(options):
+    """获取识别参数对应的缓存，未启用或无法打开时返回None"""
+    if options.cache_dir is None:
+        return None
+    try:
+        return open_cache(options.cache_dir, options.cache_size_mb)
+    except Exception as e:
+        print(f"无法打开识别缓存: {options.cache_dir}, 错误: {e}")
+        options.cache_dir = None
+        return None
+
+def crop_to_region(image, options):
+    """按识别参数中的区域裁剪图像"""
+    if options.region is not None:
+        image = image.crop(region_box(options.region, image.width, image.height))
+    return image
+
+def crop_to_number_band(image, options, band=None):
+    """裁剪出身份证号码可能所在的区域
+    
+    指定 band（按图像宽高的比例，如模板中记住的号码区域）时按 band 裁剪；
+    否则已指定裁剪区域时直接使用整个区域，未指定时使用默认的号码区域。
+    """
+    if band is None:
+        if options.region is not None:
+            return image
+        band = options.number_band
+    return image.crop(region_box(band, image.width, image.height))
+
+def ocr_number_band(image, options, band=None):
+    """第一层：在号码区域用快速模型做仅含数字的单行识别，返回有效的身份证号码或None"""
+    band = crop_to_number_band(image, options, band)
+    backend = get_backend(options.ocr_backend)
+    text = backend.image_to_string(band, options.fast_lang, psm=options.fast_psm, whitelist=FAST_WHITELIST)
+    return find_valid_id_number(text)
+
+def rotate_image(image, angle):
+    """按90°的倍数逆时针旋转图像"""
+    if angle == 90:
+        return image.transpose(Image.Transpose.ROTATE_90)
+    if angle == 180:
+        return image.transpose(Image.Transpose.ROTATE_180)
+    if angle == 270:
+        return image.transpose(Image.Transpose.ROTATE_270)
+    return image
+
+def image_template(image_path):
+    """图像文件的扫描仪/模板标识：格式、尺寸和EXIF中的设备型号，只读取文件头"""
+    with Image.open(image_path) as image:
+        exif = image.getexif()
+        return ('image', image.format, image.size, exif.get(0x010F), exif.get(0x0110))
+
+def page_template(doc, page):
+    """PDF页面的扫描仪/模板标识：生成软件和页面尺寸"""
+    metadata = doc.metadata or {}
+    return ('pdf', metadata.get('producer'), metadata.get('creator'),
+            round(page.rect.width), round(page.rect.height))
+
+def remember_orientation(template, angle):
+    if template is None:
+        return
+    if template not in _orientation_hints and len(_orientation_hints) >= ORIENTATION_HINTS_LIMIT:
+        _orientation_hints.clear()
+    _orientation_hints[template] = angle
+
+def detect_orientation(image, options, skip_angles):
+    """在缩小的图像上依次尝试各个旋转角度，只识别号码区域，返回 (角度, 号码)；都失败时返回 (None, None)
+    
+    每个角度只做一次仅含数字的单行识别，比对整页做方向检测或四个方向的全页识别代价小得多。
+    """
+    small = image.copy()
+    small.thumbnail((ORIENTATION_MAX_SIDE, ORIENTATION_MAX_SIDE))
+    for angle in (0,) + ORIENTATION_ANGLES:
+        if angle in skip_angles:
+            continue
+        with Timer() as timer:
+            id_number = ocr_number_band(rotate_image(small, angle), options)
+        STATS.record('orientation', timer, hit=id_number is not None)
+        if id_number:
+            return angle, id_number
+    return None, None
+
+def ocr_image(image, options, template=None, detect=True):
+    """对图像进行OCR识别
+    
+    启用预处理时先预处理图像，启用两层识别时先尝试快速识别号码区域。
+    启用自动旋转时，同一扫描仪/模板（template）上次使用的旋转角度优先；
+    没有识别出有效号码时，在号码区域尝试其他旋转角度，并记住成功的角度。
+    两层识别时方向检测在第一层之后、全页识别之前进行，全页识别只按检测到或记住的角度做一次。
+    detect 为False时不做方向检测（自适应分辨率在更高分辨率重新识别时，检测结果不会改变）。
+    """
+    if options.preprocess:
+        with Timer() as timer:
+            image = preprocess_image(image, options.char_height, options.binarize, options.deskew, options.crop_content)
+        STATS.record('preprocess', timer)
+    
+    if not options.auto_rotate:
+        return ocr_upright(image, options)
+    
+    hint = _orientation_hints.get(template, 0)
+    if options.cascade:
+        id_number = ocr_number_tiers(rotate_image(image, hint), options)
+        if id_number:
+            return id_number
+        if detect:
+            id_number = detect_rotation(image, options, template, hint)
+            if id_number:
+                return id_number
+        return ocr_full_page(rotate_image(image, hint), options)
+    
+    text = ocr_full_page(rotate_image(image, hint), options)
+    if find_valid_id_number(text) is not None or not detect:
+        return text
+    id_number = detect_rotation(image, options, template, hint)
+    return text + "\n" + id_number if id_number else text
+
+def detect_rotation(image, options, template, hint):
+    """检测记住的角度以外的旋转角度，成功时记住该角度并返回识别出的号码，否则返回None"""
+    angle, id_number = detect_orientation(image, options, skip_angles=(hint,))
+    if angle is None:
+        return None
+    if angle:
+        print(f"图像旋转{angle}°后识别出身份证号码")
+    remember_orientation(template, angle)
+    return id_number
+
+def ocr_upright(image, options):
+    """按图像当前的方向识别，启用两层识别时先尝试快速识别号码区域"""
+    if options.cascade:
+        id_number = ocr_number_tiers(image, options)
+        if id_number:
+            return id_number
+    return ocr_full_page(image, options)
+
+def ocr_number_tiers(image, options):
+    """第一层识别：先尝试同一模板已经确认过的号码区域，再尝试默认的号码区域，返回有效号码或None"""
+    template_band = layout_band(layout_key(image)) if options.auto_region else None
+    if template_band is not None:
+        with Timer() as timer:
+            id_number = ocr_number_band(image, options, template_band)
+        STATS.record('ocr_tier1@布局模板', timer, hit=id_number is not None)
+        if id_number:
+            return id_number
+    
+    with Timer() as timer:
+        id_number = ocr_number_band(image, options)
+    STATS.record('ocr_tier1', timer, hit=id_number is not None)
+    return id_number
+
+def ocr_full_page(image, options):
+    """第二层：全页识别；启用自动定位时见 ocr_with_layout"""
+    if options.auto_region:
+        return ocr_with_layout(image, options)
+    
+    with Timer() as timer:
+        text = get_backend(options.ocr_backend).image_to_string(image, options.lang)
+    STATS.record('ocr_tier2', timer, hit=find_valid_id_number(text) is not None)
+    return text
+
+def ocr_with_layout(image, options):
+    """全页识别，同时取得单词位置，推算号码区域并记入布局模板
+    
+    一次 image_to_data 同时得到文本和单词位置，与 image_to_string 的识别代价相同。
+    识别出号码时，号码所在的单词就是号码区域；没有识别出号码但找到了"公民身份号码"标签时，
+    在标签右侧的区域再做一次快速识别。只有确认得到有效号码的区域才会记入模板。
+    """
+    with Timer() as timer:
+        words = get_backend(options.ocr_backend).image_to_data(image, options.lang)
+        text = words_to_text(words)
+    id_number = find_valid_id_number(text)
+    STATS.record('ocr_tier2', timer, hit=id_number is not None)
+    
+    with Timer() as timer:
+        band, _ = find_number_band(words, image.size, id_number)
+        if band is not None and id_number is None:
+            id_number = ocr_number_band(image, options, band)
+            if id_number:
+                text += "\n" + id_number
+        found = band is not None and id_number is not None
+        if found:
+            remember_layout(layout_key(image), band)
+    STATS.record('layout', timer, hit=found)
+    return text
+
+def pillow_version():
+    """Pillow的 (主版本号, 次版本号)，无法解析时返回None"""
+    try:
+        return tuple(int(part) for part in PIL.__version__.split('.')[:2])
+    except (AttributeError, ValueError):
+        return None
+
+def tiles_supported(image):
+    """能否安全地改写图像的 tile：Pillow版本在验证过的范围内，每个分块都是 (解码器, 范围, 偏移, 参数)"""
+    version = pillow_version()
+    low, high = CROP_DECODE_PILLOW_VERSIONS
+    if version is None or not low <= version <= high or not hasattr(image, '_size'):
+        return False
+    for tile in image.tile:
+        if not isinstance(tile, tuple) or len(tile) != 4:
+            return False
+        extents = tile[1]
+        if not isinstance(extents, (tuple, list)) or len(extents) != 4 or not all(isinstance(v, int) for v in extents):
+            return False
+    return True
+
+def crop_before_decode(image, box):
+    """在解码前去掉与裁剪区域无关的数据，返回裁剪区域在将要解码的图像中的位置
+    
+    由多个条带或分块组成的图像只保留与区域相交的分块；未压缩、按行连续存储的图像
+    （BMP、未压缩的TIFF）只解码区域所在的行，位图也只分配这些行的内存。
+    Pillow版本不在验证过的范围内或 tile 的结构与预期不同时不做任何改动，
+    原样返回 box，由解码后的 crop 裁剪。
+    """
+    if not tiles_supported(image):
+        return box
+    if len(image.tile) > 1:
+        image.tile = [tile for tile in image.tile
+                      if tile[1][0] < box[2] and tile[1][2] > box[0] and tile[1][1] < box[3] and tile[1][3] > box[1]]
+        return box
+    
+    if len(image.tile) != 1:
+        return box
+    name, extents, offset, args = image.tile[0]
+    width, height = image.size
+    if name != 'raw' or tuple(extents) != (0, 0, width, height) or not isinstance(args, tuple) or len(args) != 3:
+        return box
+    rawmode, stride, orientation = args
+    stride = stride or width * RAW_BYTES_PER_PIXEL.get(rawmode, 0)
+    if not stride or orientation not in (1, -1):
+        return box
+    
+    x1, y1, x2, y2 = box
+    # 超出图像范围的区域交给 crop 按原来的方式补齐
+    if not 0 <= y1 < y2 <= height:
+        return box
+    # 自下而上存储的图像（BMP）从区域的最后一行开始读取
+    offset += y1 * stride if orientation == 1 else (height - y2) * stride
+    image._size = (width, y2 - y1)
+    image.tile = [(name, (0, 0, width, y2 - y1), offset, (rawmode, stride, orientation))]
+    return (x1, 0, x2, y2 - y1)
+
+def load_image(image_path, options):
+    """按识别需要的分辨率解码图像文件，返回裁剪到识别区域后的图像
+    
+    Image.open 只读取文件头，像素在 load() 时才解码，因此可以在解码前决定解码方式：
+    JPEG在需要的分辨率较低时用draft模式按1/2、1/4、1/8直接缩小解码，需要灰度时直接解码为灰度；
+    其他格式在可能时只解码识别区域所在的部分，见 crop_before_decode。
+    """
+    image = Image.open(image_path)
+    width, height = image.size
+    region = region_box(options.region, width, height) if options.region is not None else None
+    region_width, region_height = (region[2] - region[0], region[3] - region[1]) if region else (width, height)
+    
+    if image.format == 'JPEG':
+        mode = 'L' if (options.grayscale or options.preprocess) and image.mode in ('RGB', 'L') else image.mode
+        reduce = 1.0
+        if options.max_image_side:
+            reduce = min(1.0, options.max_image_side / max(region_width, region_height))
+        image.draft(mode, (max(1, int(width * reduce)), max(1, int(height * reduce))))
+    
+    # draft缩小解码后，识别区域按同样的比例换算
+    scale_x, scale_y = image.size[0] / width, image.size[1] / height
+    box = None
+    if region is not None:
+        x1, y1, x2, y2 = region
+        box = (int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y))
+        box = crop_before_decode(image, box)
+    
+    with Timer() as timer:
+        image.load()
+    STATS.record('image_decode', timer, memory=image.width * image.height * len(image.getbands()))
+    STATS.count(size=image.size)
+    
+    if box is not None:
+        image = image.crop(box)
+    if options.max_image_side and max(image.size) > options.max_image_side:
+        image.thumbnail((options.max_image_side, options.max_image_side), Image.Resampling.LANCZOS)
+    return image
+
+def extract_text_from_image(image_path, options=None):
     """从图像中提取文本"""
+    options = options or ExtractOptions()
     try:
-        image = Image.open(image_path)
-        text = pytesseract.image_to_string(image, lang='chi_sim')
+        STATS.count(pages=1)
+        image = load_image(image_path, options)
+        template = image_template(image_path) if options.auto_rotate else None
+        text = ocr_image(image, options, template)
         return text
     except Exception as e:
         print(f"处理图像时出错: {image_path}, 错误: {e}")
         return ""
 
-def extract_text_from_pdf(pdf_path):
+def render_pdf_page(page, options, dpi=None):
+    """按指定分辨率将PDF页面渲染为图像"""
+    dpi = dpi or options.dpi
+    zoom = dpi / 72
+    colorspace = fitz.csGRAY if options.grayscale else fitz.csRGB
+    with Timer() as timer:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False)
+        img = Image.frombytes("L" if options.grayscale else "RGB", [pix.width, pix.height], pix.samples)
+    STATS.record(f'page_render@{dpi}dpi', timer, memory=len(pix.samples))
+    STATS.count(size=(pix.width, pix.height))
+    return crop_to_region(img, options)
+
+def extract_page_image(doc, page):
+    """页面只有一张铺满页面的图像时，按原始分辨率直接取出该图像，否则返回None
+    
+    扫描件的页面通常只是包了一层的JPEG/JBIG2/CCITT图像，直接解码图像数据比渲染页面
+    更快，也不会损失分辨率。图像有旋转、镜像或透明蒙版时返回None，由渲染处理。
+    """
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref, smask = images[0][0], images[0][1]
+    if smask:
+        return None
+    
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+    if abs(matrix.b) > 1e-3 or abs(matrix.c) > 1e-3 or matrix.a < 0 or matrix.d < 0:
+        return None
+    if rect.get_area() < page.rect.get_area() * EMBEDDED_IMAGE_MIN_COVERAGE:
+        return None
+    
+    info = doc.extract_image(xref)
+    if info and info.get('ext') in PIL_IMAGE_EXTENSIONS:
+        img = Image.open(io.BytesIO(info['image']))
+    else:
+        # JBIG2等Pillow不支持的格式由MuPDF解码
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.n not in (1, 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        img = Image.frombytes("L" if pix.n == 1 else "RGB", [pix.width, pix.height], pix.samples)
+    
+    if page.rotation:
+        img = img.rotate(-page.rotation, expand=True)
+    return img
+
+def ocr_pdf_page(doc, page, options):
+    """对PDF扫描页进行OCR识别
+    
+    优先直接取出嵌入的扫描图像；否则渲染页面，启用自适应分辨率时先用低分辨率，
+    没有识别出校验位正确的号码才用更高的分辨率重新渲染。
+    """
+    template = page_template(doc, page) if options.auto_rotate else None
+    if options.embedded_images:
+        with Timer() as timer:
+            img = extract_page_image(doc, page)
+        if img is not None:
+            STATS.record('page_embedded', timer)
+            STATS.count(size=img.size)
+            return ocr_image(crop_to_region(img, options), options, template)
+    
+    dpis = options.render_dpis()
+    text = ""
+    for dpi in dpis:
+        img = render_pdf_page(page, options, dpi)
+        with Timer() as timer:
+            # 方向检测在缩小的图像上进行，只在第一个分辨率做一次
+            text = ocr_image(img, options, template, detect=dpi == dpis[0])
+        found = find_valid_id_number(text) is not None
+        STATS.record(f'ocr_page@{dpi}dpi', timer, hit=found)
+        if found:
+            break
+    return text
+
+def has_text_layer(text):
+    """判断页面文本层是否可用：文字足够多，或者已经包含有效的身份证号码"""
+    return len(text.strip()) >= PAGE_TEXT_MIN_CHARS or find_valid_id_number(text) is not None
+
+def iter_pdf_pages(pdf_path, options, start=0, stop=None, stop_at=None):
+    """逐页提取PDF文本，只打开一次文档
+    
+    每一页单独判断：有可用文本层的页面直接读取文本，否则渲染后进行OCR识别。
+    指定 start/stop 时只处理这些页面（不包括 stop），用于把一个文档分段交给多个进程；
+    stop_at 为跨进程共享的页码上限（见 PageLimits），其他进程找到号码后降低，处理到该页时停止。
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        scanned_notice = False
+        stop = page_limit(len(doc), options) if stop is None else stop
+        for page_num in range(start, stop):
+            if stop_at is not None and page_num >= stop_at.value:
+                break
+            page = doc.load_page(page_num)
+            with Timer() as timer:
+                text = page.get_text()
+            STATS.record('text_layer', timer)
+            STATS.count(pages=1)
+            if has_text_layer(text):
+                yield text
+                continue
+            
+            if not scanned_notice:
+                print(f"PDF {pdf_path} 第{page_num + 1}页没有可用的文本层，尝试OCR识别...")
+                scanned_notice = True
+            yield text + ocr_pdf_page(doc, page, options)
+    finally:
+        doc.close()
+
+def iter_pdf_ocr_pages(pdf_path, options):
+    """逐页渲染PDF并进行OCR识别"""
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(page_limit(len(doc), options)):
+            page = doc.load_page(page_num)
+            yield ocr_pdf_page(doc, page, options)
+    finally:
+        doc.close()
+
+def page_limit(page_count, options):
+    """根据页数上限计算需要处理的页数"""
+    if options.max_pages is None:
+        return page_count
+    return min(page_count, options.max_pages)
+
+def collect_page_texts(pages, options):
+    """逐页累积文本，启用提前结束时找到有效的身份证号码后立即停止，返回 (文本, 是否找到)
+    
+    只有校验位和出生日期都正确的号码才会结束处理；各页的候选号码最后在全部文本中统一评分选择。
+    """
+    text = ""
+    try:
+        for page_text in pages:
+            text += page_text
+            if options.early_exit and find_valid_id_number(page_text):
+                return text, True
+    finally:
+        pages.close()
+    return text, False
+
+def extract_text_from_pdf(pdf_path, options=None):
     """从PDF中提取文本"""
+    options = options or ExtractOptions()
     try:
-        # 尝试使用PyPDF2直接提取文本
-        text = ""
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(reader.pages)):
-                text += reader.pages[page_num].extract_text() or ""
-        
-        # 如果文本为空或很少，说明PDF可能是扫描件，使用PyMuPDF提取图像
-        if len(text.strip()) < 50:
-            print(f"PDF {pdf_path} 可能是扫描件，尝试提取图像...")
-            text = extract_text_from_pdf_images(pdf_path)
-        
+        text, _ = collect_page_texts(iter_pdf_pages(pdf_path, options), options)
         return text
     except Exception as e:
         print(f"处理PDF时出错: {pdf_path}, 错误: {e}")
         return ""
 
-def extract_text_from_pdf_images(pdf_path):
+def extract_text_from_pdf_images(pdf_path, options=None):
     """从PDF中提取图像并进行OCR识别"""
+    options = options or ExtractOptions()
     try:
-        text = ""
-        doc = fitz.open(pdf_path)
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            text += pytesseract.image_to_string(img, lang='chi_sim')
-        doc.close()
+        text, _ = collect_page_texts(iter_pdf_ocr_pages(pdf_path, options), options)
         return text
     except Exception as e:
         print(f"从PDF提取图像时出错: {pdf_path}, 错误: {e}")
@@ -64,53 +644,808 @@ def find_id_card_number(text):
     match = re.search(ID_CARD_PATTERN, text)
     return match.group(0) if match else None
 
-def process_file(file_path):
-    """处理单个文件，识别身份证号码并重命名"""
+def find_valid_id_number(text):
+    """在文本中选出得分最高的有效身份证号码
+    
+    收集所有候选号码并纠正常见的OCR混淆（O/0、l/1、B/8等），只接受校验位和出生日期
+    都正确的号码，详见 id_candidates。没有有效号码时返回None。
+    """
+    return select_id_number(text)
+
+def page_id_numbers(pdf_path, options, start, stop):
+    """识别PDF第 start 到 stop-1 页，返回每一页的有效身份证号码（没有时为None）
+    
+    每一页单独判断是否需要OCR，不在找到号码后提前结束；每次调用独立打开文档，可以在子进程中执行。
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        id_numbers = []
+        for page_num in range(start, stop):
+            page = doc.load_page(page_num)
+            text = page.get_text()
+            if not has_text_layer(text):
+                text += ocr_pdf_page(doc, page, options)
+            id_numbers.append(find_valid_id_number(text))
+        return id_numbers
+    finally:
+        doc.close()
+
+def extract_text(file_path, options):
+    """根据文件类型提取文本"""
+    if file_path.suffix.lower() == '.pdf':
+        return extract_text_from_pdf(file_path, options)
+    elif file_path.suffix.lower() in SUPPORTED_IMAGE_SUFFIXES:
+        return extract_text_from_image(file_path, options)
+    return ""
+
+def recognize_file(file_path, options=None, content_hash=None):
+    """识别单个文件中的身份证号码，不做重命名，返回 (文本, 身份证号码)
+    
+    启用缓存时，内容和识别参数都相同的文件直接返回上次的结果，不再进行OCR。
+    已经计算过文件内容哈希时可以通过 content_hash 传入，避免重复读取文件。
+    """
     file_path = Path(file_path)
+    options = options or ExtractOptions()
+    
+    cache_key, cached_text = lookup_cache(file_path, options, content_hash)
+    if cached_text is not None:
+        return cached_text, search_id_number(cached_text)
+    
+    text = extract_text(file_path, options)
+    id_number = search_id_number(text)
+    store_cache(file_path, options, cache_key, text, id_number)
+    return text, id_number
+
+def search_id_number(text, trace=None):
+    """在识别出的文本中查找有效号码，记入 id_search 阶段
+    
+    在主进程中合并分段结果时当前文件没有正在记录，此时通过 trace 传入该文件的记录。
+    """
+    with Timer() as timer:
+        id_number = find_valid_id_number(text)
+    STATS.record('id_search', timer)
+    if trace is not None:
+        add_trace_stage(trace, 'id_search', timer.seconds)
+        trace['seconds'] += timer.seconds
+    return id_number
+
+def lookup_cache(file_path, options, content_hash=None):
+    """查询识别缓存，返回 (缓存键, 缓存的文本)；未启用缓存或出错时缓存键为None，未命中时文本为None"""
+    cache = get_cache(options)
+    if cache is None:
+        return None, None
+    try:
+        cache_key = cache.make_key(content_hash or file_sha256(file_path), options.ocr_params())
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"命中识别缓存: {file_path}")
+            # 缓存的是识别出的文本，号码由调用者按当前的规则重新选择
+            return cache_key, cached[0]
+        return cache_key, None
+    except Exception as e:
+        print(f"读取识别缓存时出错: {file_path}, 错误: {e}")
+        return None, None
+
+def store_cache(file_path, options, cache_key, text, id_number):
+    """写入识别缓存；空文本可能是识别出错导致的，不写入"""
+    if cache_key is None or not text.strip():
+        return
+    try:
+        get_cache(options).put(cache_key, text, id_number)
+    except Exception as e:
+        print(f"写入识别缓存时出错: {file_path}, 错误: {e}")
+
+def resolve_target(file_path, id_number, resolver=None):
+    """选择重命名的目标路径，返回 (状态, 目标路径)
+    
+    指定 resolver（rename_plan.TargetResolver）时在内存中判断文件名冲突，并按其冲突策略选择目标；
+    否则直接检查目标文件是否存在。
+    """
+    if resolver is not None:
+        return resolver.resolve(file_path, id_number)
+    
+    new_path = file_path.parent / f"{id_number}{file_path.suffix}"
+    
+    # 检查是否有重名文件
+    if new_path.exists() and file_path != new_path:
+        return STATUS_TARGET_EXISTS, new_path
+    
+    if file_path == new_path:
+        return STATUS_ALREADY_NAMED, new_path
+    
+    return STATUS_PLANNED, new_path
+
+def rename_to_id(file_path, id_number, resolver=None):
+    """将文件重命名为身份证号码，返回 (状态, 目标路径)，状态见 rename_journal 中的 STATUS_*"""
+    status, new_path = resolve_target(file_path, id_number, resolver)
+    
+    if status == STATUS_TARGET_EXISTS:
+        print(f"目标文件已存在，无法重命名: {new_path}")
+        return status, new_path
+    
+    if status == STATUS_ALREADY_NAMED:
+        print(f"文件已经以身份证号码命名: {file_path}")
+        return status, new_path
+    
+    while True:
+        try:
+            # 按子目录策略解决冲突时，目标可能在新的子目录中
+            if new_path.parent != file_path.parent:
+                new_path.parent.mkdir(exist_ok=True)
+            move_no_replace(file_path, new_path)
+        except FileExistsError:
+            # 选择目标之后才出现的同名文件：记为已占用，按冲突策略重新选择（跳过策略直接放弃）
+            if resolver is None:
+                print(f"目标文件已存在，无法重命名: {new_path}")
+                return STATUS_TARGET_EXISTS, new_path
+            resolver.claim(new_path)
+            status, retry_path = resolver.resolve(file_path, id_number)
+            if status != STATUS_PLANNED:
+                print(f"目标文件已存在，无法重命名: {new_path}")
+                return STATUS_TARGET_EXISTS, new_path
+            new_path = retry_path
+            continue
+        except Exception as e:
+            print(f"重命名失败: {file_path}, 错误: {e}")
+            return STATUS_RENAME_FAILED, new_path
+        if resolver is not None:
+            resolver.claim(new_path)
+        print(f"重命名成功: {file_path} -> {new_path}")
+        return STATUS_RENAMED, new_path
+
+def rename_file(file_path, id_number, resolver=None):
+    """将文件重命名为身份证号码"""
+    status, _ = rename_to_id(file_path, id_number, resolver)
+    return status in SUCCESS_STATUSES
+
+def check_file(file_path):
+    """检查文件是否存在且类型受支持"""
     if not file_path.exists():
         print(f"文件不存在: {file_path}")
         return False
     
-    print(f"正在处理: {file_path}")
-    
-    # 根据文件类型提取文本
-    text = ""
-    if file_path.suffix.lower() == '.pdf':
-        text = extract_text_from_pdf(file_path)
-    elif file_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']:
-        text = extract_text_from_image(file_path)
-    else:
+    if file_path.suffix.lower() not in SUPPORTED_SUFFIXES:
         print(f"不支持的文件类型: {file_path}")
         return False
     
-    # 查找身份证号码
-    id_number = find_id_card_number(text)
+    return True
+
+def apply_result(file_path, id_number, resolver=None):
+    """根据识别结果重命名文件"""
     if not id_number:
         print(f"未找到身份证号码: {file_path}")
         return False
     
-    # 重命名文件
-    new_path = file_path.parent / f"{id_number}{file_path.suffix}"
-    
-    # 检查是否有重名文件
-    if new_path.exists() and file_path != new_path:
-        print(f"目标文件已存在，无法重命名: {new_path}")
+    return rename_file(file_path, id_number, resolver)
+
+def process_file(file_path, options=None, resolver=None, metrics=None):
+    """处理单个文件，识别身份证号码并重命名"""
+    file_path = Path(file_path)
+    if not check_file(file_path):
         return False
     
-    if file_path == new_path:
-        print(f"文件已经以身份证号码命名: {file_path}")
-        return True
+    print(f"正在处理: {file_path}")
+    
+    # 查找身份证号码
+    if metrics is None:
+        _, id_number = recognize_file(file_path, options)
+        return apply_result(file_path, id_number, resolver)
+    result = recognize_task(file_path, options or ExtractOptions())
+    return finish_result(result, None, resolver, metrics) in SUCCESS_STATUSES
+
+def recognize_task(file_path, options, need_hash=False, skip_files=None, content_hash=None):
+    """识别单个文件，返回结果字典（路径、内容哈希、号码、识别出的文本等），可以在子进程中执行
     
+    need_hash 为True时计算文件内容哈希，已经计算过时可以通过 content_hash 传入；在 skip_files 中的文件
+    （断点续传时日志中已经完成的文件，见 rename_journal.completed_files）直接跳过，不做识别。
+    """
+    result = {'path': file_path, 'hash': content_hash, 'id_number': None, 'text': "", 'skipped': False}
+    if options.trace:
+        STATS.begin_trace(file_path)
     try:
-        file_path.rename(new_path)
-        print(f"重命名成功: {file_path} -> {new_path}")
-        return True
+        if (need_hash or skip_files) and result['hash'] is None:
+            result['hash'] = file_sha256(file_path)
+        if skip_files and journal_key(result['hash'], file_path) in skip_files:
+            result['skipped'] = True
+        else:
+            result['text'], result['id_number'] = recognize_file(file_path, options, result['hash'])
     except Exception as e:
-        print(f"重命名失败: {file_path}, 错误: {e}")
-        return False
+        print(f"处理文件时出错: {file_path}, 错误: {e}")
+        result['error'] = str(e)
+    finally:
+        if options.trace:
+            result['trace'] = STATS.end_trace()
+    return result
+
+def finish_result(result, journal=None, resolver=None, metrics=None):
+    """在主进程中根据识别结果重命名文件并写入日志，返回处理状态，目标路径记录在结果字典的 target 中
+    
+    指定 metrics（instrumentation.FileMetrics）时记录该文件的处理结果和各阶段耗时，包括重命名。
+    """
+    file_path, id_number = result['path'], result['id_number']
+    with Timer() as timer:
+        if not id_number:
+            print(f"未找到身份证号码: {file_path}")
+            status, target = STATUS_NO_ID, None
+        else:
+            status, target = rename_to_id(file_path, id_number, resolver)
+        
+        if journal is not None:
+            journal.record(file_path, result['hash'], id_number, target, status)
+    result['target'] = target
+    if id_number:
+        STATS.record('rename', timer)
+    if metrics is not None:
+        trace = result.get('trace')
+        if trace is not None and id_number:
+            add_trace_stage(trace, 'rename', timer.seconds)
+            trace['seconds'] += timer.seconds
+        record_metrics(metrics, result, status)
+    return status
+
+def record_metrics(metrics, result, status):
+    """记录一个文件的处理结果；识别出错时失败原因为 error，其余失败以状态作为原因"""
+    error = result.get('error')
+    if status in SUCCESS_STATUSES or status == STATUS_PLANNED:
+        reason = None
+    else:
+        reason = 'error' if error else status
+    metrics.record(result['path'], result.get('trace'), status, result['id_number'], reason, error)
+
+def plan_result(result, resolver, metrics=None):
+    """在主进程中根据识别结果生成重命名计划条目，不修改任何文件"""
+    file_path, id_number = result['path'], result['id_number']
+    if not id_number:
+        status, target = STATUS_NO_ID, None
+    else:
+        status, target = resolver.resolve(file_path, id_number)
+    entry = plan_entry(file_path, result['hash'], id_number, status, target)
+    print_entry(entry)
+    if metrics is not None:
+        record_metrics(metrics, result, status)
+    return entry
+
+def execute_plan(entries, journal=None):
+    """执行重命名计划并写入日志，返回 (成功数, 失败数)"""
+    success_count = 0
+    fail_count = 0
+    for entry in entries:
+        if entry['status'] == STATUS_PLANNED:
+            continue
+        if entry['status'] in SUCCESS_STATUSES:
+            success_count += 1
+        else:
+            fail_count += 1
+        if journal is not None:
+            journal.record(entry['source'], entry.get('hash'), entry['id_number'], entry['target'], entry['status'])
+    
+    def on_applied(entry, status):
+        if journal is not None:
+            journal.record(entry['source'], entry.get('hash'), entry['id_number'], entry['target'], status)
+    
+    applied_success, applied_fail = apply_plan(entries, on_applied)
+    return success_count + applied_success, fail_count + applied_fail
+
+def apply_plan_file(plan_path, journal_path=None):
+    """执行之前生成的重命名计划文件"""
+    entries = read_plan(plan_path)
+    print(f"正在执行重命名计划: {plan_path}")
+    journal = RenameJournal(journal_path) if journal_path else None
+    try:
+        success_count, fail_count = execute_plan(entries, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+    print(f"计划执行完成，共{len(entries)}个文件，成功: {success_count}，失败: {fail_count}")
+
+def _init_worker(tesseract_cmd, options, need_hash, skip_files, memory_limit_mb=None):
+    """子进程初始化：同步Tesseract路径和识别参数（spawn方式启动时不会继承主进程设置），设置内存上限"""
+    global _worker_options, _worker_need_hash, _worker_skip_files
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    PROFILER.cancel()
+    # 以fork方式启动时不使用主进程中替换的输出（如GUI的日志窗口），子进程的输出写到标准输出
+    sys.stdout = sys.__stdout__
+    if memory_limit_mb:
+        limit_memory(memory_limit_mb)
+    _worker_options = options
+    _worker_need_hash = need_hash
+    _worker_skip_files = skip_files
+
+def _worker_call(func, *args):
+    """在子进程中执行任务，返回 (返回值, cProfile统计)；没有启用性能分析时统计为None"""
+    if _worker_options.profile:
+        return profile_call(func, *args)
+    return func(*args), None
+
+def _worker_result(result, profile=None):
+    """在子进程的结果中附带识别统计增量、性能分析统计和子进程的内存峰值"""
+    result['stats'] = STATS.snapshot_and_reset()
+    result['profile'] = profile
+    result['pid'] = os.getpid()
+    result['peak_memory'] = peak_memory()
+    return result
+
+def _recognize_worker(file_path, content_hash=None):
+    """在子进程中识别文件，返回结果字典"""
+    result, profile = _worker_call(recognize_task, file_path, _worker_options, _worker_need_hash, _worker_skip_files,
+                                   content_hash)
+    return _worker_result(result, profile)
+
+def _recognize_pages(file_path, start, stop, stop_at=None):
+    try:
+        return collect_page_texts(iter_pdf_pages(file_path, _worker_options, start, stop, stop_at), _worker_options)
+    except Exception as e:
+        print(f"处理PDF时出错: {file_path} 第{start + 1}-{stop}页, 错误: {e}")
+        return "", False
+
+def _pages_worker(file_path, start, stop, stop_at=None):
+    """在子进程中识别PDF的一段页面，返回该段的文本和是否找到有效号码"""
+    if _worker_options.trace:
+        STATS.begin_trace(file_path)
+    (text, found), profile = _worker_call(_recognize_pages, file_path, start, stop, stop_at)
+    return _worker_result({'text': text, 'found': found, 'trace': STATS.end_trace()}, profile)
+
+def _pages_prepare_worker(file_path):
+    """在子进程中为分段识别做准备：计算内容哈希，检查断点续传日志和识别缓存
+    
+    大文件的哈希不在主进程中计算，提交任务的主进程不会因此停顿。
+    """
+    if _worker_options.trace:
+        STATS.begin_trace(file_path)
+    prepared = {'hash': None, 'skipped': False, 'cache_key': None, 'text': None, 'error': None}
+    try:
+        if _worker_need_hash or _worker_skip_files:
+            prepared['hash'] = file_sha256(file_path)
+        if _worker_skip_files and journal_key(prepared['hash'], file_path) in _worker_skip_files:
+            prepared['skipped'] = True
+        else:
+            prepared['cache_key'], prepared['text'] = lookup_cache(file_path, _worker_options, prepared['hash'])
+    except Exception as e:
+        prepared['error'] = str(e)
+    prepared['trace'] = STATS.end_trace()
+    return _worker_result(prepared)
+
+class FileTask:
+    """整个文件作为一个任务交给进程池识别"""
+
+    def __init__(self, executor, file_path):
+        self.future = executor.submit(_recognize_worker, file_path)
+
+    def done(self):
+        return self.future.done()
+
+    def cancel(self):
+        self.future.cancel()
+
+    def result(self):
+        return _merge_result(self.future.result())
+
+class PageLimits:
+    """分段识别时各PDF跨进程共享的页码上限，第一次使用时才启动 multiprocessing 的 Manager 进程"""
+
+    def __init__(self):
+        self.manager = None
+
+    def create(self, page_count):
+        if self.manager is None:
+            self.manager = multiprocessing.Manager()
+        return self.manager.Value('i', page_count)
+
+    def shutdown(self):
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+def _chunk_found(future):
+    """分段任务已经完成并且找到了有效号码"""
+    return not future.cancelled() and future.exception() is None and future.result()['found']
+
+class PageTasks:
+    """把一个多页PDF按页面分段交给进程池，各段由不同的子进程独立打开文档并行识别
+    
+    先由一个子进程计算内容哈希、检查断点续传日志和识别缓存，需要识别时再按页码顺序提交各段，
+    同一文件同时最多有 jobs 段在识别，前面的段完成后再提交后面的段。结果按页码顺序合并，
+    与串行识别得到的文本相同。启用提前结束时，某一段找到有效号码后立即（在完成回调中）
+    取消后面还没有开始的段，并通过共享的页码上限（见 PageLimits）让正在识别后面页面的子进程
+    在下一页之前停止。
+    """
+
+    def __init__(self, executor, file_path, page_count, options, jobs=1, limits=None):
+        self.executor = executor
+        self.file_path = file_path
+        self.page_count = page_count
+        self.options = options
+        self.max_running = max(1, jobs)
+        # 保护以下状态；完成回调在进程池的管理线程中执行
+        self.changed = threading.Condition()
+        self.chunks = []
+        self.next_start = 0
+        # 不再提交新的段：已经找到号码、不需要识别或者已经取消
+        self.closed = False
+        self.found_stop = page_count
+        self.stop_at = limits.create(page_count) if limits is not None and options.early_exit else None
+        self.record = {'path': file_path, 'hash': None, 'id_number': None, 'text': "", 'skipped': False}
+        self.prepare = executor.submit(_pages_prepare_worker, str(file_path))
+        self.prepare.add_done_callback(self._on_prepared)
+
+    def _prepared(self):
+        """准备任务的结果，准备失败或被取消时返回None"""
+        if self.prepare.cancelled() or self.prepare.exception() is not None:
+            return None
+        return self.prepare.result()
+
+    def _needs_ocr(self, prepared):
+        return prepared is not None and not (prepared['error'] or prepared['skipped'] or prepared['text'] is not None)
+
+    def _on_prepared(self, future):
+        if self._needs_ocr(self._prepared()):
+            self._submit_more()
+        else:
+            with self.changed:
+                self.closed = True
+                self.changed.notify_all()
+
+    def _submit_more(self):
+        """按页码顺序提交后面的段，直到该文件同时识别的段数达到上限"""
+        submitted = []
+        with self.changed:
+            running = sum(1 for future in self.chunks if not future.done())
+            while not self.closed and self.next_start < self.page_count and running < self.max_running:
+                stop = min(self.next_start + PAGE_TASK_PAGES, self.page_count)
+                try:
+                    future = self.executor.submit(_pages_worker, str(self.file_path), self.next_start, stop, self.stop_at)
+                except RuntimeError:
+                    # 进程池已经关闭（停止处理）
+                    self.closed = True
+                    break
+                self.chunks.append(future)
+                submitted.append(future)
+                self.next_start = stop
+                running += 1
+            self.changed.notify_all()
+        # 在锁外注册回调：已经完成的任务会立即调用回调
+        for future in submitted:
+            future.add_done_callback(self._on_chunk_done)
+
+    def _on_chunk_done(self, future):
+        if not (self.options.early_exit and _chunk_found(future)):
+            self._submit_more()
+            return
+        with self.changed:
+            self.closed = True
+            index = self.chunks.index(future)
+            later = self.chunks[index + 1:]
+            stop = min(index * PAGE_TASK_PAGES + PAGE_TASK_PAGES, self.page_count)
+            self.found_stop = min(self.found_stop, stop)
+            found_stop = self.found_stop
+            self.changed.notify_all()
+        for later_future in later:
+            later_future.cancel()
+        self._lower_stop_at(found_stop)
+
+    def _lower_stop_at(self, page):
+        if self.stop_at is None:
+            return
+        try:
+            self.stop_at.value = min(self.stop_at.value, page)
+        except Exception:
+            # Manager 已经关闭
+            pass
+
+    def done(self):
+        """结果已经确定：不需要识别、所有段都已完成，或者启用提前结束时前面的某一段已经找到有效号码"""
+        if not self.prepare.done():
+            return False
+        if not self._needs_ocr(self._prepared()):
+            return True
+        with self.changed:
+            chunks = list(self.chunks)
+            complete = self.closed or self.next_start >= self.page_count
+        for future in chunks:
+            if not future.done():
+                return False
+            if self.options.early_exit and _chunk_found(future):
+                return True
+        return complete
+
+    def cancel(self):
+        """取消还没有开始的段，正在识别的段在下一页之前停止，结果不再使用"""
+        with self.changed:
+            self.closed = True
+            chunks = list(self.chunks)
+            self.changed.notify_all()
+        self.prepare.cancel()
+        for future in chunks:
+            future.cancel()
+        self._lower_stop_at(0)
+
+    def _next_chunk(self, index):
+        """按页码顺序取第 index 段，还没有提交时等待前面的段完成；没有更多的段时返回None"""
+        with self.changed:
+            while index >= len(self.chunks):
+                if self.closed or self.next_start >= self.page_count:
+                    return None
+                self.changed.wait()
+            return self.chunks[index]
+
+    def result(self):
+        try:
+            prepared = _merge_result(self.prepare.result())
+        except Exception as e:
+            print(f"处理文件时出错: {self.file_path}, 错误: {e}")
+            return self.record
+        self.record['hash'] = prepared['hash']
+        if prepared['error'] is not None:
+            print(f"处理文件时出错: {self.file_path}, 错误: {prepared['error']}")
+            return self.record
+        if prepared['skipped']:
+            self.record['skipped'] = True
+            return self.record
+        if prepared['text'] is not None:
+            if self.options.trace:
+                self.record['trace'] = prepared['trace']
+            self.record['text'] = prepared['text']
+            self.record['id_number'] = search_id_number(prepared['text'], self.record.get('trace'))
+            return self.record
+        
+        text = ""
+        traces = [prepared['trace']]
+        try:
+            index = 0
+            while True:
+                future = self._next_chunk(index)
+                if future is None:
+                    break
+                part = _merge_result(future.result())
+                text += part['text']
+                traces.append(part['trace'])
+                if self.options.early_exit and part['found']:
+                    break
+                index += 1
+        finally:
+            self.cancel()
+        if self.options.trace:
+            # 各段的耗时之和，即该文件占用的进程时间
+            self.record['trace'] = merge_traces(traces)
+        self.record['text'] = text
+        self.record['id_number'] = search_id_number(text, self.record.get('trace'))
+        store_cache(self.file_path, self.options, prepared['cache_key'], text, self.record['id_number'])
+        return self.record
+
+def submit_file(executor, file_path, options, jobs=1, limits=None):
+    """把文件提交给进程池，页数较多的PDF按页面分段提交，返回 FileTask 或 PageTasks"""
+    if Path(file_path).suffix.lower() == '.pdf':
+        try:
+            with fitz.open(file_path) as doc:
+                page_count = page_limit(len(doc), options)
+        except Exception:
+            page_count = 0
+        if page_count >= PAGE_TASK_MIN_PAGES:
+            return PageTasks(executor, file_path, page_count, options, jobs, limits)
+    return FileTask(executor, file_path)
+
+def _wait_task(task, stop_event=None):
+    """等待任务完成，返回True；stop_event 被设置时立即返回False"""
+    if stop_event is None:
+        return True
+    while not task.done():
+        if stop_event.wait(TASK_POLL_SECONDS):
+            return False
+    return not stop_event.is_set()
+
+def iter_results_parallel(file_list, jobs, options=None, need_hash=False, skip_files=None, memory_limit_mb=None,
+                          stop_event=None):
+    """使用进程池并行识别，按输入顺序逐个返回结果字典
+    
+    子进程的识别统计和内存峰值会合并到主进程的统计中；指定 memory_limit_mb 时
+    每个子进程的内存不能超过该上限，超出时该文件处理失败，子进程继续处理其他文件。
+    
+    页数较多的PDF按页面分段交给多个子进程（见 PageTasks），单个大文件不会拖在最后由一个进程处理。
+    同时提交的任务数量有上限，避免一次性把所有文件压入进程池。
+    结果按提交顺序返回，使得主进程中的重命名顺序与串行运行完全一致。
+    
+    指定 stop_event（threading.Event）时，事件被设置后立即停止返回结果并取消排队中的任务，
+    不等待正在识别的文件完成（这些文件的结果不再使用）。
+    """
+    options = options or ExtractOptions()
+    executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(pytesseract.pytesseract.tesseract_cmd, options, need_hash, skip_files, memory_limit_mb),
+    )
+    limits = PageLimits()
+    pending = deque()
+    try:
+        for file_path in file_list:
+            if stop_event is not None and stop_event.is_set():
+                break
+            pending.append(submit_file(executor, file_path, options, jobs, limits))
+            if len(pending) >= jobs * PENDING_PER_JOB:
+                if not _wait_task(pending[0], stop_event):
+                    break
+                yield pending.popleft().result()
+        while pending and _wait_task(pending[0], stop_event):
+            yield pending.popleft().result()
+    finally:
+        for task in pending:
+            task.cancel()
+        stopped = stop_event is not None and stop_event.is_set()
+        executor.shutdown(wait=not stopped, cancel_futures=True)
+        limits.shutdown()
+
+def _merge_result(result):
+    """合并子进程返回的统计"""
+    STATS.merge(result.pop('stats'))
+    PROFILER.add(result.pop('profile'))
+    STATS.record_peak(result.pop('pid'), result.pop('peak_memory'))
+    return result
+
+def _page_ids_worker(pdf_path, start, stop):
+    """在子进程中识别一段页面，返回结果字典"""
+    ids, profile = _worker_call(page_id_numbers, pdf_path, _worker_options, start, stop)
+    return _worker_result({'ids': ids}, profile)
+
+def iter_page_ids(pdf_path, page_count, jobs=1, options=None, chunk_pages=SPLIT_CHUNK_PAGES, memory_limit_mb=None):
+    """按页码顺序逐段返回每页识别出的号码 (起始页, [号码, ...])
+    
+    jobs 大于1时，页面按 chunk_pages 分段在进程池中并行识别，每个子进程独立打开文档。
+    """
+    options = options or ExtractOptions()
+    chunks = page_chunks(page_count, chunk_pages)
+    if jobs <= 1 or len(chunks) <= 1:
+        for start, stop in chunks:
+            yield start, page_id_numbers(pdf_path, options, start, stop)
+        return
+    
+    executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(pytesseract.pytesseract.tesseract_cmd, options, False, None, memory_limit_mb),
+    )
+    pending = deque()
+    try:
+        for start, stop in chunks:
+            pending.append((start, executor.submit(_page_ids_worker, str(pdf_path), start, stop)))
+            if len(pending) >= jobs * PENDING_PER_JOB:
+                start, future = pending.popleft()
+                yield start, _merge_result(future.result())['ids']
+        while pending:
+            start, future = pending.popleft()
+            yield start, _merge_result(future.result())['ids']
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
-def process_directory(directory_path, recursive=False):
-    """处理目录中的所有PDF和图像文件"""
+def split_pdf(pdf_path, options=None, jobs=1, output_dir=None, resolver=None, dry_run=False, memory_limit_mb=None,
+              written=None):
+    """把包含多个人身份证的PDF按号码拆分为多个 {号码}.pdf，返回 (成功数, 失败数)
+    
+    逐页识别号码（见 pdf_split.group_pages 的分组规则），每个号码的页面直接复制到新文件，
+    不重新编码图像；原文件保持不变。输出文件默认与原文件在同一目录，
+    文件名冲突按 resolver（rename_plan.TargetResolver）的策略处理。dry_run 只显示拆分计划。
+    原文件已经以号码命名并且所有页面都属于该号码时不需要拆分，计为成功。
+    指定 written（集合）时，把写入的文件路径加入其中。
+    """
+    pdf_path = Path(pdf_path)
+    output_dir = Path(output_dir) if output_dir else pdf_path.parent
+    options = options or ExtractOptions()
+    resolver = resolver or TargetResolver()
+    
+    with fitz.open(pdf_path) as doc:
+        page_count = page_limit(len(doc), options)
+    print(f"正在拆分: {pdf_path}，共{page_count}页")
+    
+    page_ids = []
+    for start, id_numbers in iter_page_ids(pdf_path, page_count, jobs, options, memory_limit_mb=memory_limit_mb):
+        for offset, id_number in enumerate(id_numbers):
+            if id_number:
+                print(f"第{start + offset + 1}页: {id_number}")
+        page_ids.extend(id_numbers)
+    
+    groups = group_pages(page_ids)
+    if not groups:
+        print(f"未找到身份证号码: {pdf_path}")
+        return 0, 1
+    
+    success_count = 0
+    fail_count = 0
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with fitz.open(pdf_path) as doc:
+        for id_number, ranges in groups.items():
+            status, target = resolver.resolve(output_dir / pdf_path.name, id_number)
+            pages = format_ranges(ranges)
+            if status == STATUS_ALREADY_NAMED and len(groups) == 1:
+                print(f"文件已经以身份证号码命名，不需要拆分: {pdf_path}")
+                success_count += 1
+                continue
+            if status == STATUS_ALREADY_NAMED:
+                print(f"目标文件就是原文件，跳过第{pages}页: {target}")
+                fail_count += 1
+                continue
+            if status != STATUS_PLANNED:
+                print(f"目标文件已存在，跳过第{pages}页: {target}")
+                fail_count += 1
+                continue
+            if dry_run:
+                print(f"计划拆分第{pages}页: {target}")
+                success_count += 1
+                continue
+            try:
+                if target.parent != output_dir:
+                    target.parent.mkdir(exist_ok=True)
+                with Timer() as timer:
+                    write_pages(doc, ranges, target)
+                STATS.record('split_write', timer)
+                if written is not None:
+                    written.add(target.resolve())
+                print(f"拆分成功: 第{pages}页 -> {target}")
+                success_count += 1
+            except Exception as e:
+                print(f"拆分失败: 第{pages}页 -> {target}, 错误: {e}")
+                fail_count += 1
+    return success_count, fail_count
+
+def split_path(path, recursive=False, jobs=1, options=None, include=None, exclude=None, max_depth=None,
+               output_dir=None, on_conflict=CONFLICT_SKIP, dry_run=False, memory_limit_mb=None):
+    """拆分单个PDF，或目录中的所有PDF
+    
+    memory_limit_mb 为每个子进程的内存上限（MB），串行处理时限制当前进程。
+    """
+    path = Path(path)
+    resolver = TargetResolver(on_conflict)
+    if memory_limit_mb and jobs <= 1:
+        limit_memory(memory_limit_mb)
+    if path.is_dir():
+        pdf_list = iter_files(path, ['.pdf'], recursive, include, exclude, max_depth)
+    else:
+        pdf_list = [path]
+    
+    success_count = 0
+    fail_count = 0
+    # 本次拆分写入的文件：输出在遍历的目录树中时，边遍历边写入的文件不会再被拆分
+    written = set()
+    for pdf_path in pdf_list:
+        if Path(pdf_path).resolve() in written:
+            continue
+        try:
+            success, fail = split_pdf(pdf_path, options, jobs, output_dir, resolver, dry_run, memory_limit_mb, written)
+        except Exception as e:
+            print(f"拆分PDF时出错: {pdf_path}, 错误: {e}")
+            success, fail = 0, 1
+        success_count += success
+        fail_count += fail
+    print(f"拆分完成，生成文件: {success_count}，失败: {fail_count}")
+    STATS.report()
+
+def iter_results_serial(file_list, options=None, need_hash=False, skip_files=None):
+    """在当前进程中依次识别，逐个返回结果字典"""
+    options = options or ExtractOptions()
+    for file_path in file_list:
+        print(f"正在处理: {file_path}")
+        yield recognize_task(file_path, options, need_hash, skip_files)
+
+def process_directory(directory_path, recursive=False, jobs=1, options=None,
+                      include=None, exclude=None, max_depth=None, journal_path=None, resume=False,
+                      on_conflict=CONFLICT_SKIP, plan_path=None, dry_run=False, memory_limit_mb=None, metrics=None):
+    """处理目录中的所有PDF和图像文件
+    
+    目录在后台线程中遍历，发现文件后立即开始处理，不需要等待遍历结束。
+    include/exclude/max_depth 的含义见 file_walker.iter_files。
+    
+    jobs 大于1时，OCR和PDF渲染在进程池中并行执行；重命名始终在主进程中
+    按文件顺序依次进行，因此不会有两个进程争用同一个目标文件名，
+    成功/失败计数也与串行运行一致。
+    
+    指定 journal_path 时，每个文件的处理结果都追加写入该日志；resume 为True时
+    跳过日志中已经完成的文件（按文件内容哈希和路径匹配）。
+    
+    目标文件名冲突在内存中判断，每个目录只列出一次文件名，按 on_conflict 策略
+    （见 rename_plan.CONFLICT_STRATEGIES）处理。指定 plan_path 或 dry_run 时分两个阶段：
+    先识别所有文件并生成重命名计划（写入 plan_path），再统一执行计划；dry_run 只生成计划。
+    
+    memory_limit_mb 为每个子进程的内存上限（MB，见 instrumentation.limit_memory），串行处理时限制当前进程。
+    
+    指定 metrics（instrumentation.FileMetrics）时逐文件记录处理结果和各阶段的耗时，识别参数中的 trace 需要为True。
+    """
     directory_path = Path(directory_path)
     if not directory_path.exists() or not directory_path.is_dir():
         print(f"目录不存在: {directory_path}")
@@ -118,45 +1453,361 @@ def process_directory(directory_path, recursive=False):
     
     print(f"正在处理目录: {directory_path}")
     
-    # 获取所有文件
-    file_list = []
-    if recursive:
-        for file_path in directory_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in ['.pdf', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']:
-                file_list.append(file_path)
-    else:
-        for file_path in directory_path.glob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in ['.pdf', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']:
-                file_list.append(file_path)
+    skip_files = None
+    if resume and journal_path and Path(journal_path).exists():
+        skip_files = completed_files(journal_path)
+        print(f"从日志中恢复，{len(skip_files)}个已完成的文件将被跳过: {journal_path}")
+    journal = RenameJournal(journal_path) if journal_path and not dry_run else None
+    need_hash = journal is not None or plan_path is not None
+    resolver = TargetResolver(on_conflict)
+    plan = [] if plan_path or dry_run else None
+    
+    # 边遍历边处理
+    walker = BackgroundWalker(iter_files(directory_path, SUPPORTED_SUFFIXES, recursive, include, exclude, max_depth))
+    file_list = iter(walker)
     
     success_count = 0
     fail_count = 0
+    skip_count = 0
     
-    for file_path in file_list:
-        if process_file(file_path):
-            success_count += 1
+    if jobs > 1:
+        print(f"使用{jobs}个进程并行处理")
+        results = iter_results_parallel(file_list, jobs, options, need_hash, skip_files, memory_limit_mb)
+    else:
+        if memory_limit_mb:
+            limit_memory(memory_limit_mb)
+        results = iter_results_serial(file_list, options, need_hash, skip_files)
+    
+    try:
+        for result in results:
+            if result['skipped']:
+                print(f"日志中已完成，跳过: {result['path']}")
+                skip_count += 1
+                continue
+            if jobs > 1:
+                print(f"正在处理: {result['path']}")
+            if plan is not None:
+                plan.append(plan_result(result, resolver, metrics))
+            elif finish_result(result, journal, resolver, metrics) in SUCCESS_STATUSES:
+                success_count += 1
+            else:
+                fail_count += 1
+        
+        if plan is not None:
+            if plan_path:
+                write_plan(plan_path, plan)
+                print(f"重命名计划已写入: {plan_path}")
+            if dry_run:
+                planned = sum(1 for entry in plan if entry['status'] == STATUS_PLANNED)
+                print(f"试运行完成，共{walker.discovered}个文件，计划重命名: {planned}，未修改任何文件")
+                STATS.report()
+                return
+            success_count, fail_count = execute_plan(plan, journal)
+    finally:
+        walker.stop()
+        if journal is not None:
+            journal.close()
+    
+    summary = f"处理完成，共{walker.discovered}个文件，成功: {success_count}，失败: {fail_count}"
+    if skip_count:
+        summary += f"，跳过: {skip_count}"
+    print(summary)
+    STATS.report()
+
+def _pipeline_recognize(item):
+    """流水线识别阶段，在子进程中执行：item 为读取阶段得到的 (文件路径, 内容哈希)"""
+    return _recognize_worker(*item)
+
+def process_directory_pipeline(directory_path, recursive=False, jobs=1, options=None,
+                               include=None, exclude=None, max_depth=None, journal_path=None, resume=False,
+                               on_conflict=CONFLICT_SKIP, readers=PIPELINE_READERS, queue_size=PIPELINE_QUEUE_SIZE,
+                               report_interval=REPORT_INTERVAL, memory_limit_mb=None, metrics=None):
+    """用分阶段的流水线处理目录，读取文件、渲染和OCR、重命名同时进行
+    
+    读取：readers 个线程完整读取文件并计算内容哈希，文件从网络共享读入本机的页面缓存，
+    识别进程再打开文件时不需要等待网络；识别：jobs 个进程渲染页面并进行OCR；
+    重命名：一个线程按文件顺序重命名并写入日志。各阶段之间的队列最多容纳 queue_size 个文件，
+    处理中每隔 report_interval 秒报告各阶段的队列长度和吞吐量。其余参数的含义与 process_directory 相同。
+    """
+    directory_path = Path(directory_path)
+    if not directory_path.exists() or not directory_path.is_dir():
+        print(f"目录不存在: {directory_path}")
+        return
+    
+    print(f"正在处理目录: {directory_path}")
+    options = options or ExtractOptions()
+    skip_files = None
+    if resume and journal_path and Path(journal_path).exists():
+        skip_files = completed_files(journal_path)
+        print(f"从日志中恢复，{len(skip_files)}个已完成的文件将被跳过: {journal_path}")
+    journal = RenameJournal(journal_path) if journal_path else None
+    resolver = TargetResolver(on_conflict)
+    counts = {'success': 0, 'fail': 0, 'skip': 0}
+    
+    def read(file_path):
+        return file_path, file_sha256(file_path)
+    
+    def finish(result):
+        _merge_result(result)
+        if result['skipped']:
+            print(f"日志中已完成，跳过: {result['path']}")
+            counts['skip'] += 1
+            return
+        print(f"正在处理: {result['path']}")
+        if finish_result(result, journal, resolver, metrics) in SUCCESS_STATUSES:
+            counts['success'] += 1
         else:
-            fail_count += 1
+            counts['fail'] += 1
     
-    print(f"处理完成，成功: {success_count}，失败: {fail_count}")
+    walker = BackgroundWalker(iter_files(directory_path, SUPPORTED_SUFFIXES, recursive, include, exclude, max_depth))
+    read_executor = ThreadPoolExecutor(max_workers=readers)
+    ocr_executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(pytesseract.pytesseract.tesseract_cmd, options, True, skip_files, memory_limit_mb),
+    )
+    rename_executor = ThreadPoolExecutor(max_workers=1)
+    pipeline = Pipeline([
+        Stage('读取', read, read_executor, readers, queue_size),
+        Stage('识别', _pipeline_recognize, ocr_executor, jobs, queue_size),
+        Stage('重命名', finish, rename_executor, 1, queue_size, ordered=True),
+    ], report_interval)
+    print(f"使用流水线处理：{readers}个读取线程，{jobs}个识别进程")
+    try:
+        pipeline.run(walker)
+    finally:
+        walker.stop()
+        read_executor.shutdown(wait=True, cancel_futures=True)
+        ocr_executor.shutdown(wait=True, cancel_futures=True)
+        rename_executor.shutdown(wait=True)
+        if journal is not None:
+            journal.close()
+    
+    # 识别阶段出错的文件没有结果，计为失败
+    fail_count = walker.discovered - counts['success'] - counts['skip']
+    summary = f"处理完成，共{walker.discovered}个文件，成功: {counts['success']}，失败: {fail_count}"
+    if counts['skip']:
+        summary += f"，跳过: {counts['skip']}"
+    print(summary)
+    STATS.report()
+
+def watch_directory(directory_path, recursive=False, options=None, include=None, exclude=None,
+                    settle_seconds=SETTLE_SECONDS, poll_interval=POLL_INTERVAL, force_poll=False, metrics=None):
+    """持续监视目录，文件写入完成后按 process_file 的规则识别并重命名
+    
+    文件名已经是有效身份证号码的文件（包括本程序重命名后的文件）会被跳过。
+    """
+    directory_path = Path(directory_path)
+    if not directory_path.is_dir():
+        print(f"目录不存在: {directory_path}")
+        return
+    
+    options = options or ExtractOptions()
+    # 预先加载OCR引擎，整个监视期间保持可用
+    get_backend(options.ocr_backend)
+    
+    def process(file_path):
+        if is_valid_id_number(file_path.stem):
+            return None
+        return process_file(file_path, options, metrics=metrics)
+    
+    watcher = FolderWatcher(directory_path, SUPPORTED_SUFFIXES, process, recursive, include, exclude,
+                            settle_seconds, poll_interval, force_poll)
+    watcher.run()
+    STATS.report()
+
+def parse_dpi_tiers(value):
+    """解析以逗号分隔的分辨率列表"""
+    try:
+        tiers = tuple(int(v) for v in value.split(',') if v.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的分辨率列表: {value}")
+    if not tiers:
+        raise argparse.ArgumentTypeError(f"无效的分辨率列表: {value}")
+    return tiers
+
+def parse_region(value):
+    """解析以逗号分隔的区域比例 x1,y1,x2,y2"""
+    try:
+        region = tuple(float(v) for v in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的区域: {value}")
+    if len(region) != 4 or not (0 <= region[0] < region[2] <= 1 and 0 <= region[1] < region[3] <= 1):
+        raise argparse.ArgumentTypeError(f"无效的区域: {value}")
+    return region
 
 def main():
     parser = argparse.ArgumentParser(description='批量识别身份证号码并重命名文件')
-    parser.add_argument('path', help='文件或目录路径')
+    parser.add_argument('path', nargs='?', help='文件或目录路径')
     parser.add_argument('-r', '--recursive', action='store_true', help='递归处理子目录')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help='只处理文件名或相对路径匹配该模式的文件，可以指定多次')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help='跳过文件名或相对路径匹配该模式的文件和子目录（匹配的子目录不会被遍历），可以指定多次')
+    parser.add_argument('--max-depth', type=int, default=None, help='递归处理时最多进入的子目录层数')
+    parser.add_argument('--journal', metavar='FILE', help='将每个文件的处理结果追加写入该日志（JSON lines）')
+    parser.add_argument('--resume', action='store_true', help='跳过日志中已经完成的文件，需要同时指定 --journal')
+    parser.add_argument('--undo', metavar='JOURNAL', help='按日志撤销其中的所有重命名')
+    parser.add_argument('--on-conflict', choices=CONFLICT_STRATEGIES, default=CONFLICT_SKIP,
+                        help='目标文件名已存在时：skip跳过（默认），suffix添加_1、_2后缀，subdir移入以号码命名的子目录')
+    parser.add_argument('--plan', metavar='FILE',
+                        help='先识别所有文件并把重命名计划写入该文件（.csv或.json），再统一执行')
+    parser.add_argument('--dry-run', action='store_true', help='只生成重命名计划（拆分时只显示拆分计划），不修改任何文件')
+    parser.add_argument('--split', action='store_true',
+                        help='把包含多个人身份证的PDF按号码拆分为多个 号码.pdf，原文件保持不变')
+    parser.add_argument('--split-dir', metavar='DIR', help='拆分出的文件的保存目录（默认与原文件相同）')
+    parser.add_argument('--apply-plan', metavar='FILE', help='执行之前用 --plan 生成的重命名计划')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='并行处理的进程数（默认为CPU核心数，1表示串行处理）')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='处理目录时使用分阶段流水线：读取文件、OCR识别、重命名同时进行，适合网络共享目录')
+    parser.add_argument('--readers', type=int, default=PIPELINE_READERS,
+                        help=f'流水线中同时读取文件的线程数（默认{PIPELINE_READERS}）')
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE,
+                        help=f'流水线各阶段之间最多排队的文件数（默认{PIPELINE_QUEUE_SIZE}）')
+    parser.add_argument('--memory-limit', type=int, default=None, metavar='MB',
+                        help='每个处理进程在启动时占用的内存之外最多再使用的内存（MB），超出上限的文件处理失败，仅支持Linux和macOS')
+    parser.add_argument('--max-image-side', type=int, default=None, metavar='PIXELS',
+                        help='图像文件按不超过该最长边的分辨率解码和识别，JPEG直接缩小解码（默认按原始分辨率）')
+    parser.add_argument('--ocr-backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help='OCR引擎：pytesseract每次识别启动tesseract进程，tesserocr在进程内常驻模型（需要安装tesserocr）')
+    parser.add_argument('--watch', action='store_true', help='持续监视目录，自动处理新写入或移入的文件')
+    parser.add_argument('--poll', action='store_true', help='监视目录时定期扫描，不使用inotify')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, help=f'定期扫描的间隔秒数（默认{POLL_INTERVAL}）')
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help=f'文件大小和修改时间保持不变多少秒后才处理（默认{SETTLE_SECONDS}）')
+    parser.add_argument('--max-pages', type=int, default=None, help='PDF只处理前N页（默认处理所有页）')
+    parser.add_argument('--full-scan', action='store_true', help='找到身份证号码后仍继续处理剩余页面')
+    parser.add_argument('--render-pages', action='store_true', help='扫描页总是渲染整个页面，不直接取出嵌入的图像')
+    parser.add_argument('--dpi', type=int, default=RENDER_DPI, help=f'渲染PDF页面的分辨率（默认{RENDER_DPI}）')
+    parser.add_argument('--grayscale', action='store_true', help='以灰度渲染PDF页面，减少内存占用')
+    parser.add_argument('--adaptive-dpi', metavar='LOW,HIGH', type=parse_dpi_tiers,
+                        help='自适应分辨率：先以LOW渲染，未识别出有效号码时再以HIGH重新渲染，如 150,300')
+    parser.add_argument('--no-cascade', action='store_true', help='不使用号码区域快速识别，直接进行全页识别')
+    parser.add_argument('--fast-lang', default=FAST_LANG, help=f'号码区域快速识别使用的语言模型（默认{FAST_LANG}）')
+    parser.add_argument('--fast-psm', type=int, default=FAST_PSM, help=f'号码区域快速识别的页面分割模式（默认{FAST_PSM}，单行）')
+    parser.add_argument('--no-auto-rotate', action='store_true',
+                        help='未识别出号码时不尝试旋转90°、180°、270°')
+    parser.add_argument('--region', metavar='X1,Y1,X2,Y2', type=parse_region,
+                        help='只识别该区域，按图像宽高的比例（0到1）指定，如 0.25,0.7,1,1')
+    parser.add_argument('--no-auto-region', action='store_true',
+                        help='不根据单词位置自动定位号码区域')
+    parser.add_argument('--preprocess', action='store_true', help='OCR前预处理图像：灰度化、倾斜校正、缩放到目标字高、自适应二值化')
+    parser.add_argument('--char-height', type=int, default=TARGET_CHAR_HEIGHT,
+                        help=f'预处理时把文字缩放到的高度（像素，默认{TARGET_CHAR_HEIGHT}，0表示不缩放）')
+    parser.add_argument('--no-binarize', action='store_true', help='预处理时不做二值化')
+    parser.add_argument('--no-deskew', action='store_true', help='预处理时不做倾斜校正')
+    parser.add_argument('--crop-content', action='store_true', help='预处理时裁掉文字区域以外的空白和背景')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='逐文件记录处理结果、页数、像素数和各阶段的耗时与CPU时间，追加写入该文件（JSON lines）')
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help='把吞吐量、各阶段耗时的分位数和失败原因写入该Prometheus文本文件（供node_exporter读取）')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='用cProfile分析整个批次（包括各子进程），结果写入该pstats文件，用 python -m pstats 或 snakeviz 查看；'
+                             '未指定 --slow-log 时慢文件日志写入 FILE.slow.jsonl')
+    parser.add_argument('--slow-log', metavar='FILE',
+                        help='处理耗时超过阈值的文件记入该日志（JSON lines）：文件大小、页数、图像尺寸和各阶段耗时')
+    parser.add_argument('--slow-seconds', type=float, default=SLOW_FILE_SECONDS,
+                        help=f'慢文件日志的耗时阈值（秒，默认{SLOW_FILE_SECONDS:g}）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用识别结果缓存')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help='识别结果缓存目录')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE_MB, help='识别结果缓存大小上限（MB）')
     
     args = parser.parse_args()
+    
+    if args.undo:
+        success_count, fail_count = undo_journal(args.undo)
+        print(f"撤销完成，成功: {success_count}，失败: {fail_count}")
+        return
+    if args.apply_plan:
+        apply_plan_file(args.apply_plan, args.journal)
+        return
+    if not args.path:
+        parser.error("需要指定文件或目录路径")
+    if args.resume and not args.journal:
+        parser.error("--resume 需要同时指定 --journal")
+    if args.pipeline and (args.plan or args.dry_run):
+        parser.error("--pipeline 不能与 --plan、--dry-run 同时使用")
+    # 指定的OCR引擎无法使用时直接报错，不改用其他引擎（识别缓存按引擎区分）
+    backend_error = check_backend(args.ocr_backend)
+    if backend_error:
+        parser.error(backend_error)
+    
     path = Path(args.path)
+    slow_log = args.slow_log or (f"{args.profile}.slow.jsonl" if args.profile else None)
+    options = ExtractOptions(
+        ocr_backend=args.ocr_backend,
+        max_pages=args.max_pages,
+        early_exit=not args.full_scan,
+        embedded_images=not args.render_pages,
+        dpi=args.dpi,
+        grayscale=args.grayscale,
+        adaptive_dpi=bool(args.adaptive_dpi),
+        max_image_side=args.max_image_side,
+        auto_rotate=not args.no_auto_rotate,
+        auto_region=not args.no_auto_region,
+        region=args.region,
+        dpi_tiers=args.adaptive_dpi or ADAPTIVE_DPI_TIERS,
+        cascade=not args.no_cascade,
+        fast_lang=args.fast_lang,
+        fast_psm=args.fast_psm,
+        preprocess=args.preprocess,
+        char_height=args.char_height,
+        binarize=not args.no_binarize,
+        deskew=not args.no_deskew,
+        crop_content=args.crop_content,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_size_mb=args.cache_size,
+        trace=bool(args.metrics or args.prometheus or slow_log),
+        profile=bool(args.profile),
+    )
+    metrics = FileMetrics(args.metrics, args.prometheus, slow_log, args.slow_seconds) if options.trace else None
     
     # 设置 Tesseract 路径（Windows 用户必须修改）
     pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
     
-    if path.is_file():
-        process_file(path)
-    elif path.is_dir():
-        process_directory(path, args.recursive)
-    else:
-        print(f"路径不存在: {path}")
+    # 处理目录时由 process_directory 限制各处理进程的内存
+    if args.memory_limit and (args.watch or path.is_file()) and not args.split:
+        limit_memory(args.memory_limit)
+    
+    if args.profile:
+        PROFILER.start(args.profile)
+    try:
+        if args.split:
+            if not path.exists():
+                print(f"路径不存在: {path}")
+                return
+            split_path(path, args.recursive, max(1, args.jobs), options, include=args.include, exclude=args.exclude,
+                       max_depth=args.max_depth, output_dir=args.split_dir, on_conflict=args.on_conflict,
+                       dry_run=args.dry_run, memory_limit_mb=args.memory_limit)
+        elif args.watch:
+            watch_directory(path, args.recursive, options, include=args.include, exclude=args.exclude,
+                            settle_seconds=args.settle, poll_interval=args.poll_interval, force_poll=args.poll,
+                            metrics=metrics)
+        elif path.is_file() and args.dry_run:
+            if check_file(path):
+                plan_result(recognize_task(path, options), TargetResolver(args.on_conflict), metrics)
+        elif path.is_file():
+            process_file(path, options, TargetResolver(args.on_conflict), metrics)
+            STATS.report()
+        elif path.is_dir() and args.pipeline:
+            process_directory_pipeline(path, args.recursive, max(1, args.jobs), options,
+                                       include=args.include, exclude=args.exclude, max_depth=args.max_depth,
+                                       journal_path=args.journal, resume=args.resume, on_conflict=args.on_conflict,
+                                       readers=max(1, args.readers), queue_size=max(1, args.queue_size),
+                                       memory_limit_mb=args.memory_limit, metrics=metrics)
+        elif path.is_dir():
+            process_directory(path, args.recursive, max(1, args.jobs), options,
+                              include=args.include, exclude=args.exclude, max_depth=args.max_depth,
+                              journal_path=args.journal, resume=args.resume,
+                              on_conflict=args.on_conflict, plan_path=args.plan, dry_run=args.dry_run,
+                              memory_limit_mb=args.memory_limit, metrics=metrics)
+        else:
+            print(f"路径不存在: {path}")
+    finally:
+        PROFILER.stop()
+        if metrics is not None:
+            metrics.close()
 
 if __name__ == '__main__':
     try:
@@ -1,49 +1,282 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import csv
 import os
-import re
+import queue
 import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, scrolledtext, simpledialog
 from pathlib import Path
-import PyPDF2
 import pytesseract
 from PIL import Image, ImageTk, ImageDraw
-import fitz  # PyMuPDF
 
-# 中国大陆身份证号码正则表达式
-ID_CARD_PATTERN = r'[1-9]\d{5}(?:18|19|20)\d{2}(?:0[1-9]|10|11|12)(?:0[1-9]|[1-2]\d|30|31)\d{3}[\dXx]'
+from id_card_extractor import (
+    ADAPTIVE_DPI_TIERS, RENDER_DPI, SUCCESS_STATUSES, SUPPORTED_SUFFIXES, ExtractOptions, finish_result,
+    iter_results_parallel,
+)
+from file_walker import BackgroundWalker, iter_files
+from ocr_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB
+from ocr_backends import BACKENDS, DEFAULT_BACKEND, check_backend
+from instrumentation import PROFILER, SLOW_FILE_SECONDS, STATS, FileMetrics
+from rename_journal import (
+    STATUS_ALREADY_NAMED, STATUS_NO_ID, STATUS_RENAME_FAILED, STATUS_RENAMED, STATUS_TARGET_EXISTS,
+)
+
+# 日志窗口最多保留的行数，更早的行只保存在日志文件中
+LOG_MAX_LINES = 2000
+# 把队列中的输出写入日志窗口的间隔（毫秒）
+LOG_DRAIN_MS = 100
+# 更新进度、速度和结果表的间隔（毫秒）
+UI_UPDATE_MS = 100
+
+# 结果表的列：(列名, 标题, 宽度)
+RESULT_COLUMNS = (
+    ('source', '原文件', 280),
+    ('id_number', '身份证号码', 150),
+    ('new_name', '新文件名', 170),
+    ('status', '状态', 90),
+    ('seconds', '耗时(秒)', 70),
+)
+# 结果表开始时显示的行数，之后随窗口大小调整
+RESULT_TABLE_ROWS = 8
+# 识别出错的文件在结果表中的状态
+STATUS_ERROR = 'error'
+STATUS_LABELS = {
+    STATUS_RENAMED: '已重命名',
+    STATUS_ALREADY_NAMED: '已是号码命名',
+    STATUS_NO_ID: '未找到号码',
+    STATUS_TARGET_EXISTS: '目标已存在',
+    STATUS_RENAME_FAILED: '重命名失败',
+    STATUS_ERROR: '出错',
+}
+
+def format_duration(seconds):
+    """把秒数显示为 时:分:秒"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
 
 class RedirectText:
-    def __init__(self, text_widget):
+    """把 print 的输出转到日志窗口
+
+    write 可以在任何线程中调用：输出放入队列并追加写入完整的日志文件，
+    由Tk主线程定期调用 drain 成批写入窗口，处理线程不会等待界面更新。
+    窗口只保留最后 max_lines 行，日志再长每次写入的开销也不变。
+    """
+
+    def __init__(self, text_widget, max_lines=LOG_MAX_LINES):
         self.text_widget = text_widget
-        self.buffer = ""
+        self.max_lines = max_lines
+        self.queue = queue.Queue()
+        self.log_file = None
+        self.lock = threading.Lock()
+
+    def open_log(self, path):
+        """开始把输出追加写入日志文件"""
+        log_file = open(path, 'a', encoding='utf-8')
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+            self.log_file = log_file
+
+    def close_log(self):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
 
     def write(self, string):
-        self.buffer += string
-        self.update_text_widget()
-    
-    def update_text_widget(self):
+        if not string:
+            return
+        self.queue.put(string)
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.write(string)
+
+    def flush(self):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.flush()
+
+    def drain(self):
+        """在Tk主线程中取出队列中的所有输出，一次写入窗口，并删除超出 max_lines 的旧行"""
+        chunks = []
+        while True:
+            try:
+                chunks.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if not chunks:
+            return
+        lines = ''.join(chunks).split('\n')
+        text = '\n'.join(lines[-self.max_lines:])
+        
         self.text_widget.configure(state='normal')
-        self.text_widget.insert(tk.END, self.buffer)
+        self.text_widget.insert(tk.END, text)
+        line_count = int(self.text_widget.index('end-1c').split('.')[0])
+        if line_count > self.max_lines:
+            self.text_widget.delete('1.0', f"{line_count - self.max_lines + 1}.0")
+        self.text_widget.configure(state='disabled')
         self.text_widget.see(tk.END)
+        self.flush()
+
+    def clear(self):
+        """清空窗口和队列中还没有显示的输出"""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.text_widget.configure(state='normal')
+        self.text_widget.delete('1.0', tk.END)
         self.text_widget.configure(state='disabled')
-        self.buffer = ""
-    
-    def flush(self):
-        self.update_text_widget()
+
+class ResultsTable:
+    """虚拟滚动的结果表
+
+    所有结果保存在列表中，Treeview 只有窗口中能显示的几行，滚动时填入对应位置的结果，
+    表中有十万行时插入和滚动的开销也与几十行相同。点击列标题按该列排序（再次点击反向），
+    可以导出为CSV。只能在Tk主线程中调用。
+    """
+
+    def __init__(self, parent, visible_rows=RESULT_TABLE_ROWS):
+        self.rows = []
+        self.offset = 0
+        self.visible_rows = visible_rows
+        self.sort_column = None
+        self.sort_reverse = False
+        # 显示到最后一行时，新的结果到达后自动滚动到末尾
+        self.follow = True
+        
+        frame = ttk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(frame, columns=[name for name, _, _ in RESULT_COLUMNS], show='headings',
+                                 height=visible_rows, selectmode='none')
+        for name, title, width in RESULT_COLUMNS:
+            self.tree.heading(name, text=title, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width, anchor=tk.E if name == 'seconds' else tk.W)
+        self.items = [self.tree.insert('', tk.END, values=()) for _ in range(visible_rows)]
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tree.bind("<MouseWheel>", lambda event: self.on_wheel(-3 if event.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda event: self.on_wheel(-3))
+        self.tree.bind("<Button-5>", lambda event: self.on_wheel(3))
+        self.tree.bind("<Configure>", self.on_resize)
+        self.refresh()
+
+    def on_wheel(self, step):
+        self.scroll_to(self.offset + step)
+        # 不使用 Treeview 自带的滚动
+        return "break"
+
+    def on_resize(self, event):
+        """Treeview 的大小改变时，按实际高度调整可见的行数"""
+        box = self.tree.bbox(self.items[0])
+        if not box:
+            return
+        _, top, _, row_height = box
+        rows = max(1, (event.height - top) // row_height)
+        if rows == len(self.items):
+            return
+        while len(self.items) < rows:
+            self.items.append(self.tree.insert('', tk.END, values=()))
+        while len(self.items) > rows:
+            self.tree.delete(self.items.pop())
+        self.visible_rows = rows
+        self.offset = self.max_offset() if self.follow else min(self.offset, self.max_offset())
+        self.refresh()
+
+    def add_rows(self, rows):
+        """添加结果，每行为 (原文件, 号码, 新文件名, 状态, 耗时)"""
+        if not rows:
+            return
+        self.rows.extend(rows)
+        if self.sort_column is not None:
+            # 已经排序的列表加上新的几行，Python的排序只需要线性时间
+            self.sort()
+        elif self.follow:
+            self.offset = self.max_offset()
+        self.refresh()
+
+    def clear(self):
+        self.rows = []
+        self.offset = 0
+        self.follow = True
+        self.refresh()
+
+    def sort_by(self, column):
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for name, title, _ in RESULT_COLUMNS:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if name == column else ""
+            self.tree.heading(name, text=title + arrow)
+        self.sort()
+        self.offset = 0
+        self.follow = False
+        self.refresh()
+
+    def sort(self):
+        index = [name for name, _, _ in RESULT_COLUMNS].index(self.sort_column)
+        self.rows.sort(key=lambda row: row[index], reverse=self.sort_reverse)
+
+    def max_offset(self):
+        return max(0, len(self.rows) - self.visible_rows)
+
+    def scroll_to(self, offset):
+        self.offset = min(max(0, offset), self.max_offset())
+        self.follow = self.offset >= self.max_offset()
+        self.refresh()
+
+    def on_scroll(self, *args):
+        """滚动条的回调：('moveto', 比例) 或 ('scroll', 数量, 'units'/'pages')"""
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll':
+            step = int(args[1]) * (self.visible_rows if args[2] == 'pages' else 1)
+            self.scroll_to(self.offset + step)
+
+    def format_row(self, row):
+        source, id_number, new_name, status, seconds = row
+        return (source, id_number, new_name, STATUS_LABELS.get(status, status), f"{seconds:.2f}")
+
+    def refresh(self):
+        """把当前位置的结果填入可见的几行，并更新滚动条"""
+        for index, item in enumerate(self.items):
+            row_index = self.offset + index
+            values = self.format_row(self.rows[row_index]) if row_index < len(self.rows) else ()
+            self.tree.item(item, values=values)
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def export(self, path):
+        """按当前的排序把所有结果写入CSV（带BOM，Excel可以直接打开）"""
+        with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow([title for _, title, _ in RESULT_COLUMNS])
+            for row in self.rows:
+                writer.writerow(self.format_row(row))
 
 class IdCardExtractorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("身份证号码识别与文件重命名")
-        self.root.geometry("800x600")
+        self.root.geometry("900x760")
         self.root.minsize(800, 600)
         
         # 设置Tesseract路径
         self.tesseract_path = tk.StringVar(value=r"C:\Program Files\Tesseract-OCR\tesseract.exe")
         pytesseract.pytesseract.tesseract_cmd = self.tesseract_path.get()
+        self.ocr_backend = tk.StringVar(value=DEFAULT_BACKEND)
         
         # 高级选项
         self.use_keywords = tk.BooleanVar(value=False)
@@ -52,16 +285,42 @@ class IdCardExtractorApp:
         self.current_image = None
         self.current_image_path = None
         self.selected_region = None
+        self.render_dpi = tk.IntVar(value=RENDER_DPI)
+        self.grayscale = tk.BooleanVar(value=False)
+        self.adaptive_dpi = tk.BooleanVar(value=False)
+        self.preprocess = tk.BooleanVar(value=False)
+        self.crop_content = tk.BooleanVar(value=False)
+        self.auto_rotate = tk.BooleanVar(value=True)
+        self.auto_region = tk.BooleanVar(value=True)
+        self.use_cache = tk.BooleanVar(value=True)
+        self.cache_dir = tk.StringVar(value=str(DEFAULT_CACHE_DIR))
+        self.profile = tk.BooleanVar(value=False)
+        self.profile_path = tk.StringVar(value=str(Path.home() / "id_extractor.prof"))
+        self.slow_seconds = tk.DoubleVar(value=SLOW_FILE_SECONDS)
+        self.log_path = tk.StringVar(value=str(Path.home() / "id_extractor_gui.log"))
+        self.jobs = tk.IntVar(value=os.cpu_count() or 1)
+        self.options = None
+        self.metrics = None
+        self.profile_file = None
         
         # 创建控件
         self.create_widgets()
+        self.root.after(LOG_DRAIN_MS, self.pump_log)
         
         # 状态变量
         self.is_processing = False
+        self.walker = None
         self.total_files = 0
         self.processed_files = 0
+        self.processed_pages = 0
         self.success_count = 0
         self.fail_count = 0
+        self.started_at = None
+        self.processing_thread = None
+        # 停止处理时设置，排队中的文件随即取消
+        self.stop_event = threading.Event()
+        # 处理线程交给界面的结果表行
+        self.result_queue = queue.Queue()
     
     def create_widgets(self):
         # 创建主框架
@@ -77,6 +336,10 @@ class IdCardExtractorApp:
         ttk.Button(tesseract_frame, text="浏览", command=self.browse_tesseract).grid(row=0, column=2, padx=5, pady=5)
         ttk.Button(tesseract_frame, text="测试", command=self.test_tesseract).grid(row=0, column=3, padx=5, pady=5)
         
+        ttk.Label(tesseract_frame, text="OCR引擎:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Combobox(tesseract_frame, textvariable=self.ocr_backend, values=sorted(BACKENDS),
+                     state='readonly', width=15).grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+        
         # 输入设置
         input_frame = ttk.LabelFrame(main_frame, text="输入设置", padding=5)
         input_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -111,6 +374,47 @@ class IdCardExtractorApp:
         ttk.Button(region_frame, text="定义识别区域", command=self.define_region).pack(side=tk.LEFT, padx=5)
         self.region_label = ttk.Label(region_frame, text="未设置区域")
         self.region_label.pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(region_frame, text="自动定位号码区域", variable=self.auto_region).pack(side=tk.LEFT, padx=5)
+        
+        # PDF渲染
+        render_frame = ttk.Frame(advanced_frame)
+        render_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(render_frame, text="PDF渲染分辨率(DPI):").pack(side=tk.LEFT, padx=5)
+        ttk.Spinbox(render_frame, from_=72, to=600, increment=50, textvariable=self.render_dpi, width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(render_frame, text="灰度渲染", variable=self.grayscale).pack(side=tk.LEFT, padx=5)
+        low_dpi, high_dpi = ADAPTIVE_DPI_TIERS
+        ttk.Checkbutton(render_frame, text=f"自适应分辨率(先{low_dpi}，未识别时{high_dpi})",
+                        variable=self.adaptive_dpi).pack(side=tk.LEFT, padx=5)
+        
+        # 图像预处理
+        preprocess_frame = ttk.Frame(advanced_frame)
+        preprocess_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Checkbutton(preprocess_frame, text="图像预处理(灰度化、倾斜校正、缩放、二值化)",
+                        variable=self.preprocess).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(preprocess_frame, text="裁剪到文字区域", variable=self.crop_content).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(preprocess_frame, text="自动旋转", variable=self.auto_rotate).pack(side=tk.LEFT, padx=5)
+        
+        # 识别缓存
+        cache_frame = ttk.Frame(advanced_frame)
+        cache_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Checkbutton(cache_frame, text="使用识别缓存", variable=self.use_cache).pack(side=tk.LEFT, padx=5)
+        ttk.Label(cache_frame, text="缓存目录:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(cache_frame, textvariable=self.cache_dir, width=40).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(cache_frame, text="浏览", command=self.browse_cache_dir).pack(side=tk.LEFT, padx=5)
+        
+        # 性能分析
+        profile_frame = ttk.Frame(advanced_frame)
+        profile_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Checkbutton(profile_frame, text="性能分析", variable=self.profile).pack(side=tk.LEFT, padx=5)
+        ttk.Label(profile_frame, text="结果文件:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(profile_frame, textvariable=self.profile_path, width=30).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(profile_frame, text="浏览", command=self.browse_profile_path).pack(side=tk.LEFT, padx=5)
+        ttk.Label(profile_frame, text="慢文件阈值(秒):").pack(side=tk.LEFT, padx=5)
+        ttk.Spinbox(profile_frame, from_=1, to=600, increment=5, textvariable=self.slow_seconds, width=6).pack(side=tk.LEFT, padx=5)
         
         # 操作按钮
         button_frame = ttk.Frame(main_frame)
@@ -118,6 +422,8 @@ class IdCardExtractorApp:
         
         ttk.Button(button_frame, text="开始处理", command=self.start_processing).pack(side=tk.LEFT, padx=5, pady=5)
         ttk.Button(button_frame, text="停止", command=self.stop_processing).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(button_frame, text="并行进程数:").pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Spinbox(button_frame, from_=1, to=64, textvariable=self.jobs, width=4).pack(side=tk.LEFT, padx=5, pady=5)
         
         # 进度条
         progress_frame = ttk.Frame(main_frame)
@@ -131,9 +437,23 @@ class IdCardExtractorApp:
         self.progress_label = ttk.Label(progress_frame, text="0/0")
         self.progress_label.pack(side=tk.LEFT, padx=5, pady=5)
         
-        # 日志输出
-        log_frame = ttk.LabelFrame(main_frame, text="处理日志", padding=5)
-        log_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # 处理结果和日志
+        notebook = ttk.Notebook(main_frame)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        result_frame = ttk.Frame(notebook, padding=5)
+        notebook.add(result_frame, text="处理结果")
+        self.results_table = ResultsTable(result_frame)
+        ttk.Button(result_frame, text="导出结果", command=self.export_results).pack(side=tk.RIGHT, padx=5, pady=5)
+        
+        log_frame = ttk.Frame(notebook, padding=5)
+        notebook.add(log_frame, text="处理日志")
+        
+        log_file_frame = ttk.Frame(log_frame)
+        log_file_frame.pack(fill=tk.X)
+        ttk.Label(log_file_frame, text=f"窗口中只显示最后{LOG_MAX_LINES}行，完整日志文件:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(log_file_frame, textvariable=self.log_path, width=40).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(log_file_frame, text="浏览", command=self.browse_log_path).pack(side=tk.LEFT, padx=5)
         
         self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, state='disabled')
         self.log_text.pack(fill=tk.BOTH, expand=True)
@@ -147,6 +467,8 @@ class IdCardExtractorApp:
         
         self.status_label = ttk.Label(status_frame, text="就绪")
         self.status_label.pack(side=tk.LEFT, padx=5)
+        self.rate_label = ttk.Label(status_frame, text="")
+        self.rate_label.pack(side=tk.RIGHT, padx=5)
     
     def browse_tesseract(self):
         path = filedialog.askopenfilename(
@@ -189,6 +511,96 @@ class IdCardExtractorApp:
         if path:
             self.path_var.set(path)
     
+    def browse_cache_dir(self):
+        path = filedialog.askdirectory(title="选择缓存目录")
+        if path:
+            self.cache_dir.set(path)
+    
+    def browse_log_path(self):
+        path = filedialog.asksaveasfilename(
+            title="完整日志文件",
+            defaultextension=".log",
+            filetypes=[("日志文件", "*.log"), ("所有文件", "*.*")]
+        )
+        if path:
+            self.log_path.set(path)
+    
+    def export_results(self):
+        if not self.results_table.rows:
+            messagebox.showwarning("警告", "没有可以导出的结果")
+            return
+        path = filedialog.asksaveasfilename(
+            title="导出结果",
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            self.results_table.export(path)
+            messagebox.showinfo("导出结果", f"已导出{len(self.results_table.rows)}行: {path}")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出结果失败: {e}")
+    
+    def pump_log(self):
+        """定期把处理线程的输出写入日志窗口"""
+        self.text_redirect.drain()
+        self.root.after(LOG_DRAIN_MS, self.pump_log)
+    
+    def browse_profile_path(self):
+        path = filedialog.asksaveasfilename(
+            title="性能分析结果文件",
+            defaultextension=".prof",
+            filetypes=[("pstats文件", "*.prof"), ("所有文件", "*.*")]
+        )
+        if path:
+            self.profile_path.set(path)
+    
+    def build_options(self):
+        """根据界面设置生成识别参数"""
+        region = None
+        if self.use_region.get() and self.selected_region is not None:
+            region = self.selected_region
+        cache_dir = self.cache_dir.get().strip() if self.use_cache.get() else None
+        try:
+            dpi = int(self.render_dpi.get())
+        except (tk.TclError, ValueError):
+            dpi = RENDER_DPI
+        return ExtractOptions(
+            ocr_backend=self.ocr_backend.get(),
+            region=region,
+            dpi=dpi,
+            grayscale=self.grayscale.get(),
+            adaptive_dpi=self.adaptive_dpi.get(),
+            auto_rotate=self.auto_rotate.get(),
+            auto_region=self.auto_region.get(),
+            preprocess=self.preprocess.get(),
+            crop_content=self.crop_content.get(),
+            cache_dir=cache_dir or None,
+            cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+            # 结果表中显示每个文件的耗时
+            trace=True,
+            profile=self.profile.get(),
+        )
+    
+    def open_profile_outputs(self):
+        """启用性能分析时准备结果文件和慢文件日志（结果文件名加上 .slow.jsonl），返回是否成功"""
+        self.metrics = None
+        self.profile_file = None
+        if not self.profile.get():
+            return True
+        self.profile_file = self.profile_path.get().strip() or str(Path.home() / "id_extractor.prof")
+        try:
+            slow_seconds = float(self.slow_seconds.get())
+        except (tk.TclError, ValueError):
+            slow_seconds = SLOW_FILE_SECONDS
+        try:
+            self.metrics = FileMetrics(slow_path=f"{self.profile_file}.slow.jsonl", slow_seconds=slow_seconds)
+        except Exception as e:
+            messagebox.showerror("错误", f"无法创建慢文件日志: {e}")
+            return False
+        return True
+    
     def start_processing(self):
         if self.is_processing:
             messagebox.showwarning("警告", "已有处理任务正在进行")
@@ -201,17 +613,41 @@ class IdCardExtractorApp:
         
         # 设置Tesseract路径
         pytesseract.pytesseract.tesseract_cmd = self.tesseract_path.get()
+        self.options = self.build_options()
+        backend_error = check_backend(self.options.ocr_backend)
+        if backend_error:
+            messagebox.showerror("错误", backend_error)
+            return
+        try:
+            self.jobs_count = max(1, int(self.jobs.get()))
+        except (tk.TclError, ValueError):
+            self.jobs_count = os.cpu_count() or 1
+        
+        # 清空日志窗口，完整日志追加写入日志文件
+        self.text_redirect.clear()
+        log_path = self.log_path.get().strip()
+        if log_path:
+            try:
+                self.text_redirect.open_log(log_path)
+            except Exception as e:
+                messagebox.showerror("错误", f"无法打开日志文件: {e}")
+                return
+            self.text_redirect.write(f"===== {time.strftime('%Y-%m-%d %H:%M:%S')} 开始处理: {path} =====\n")
+        if not self.open_profile_outputs():
+            self.text_redirect.close_log()
+            return
         
-        # 清空日志
-        self.log_text.configure(state='normal')
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.configure(state='disabled')
-        
-        # 重置计数器
+        # 重置计数器和结果表
+        self.walker = None
         self.total_files = 0
         self.processed_files = 0
+        self.processed_pages = 0
         self.success_count = 0
         self.fail_count = 0
+        self.stop_event = threading.Event()
+        self.result_queue = queue.Queue()
+        self.results_table.clear()
+        self.started_at = time.perf_counter()
         
         # 更新UI
         self.status_label.config(text="正在处理...")
@@ -223,34 +659,65 @@ class IdCardExtractorApp:
         self.processing_thread.start()
         
         # 启动更新UI的周期性任务
-        self.root.after(100, self.update_ui)
+        self.root.after(UI_UPDATE_MS, self.update_ui)
     
     def stop_processing(self):
-        if self.is_processing:
-            self.is_processing = False
-            self.status_label.config(text="已停止")
+        """停止处理：排队中的文件立即取消，正在识别的文件的结果不再使用"""
+        if self.is_processing and not self.stop_event.is_set():
+            self.stop_event.set()
+            if self.walker is not None:
+                self.walker.stop()
+            self.status_label.config(text="正在停止...")
             print("处理已停止")
     
     def update_ui(self):
-        if self.is_processing:
-            # 更新进度条
-            if self.total_files > 0:
-                progress = self.processed_files / self.total_files * 100
-                self.progress_var.set(progress)
-                self.progress_label.config(text=f"{self.processed_files}/{self.total_files}")
-            
+        # 把处理线程交来的结果加入结果表
+        rows = []
+        while True:
+            try:
+                rows.append(self.result_queue.get_nowait())
+            except queue.Empty:
+                break
+        self.results_table.add_rows(rows)
+        
+        if self.walker is not None:
+            self.total_files = self.walker.discovered
+        scanning = self.walker is not None and not self.walker.done and not self.stop_event.is_set()
+        if self.total_files > 0:
+            self.progress_var.set(self.processed_files / self.total_files * 100)
+            self.progress_label.config(text=f"{self.processed_files}/{self.total_files}{'（扫描中）' if scanning else ''}")
+        self.update_rate(scanning)
+        
+        if self.processing_thread.is_alive():
             # 周期性更新UI
-            self.root.after(100, self.update_ui)
+            self.root.after(UI_UPDATE_MS, self.update_ui)
+            return
+        
+        # 处理结束，更新最终UI状态
+        if self.stop_event.is_set():
+            self.status_label.config(text=f"已停止，成功: {self.success_count}，失败: {self.fail_count}")
+            return
+        self.status_label.config(text=f"处理完成，成功: {self.success_count}，失败: {self.fail_count}")
+        
+        # 如果有处理结果，显示摘要
+        if self.total_files > 0:
+            self.progress_var.set(100)
+            self.progress_label.config(text=f"{self.processed_files}/{self.total_files}")
+            messagebox.showinfo("处理完成", f"共处理{self.total_files}个文件\n成功: {self.success_count}\n失败: {self.fail_count}")
+    
+    def update_rate(self, scanning):
+        """显示处理速度和预计剩余时间；仍在扫描目录时文件总数还会增加，剩余时间只是估计"""
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        files_per_second = self.processed_files / elapsed
+        pages_per_second = self.processed_pages / elapsed
+        remaining = self.total_files - self.processed_files
+        if not self.processing_thread.is_alive() or remaining <= 0:
+            eta = f"用时{format_duration(elapsed)}"
+        elif files_per_second > 0:
+            eta = f"剩余约{format_duration(remaining / files_per_second)}{'以上' if scanning else ''}"
         else:
-            # 处理结束，更新最终UI状态
-            if not self.processing_thread.is_alive():
-                self.status_label.config(text=f"处理完成，成功: {self.success_count}，失败: {self.fail_count}")
-                
-                # 如果有处理结果，显示摘要
-                if self.total_files > 0:
-                    self.progress_var.set(100)
-                    self.progress_label.config(text=f"{self.processed_files}/{self.total_files}")
-                    messagebox.showinfo("处理完成", f"共处理{self.total_files}个文件\n成功: {self.success_count}\n失败: {self.fail_count}")
+            eta = "剩余时间计算中"
+        self.rate_label.config(text=f"{files_per_second:.2f}个文件/秒，{pages_per_second:.2f}页/秒，{eta}")
     
     def process_path(self, path):
         import sys
@@ -258,218 +725,104 @@ class IdCardExtractorApp:
         sys_stdout = sys.stdout
         sys.stdout = self.text_redirect
         
+        if self.profile_file:
+            PROFILER.start(self.profile_file)
         try:
             path = Path(path)
+            jobs = self.jobs_count
             
             if path.is_file():
-                self.total_files = 1
-                success = self.process_file(path)
-                self.processed_files = 1
-                self.success_count += 1 if success else 0
-                self.fail_count += 0 if success else 1
+                if path.suffix.lower() in SUPPORTED_SUFFIXES:
+                    file_list = [path]
+                else:
+                    print(f"不支持的文件类型: {path}")
+                    file_list = []
+                self.total_files = len(file_list)
+                jobs = 1
             elif path.is_dir():
                 recursive = self.recursive_var.get()
                 
-                # 获取文件列表
+                # 在后台遍历目录，边遍历边处理，文件总数随遍历进度更新
+                self.walker = BackgroundWalker(iter_files(path, SUPPORTED_SUFFIXES, recursive))
+                file_list = self.walker
+            else:
+                print(f"路径不存在: {path}")
                 file_list = []
-                if recursive:
-                    for file_path in path.rglob('*'):
-                        if file_path.is_file() and file_path.suffix.lower() in ['.pdf', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']:
-                            file_list.append(file_path)
-                else:
-                    for file_path in path.glob('*'):
-                        if file_path.is_file() and file_path.suffix.lower() in ['.pdf', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']:
-                            file_list.append(file_path)
-                
-                self.total_files = len(file_list)
-                print(f"找到{self.total_files}个文件需要处理")
-                
-                # 处理每个文件
-                for file_path in file_list:
-                    if not self.is_processing:
-                        print("处理已取消")
-                        break
-                    
-                    success = self.process_file(file_path)
-                    self.success_count += 1 if success else 0
-                    self.fail_count += 0 if success else 1
-                    self.processed_files += 1
+            
+            # 与命令行相同的进程池：识别在子进程中并行进行，重命名在本线程中按文件顺序进行
+            print(f"使用{jobs}个进程并行处理")
+            for result in iter_results_parallel(file_list, jobs, self.options, stop_event=self.stop_event):
+                self.handle_result(result)
+            
+            if self.stop_event.is_set():
+                print("处理已取消，排队中的文件不再处理")
+            if self.walker is not None:
+                self.walker.stop()
+                self.total_files = self.walker.discovered
+                print(f"共找到{self.total_files}个文件")
             
             print(f"处理完成，成功: {self.success_count}，失败: {self.fail_count}")
+            STATS.report()
         except Exception as e:
             print(f"处理过程中发生错误: {e}")
             import traceback
             traceback.print_exc(file=sys.stdout)
         finally:
+            if self.walker is not None:
+                self.walker.stop()
+            PROFILER.stop()
+            if self.metrics is not None:
+                self.metrics.close()
             # 恢复标准输出
             sys.stdout = sys_stdout
+            self.text_redirect.close_log()
             self.is_processing = False
     
-    def process_file(self, file_path):
-        try:
-            print(f"正在处理: {file_path}")
-            
-            # 根据文件类型提取文本
-            text = ""
-            if file_path.suffix.lower() == '.pdf':
-                text = self.extract_text_from_pdf(file_path)
-            elif file_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp']:
-                text = self.extract_text_from_image(file_path)
-            else:
-                print(f"不支持的文件类型: {file_path}")
-                return False
-            
-            # 查找身份证号码
-            id_number = self.find_id_card_number(text)
-            if not id_number:
-                print(f"未找到身份证号码: {file_path}")
-                return False
-            
+    def handle_result(self, result):
+        """在处理线程中根据识别结果重命名文件，并把结果交给结果表"""
+        file_path, id_number, text = result['path'], result['id_number'], result['text']
+        print(f"正在处理: {file_path}")
+        
+        # 显示提取的部分文本
+        preview = text[:200] + "..." if len(text) > 200 else text
+        print(f"提取的文本片段: {preview}")
+        
+        # 如果启用了关键字搜索
+        if self.use_keywords.get():
+            self.report_keywords(text, id_number)
+        if id_number:
             print(f"找到身份证号码: {id_number}")
-            
-            # 重命名文件
-            new_path = file_path.parent / f"{id_number}{file_path.suffix}"
-            
-            # 检查是否有重名文件
-            if new_path.exists() and file_path != new_path:
-                print(f"目标文件已存在，无法重命名: {new_path}")
-                return False
-            
-            if file_path == new_path:
-                print(f"文件已经以身份证号码命名: {file_path}")
-                return True
-            
-            file_path.rename(new_path)
-            print(f"重命名成功: {file_path} -> {new_path}")
-            return True
-        except Exception as e:
-            print(f"处理文件时出错: {file_path}, 错误: {e}")
-            return False
-    
-    def extract_text_from_image(self, image_path):
-        try:
-            image = Image.open(image_path)
-            
-            # 如果启用了区域选择
-            if self.use_region.get() and self.selected_region is not None:
-                # 裁剪图像到选定区域
-                x1, y1, x2, y2 = self.selected_region
-                image = image.crop((x1, y1, x2, y2))
-            
-            text = pytesseract.image_to_string(image, lang='chi_sim')
-            
-            # 显示提取的部分文本
-            preview = text[:200] + "..." if len(text) > 200 else text
-            print(f"提取的文本片段: {preview}")
-            
-            # 如果启用了关键字搜索
-            if self.use_keywords.get():
-                keyword_list = [k.strip() for k in self.keywords.get().split(',')]
-                print(f"使用关键字进行搜索: {', '.join(keyword_list)}")
-                
-                # 检查文本中是否包含关键字
-                found_keywords = []
-                for keyword in keyword_list:
-                    if keyword and keyword in text:
-                        found_keywords.append(keyword)
-                
-                if found_keywords:
-                    print(f"找到关键字: {', '.join(found_keywords)}")
-                else:
-                    print("未找到任何关键字")
-                    if not self.find_id_card_number(text):
-                        print("由于未找到关键字和身份证号码，跳过此文件")
-                        return ""
-            
-            return text
-        except Exception as e:
-            print(f"处理图像时出错: {image_path}, 错误: {e}")
-            return ""
-    
-    def extract_text_from_pdf(self, pdf_path):
-        try:
-            # 尝试使用PyPDF2直接提取文本
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                for page_num in range(len(reader.pages)):
-                    text += reader.pages[page_num].extract_text() or ""
-            
-            # 如果启用了关键字搜索，先检查文本是否包含关键字
-            if self.use_keywords.get() and text.strip():
-                keyword_list = [k.strip() for k in self.keywords.get().split(',')]
-                print(f"使用关键字进行搜索: {', '.join(keyword_list)}")
-                
-                # 检查文本中是否包含关键字
-                found_keywords = []
-                for keyword in keyword_list:
-                    if keyword and keyword in text:
-                        found_keywords.append(keyword)
-                
-                if found_keywords:
-                    print(f"找到关键字: {', '.join(found_keywords)}")
-                else:
-                    print("未在PDF文本中找到任何关键字")
-            
-            # 如果文本为空或很少，说明PDF可能是扫描件，使用PyMuPDF提取图像
-            if len(text.strip()) < 50:
-                print(f"PDF {pdf_path} 可能是扫描件，尝试提取图像...")
-                text = self.extract_text_from_pdf_images(pdf_path)
-            
-            # 显示提取的部分文本
-            preview = text[:200] + "..." if len(text) > 200 else text
-            print(f"提取的文本片段: {preview}")
-            
-            return text
-        except Exception as e:
-            print(f"处理PDF时出错: {pdf_path}, 错误: {e}")
-            return ""
-    
-    def extract_text_from_pdf_images(self, pdf_path):
-        try:
-            text = ""
-            doc = fitz.open(pdf_path)
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                
-                # 如果启用了区域选择
-                if self.use_region.get() and self.selected_region is not None:
-                    # 裁剪图像到选定区域
-                    x1, y1, x2, y2 = self.selected_region
-                    img = img.crop((x1, y1, x2, y2))
-                
-                page_text = pytesseract.image_to_string(img, lang='chi_sim')
-                text += page_text
-                
-                # 如果启用了关键字搜索，检查是否包含关键字
-                if self.use_keywords.get() and page_num == 0:  # 只检查第一页
-                    keyword_list = [k.strip() for k in self.keywords.get().split(',')]
-                    
-                    # 检查文本中是否包含关键字
-                    found_keywords = []
-                    for keyword in keyword_list:
-                        if keyword and keyword in page_text:
-                            found_keywords.append(keyword)
-                    
-                    if found_keywords:
-                        print(f"在PDF图像中找到关键字: {', '.join(found_keywords)}")
-                    else:
-                        print("未在PDF图像中找到任何关键字")
-                        if not self.find_id_card_number(text) and page_num == 0:
-                            print("由于未找到关键字和身份证号码，可能识别难度较大")
-            
-            doc.close()
-            return text
-        except Exception as e:
-            print(f"从PDF提取图像时出错: {pdf_path}, 错误: {e}")
-            return ""
+        
+        # 启用性能分析时记录该文件各阶段的耗时，超过阈值的记入慢文件日志
+        status = finish_result(result, None, None, self.metrics)
+        success = status in SUCCESS_STATUSES
+        self.success_count += 1 if success else 0
+        self.fail_count += 0 if success else 1
+        
+        trace = result.get('trace') or {}
+        self.processed_files += 1
+        self.processed_pages += trace.get('pages', 0)
+        new_name = result['target'].name if success else ""
+        self.result_queue.put((str(file_path), id_number or "", new_name,
+                               STATUS_ERROR if result.get('error') else status, trace.get('seconds', 0.0)))
     
-    def find_id_card_number(self, text):
-        match = re.search(ID_CARD_PATTERN, text)
-        return match.group(0) if match else None
+    def report_keywords(self, text, id_number):
+        """在日志中显示关键字匹配情况"""
+        keyword_list = [k.strip() for k in self.keywords.get().split(',')]
+        print(f"使用关键字进行搜索: {', '.join(keyword_list)}")
+        
+        # 检查文本中是否包含关键字
+        found_keywords = []
+        for keyword in keyword_list:
+            if keyword and keyword in text:
+                found_keywords.append(keyword)
+        
+        if found_keywords:
+            print(f"找到关键字: {', '.join(found_keywords)}")
+        else:
+            print("未找到任何关键字")
+            if not id_number:
+                print("由于未找到关键字和身份证号码，跳过此文件")
     
     def select_sample_image(self):
         """选择一个示例图片来定义识别区域"""
@@ -544,15 +897,16 @@ class IdCardExtractorApp:
                 x1, x2 = min(x1, x2), max(x1, x2)
                 y1, y2 = min(y1, y2), max(y1, y2)
                 
-                # 转换回原始图像坐标
-                orig_x1 = int(x1 / scale)
-                orig_y1 = int(y1 / scale)
-                orig_x2 = int(x2 / scale)
-                orig_y2 = int(y2 / scale)
+                if x2 - x1 < 2 or y2 - y1 < 2:
+                    return
+                
+                # 转换为相对于图像宽高的比例，分辨率不同的文件也能使用同一个区域
+                region = (max(0.0, x1 / new_width), max(0.0, y1 / new_height),
+                          min(1.0, x2 / new_width), min(1.0, y2 / new_height))
                 
                 # 存储选定的区域
-                self.selected_region = (orig_x1, orig_y1, orig_x2, orig_y2)
-                self.region_label.config(text=f"已设置区域: ({orig_x1}, {orig_y1}, {orig_x2}, {orig_y2})")
+                self.selected_region = region
+                self.region_label.config(text="已设置区域: 左{:.0%} 上{:.0%} 右{:.0%} 下{:.0%}".format(*region))
         
         # 绑定鼠标事件
         canvas.bind("<ButtonPress-1>", on_mouse_down)
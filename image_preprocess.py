@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+from PIL import Image
+
+# 缩放后文字的目标高度（像素），Tesseract在字高约30像素时识别效果最好
+TARGET_CHAR_HEIGHT = 32
+# 字高与目标相差在这个比例以内时不缩放
+SCALE_TOLERANCE = 0.2
+# 最多放大的倍数，避免把很小的图像放大得过于模糊
+MAX_UPSCALE = 2.0
+
+# 自适应二值化：像素比周围窗口的平均灰度低这么多时视为文字
+BINARIZE_OFFSET = 10
+# 二值化窗口边长为字高的这个倍数
+BINARIZE_WINDOW_CHARS = 1.5
+
+# 倾斜校正的最大角度和搜索步长（度）
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.25
+# 估计倾斜角度和字高时，把图像缩小到这个宽度以内再分析
+ANALYSIS_WIDTH = 1000
+# 估计倾斜角度时最多采样的文字像素数
+DESKEW_SAMPLE_PIXELS = 200000
+
+# 估计字高时去掉长度超过图像边长这个比例的直线（证件边框、表格线）
+LINE_MIN_FRACTION = 0.125
+
+# 裁剪到内容时保留的边距（像素）；一行/一列的文字像素至少为 CROP_MIN_PIXELS
+# 且不少于该行/列长度的 CROP_MIN_FRACTION 才算内容，避免噪点把整张图都算作内容
+CROP_MARGIN = 10
+CROP_MIN_PIXELS = 3
+CROP_MIN_FRACTION = 0.01
+CROP_EDGE_FRACTION = 0.03
+
+def to_gray_array(image):
+    """转换为灰度的numpy数组"""
+    if image.mode != 'L':
+        image = image.convert('L')
+    return np.asarray(image)
+
+def local_mean(gray, window):
+    """用积分图计算每个像素周围 window x window 窗口内的平均灰度"""
+    window = max(3, int(window) | 1)
+    radius = window // 2
+    padded = np.pad(gray.astype(np.float64), radius + 1, mode='edge')
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    height, width = gray.shape
+    top, left = 0, 0
+    bottom, right = top + window, left + window
+    total = (integral[bottom:bottom + height, right:right + width]
+             - integral[top:top + height, right:right + width]
+             - integral[bottom:bottom + height, left:left + width]
+             + integral[top:top + height, left:left + width])
+    return total / (window * window)
+
+def text_mask(gray, window, offset=BINARIZE_OFFSET):
+    """自适应二值化，返回文字像素为True的布尔数组
+
+    每个像素（先做3x3平滑以抑制噪点）与周围窗口的平均灰度比较，
+    光照不均和阴影不会把整片区域判为文字。
+    """
+    return local_mean(gray, 3) < local_mean(gray, window) - offset
+
+def analysis_copy(gray):
+    """缩小到 ANALYSIS_WIDTH 以内用于分析，返回 (数组, 缩小倍数)"""
+    factor = max(1, math.ceil(gray.shape[1] / ANALYSIS_WIDTH))
+    if factor == 1:
+        return gray, 1
+    small = Image.fromarray(gray).reduce(factor)
+    return np.asarray(small), factor
+
+def estimate_skew(mask):
+    """用投影法估计文字行的倾斜角度（度），返回值可以直接传给 Image.rotate
+
+    把文字像素按不同角度投影到纵轴上，文字行与投影方向平行时各行的像素数方差最大。
+    所有角度的投影在numpy中一次计算，不需要反复旋转图像。
+    """
+    ys, xs = np.nonzero(mask)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > DESKEW_SAMPLE_PIXELS:
+        step = len(ys) // DESKEW_SAMPLE_PIXELS + 1
+        ys, xs = ys[::step], xs[::step]
+
+    angles = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP)
+    slopes = np.tan(np.radians(angles))
+    # 每一行为一个角度下各像素投影后的行号
+    rows = np.rint(ys[np.newaxis, :] - xs[np.newaxis, :] * slopes[:, np.newaxis]).astype(np.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+    length = int(rows.max()) + 1
+    offsets = np.arange(len(angles))[:, np.newaxis] * length
+    profiles = np.bincount((rows + offsets).ravel(), minlength=len(angles) * length).reshape(len(angles), length)
+    best = int(np.argmax(profiles.var(axis=1)))
+    return float(angles[best])
+
+def long_runs(mask, length, axis):
+    """沿 axis 方向连续长度不少于 length 的像素，用滑动窗口和一次计算"""
+    count = mask.shape[axis]
+    if length > count:
+        return np.zeros_like(mask)
+    shape = list(mask.shape)
+    shape[axis] = 1
+    zeros = np.zeros(shape, dtype=np.int32)
+    cumulative = np.concatenate((zeros, np.cumsum(mask, axis=axis, dtype=np.int32)), axis=axis)
+    # 以每个位置开始的窗口是否全部为前景
+    full = (np.take(cumulative, range(length, count + 1), axis=axis)
+            - np.take(cumulative, range(0, count - length + 1), axis=axis)) == length
+    # 被任意一个全前景窗口覆盖的像素
+    covered = np.concatenate((zeros, np.cumsum(full, axis=axis, dtype=np.int32)), axis=axis)
+    padding = [(0, 0)] * mask.ndim
+    padding[axis] = (0, length - 1)
+    covered = np.pad(covered, padding, mode='edge')
+    index = np.arange(count)
+    starts = np.take(covered, np.maximum(index - length + 1, 0), axis=axis)
+    ends = np.take(covered, index + 1, axis=axis)
+    return (ends - starts) > 0
+
+def remove_lines(mask):
+    """去掉长的水平线和竖直线，只保留文字"""
+    length = max(10, int(min(mask.shape) * LINE_MIN_FRACTION))
+    return mask & ~long_runs(mask, length, 0) & ~long_runs(mask, length, 1)
+
+def estimate_char_height(mask):
+    """根据文字行的水平投影估计字高（像素），无法估计时返回None"""
+    mask = remove_lines(mask)
+    row_pixels = mask.sum(axis=1)
+    is_text = row_pixels > max(CROP_MIN_PIXELS, mask.shape[1] * CROP_MIN_FRACTION)
+    # 连续的文字行的起止位置
+    edges = np.diff(np.concatenate(([0], is_text.astype(np.int8), [0])))
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    heights = ends - starts
+    heights = heights[heights >= 3]
+    if len(heights) == 0:
+        return None
+    return float(np.median(heights))
+
+def content_box(mask, margin=CROP_MARGIN):
+    """文字像素所在的边界框 (x1, y1, x2, y2)，不包括边框线，没有文字时返回None
+
+    紧贴图像边缘的一圈像素（旋转留下的接缝、扫描仪边缘的阴影）不算内容。
+    """
+    mask = remove_lines(mask)
+    height, width = mask.shape
+    edge_y, edge_x = int(height * CROP_EDGE_FRACTION), int(width * CROP_EDGE_FRACTION)
+    mask[:edge_y] = False
+    mask[height - edge_y:] = False
+    mask[:, :edge_x] = False
+    mask[:, width - edge_x:] = False
+    rows = np.nonzero(mask.sum(axis=1) >= max(CROP_MIN_PIXELS, width * CROP_MIN_FRACTION))[0]
+    cols = np.nonzero(mask.sum(axis=0) >= max(CROP_MIN_PIXELS, height * CROP_MIN_FRACTION))[0]
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    return (max(0, int(cols[0]) - margin), max(0, int(rows[0]) - margin),
+            min(width, int(cols[-1]) + 1 + margin), min(height, int(rows[-1]) + 1 + margin))
+
+def rotate_gray(gray, angle):
+    """旋转灰度数组，露出的角落用图像边缘的灰度填充，避免产生新的边框"""
+    border = np.concatenate((gray[0], gray[-1], gray[:, 0], gray[:, -1]))
+    rotated = Image.fromarray(gray).rotate(angle, resample=Image.Resampling.BICUBIC, expand=True,
+                                           fillcolor=int(np.median(border)))
+    return np.asarray(rotated)
+
+def preprocess_image(image, char_height=TARGET_CHAR_HEIGHT, binarize=True, deskew=True, crop_content=False):
+    """OCR前的图像预处理：灰度化、倾斜校正、缩放到目标字高、自适应二值化、裁剪到内容
+
+    倾斜角度和字高都在缩小后的副本上估计；原图先缩放再旋转，大图只做一次缩放和一次旋转。
+    返回处理后的灰度图像（二值化时只有0和255两种灰度）。
+    """
+    gray = to_gray_array(image)
+
+    small, factor = analysis_copy(gray)
+    window = max(15, small.shape[1] // 40)
+    small_mask = text_mask(small, window)
+
+    angle = 0.0
+    if deskew:
+        angle = estimate_skew(small_mask)
+        if abs(angle) >= DESKEW_STEP:
+            small_mask = text_mask(rotate_gray(small, angle), window)
+        else:
+            angle = 0.0
+
+    # 缩放后的字高，用于确定二值化窗口
+    measured = estimate_char_height(small_mask)
+    text_height = measured * factor if measured else TARGET_CHAR_HEIGHT
+    if char_height and measured:
+        scale = min(MAX_UPSCALE, char_height / text_height)
+        if abs(scale - 1) > SCALE_TOLERANCE:
+            height, width = gray.shape
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            resample = Image.Resampling.LANCZOS if scale < 1 else Image.Resampling.BICUBIC
+            gray = np.asarray(Image.fromarray(gray).resize(size, resample))
+            text_height *= scale
+
+    if angle:
+        gray = rotate_gray(gray, angle)
+
+    if binarize or crop_content:
+        mask = text_mask(gray, BINARIZE_WINDOW_CHARS * text_height)
+        if crop_content:
+            box = content_box(mask)
+            if box is not None:
+                x1, y1, x2, y2 = box
+                gray = gray[y1:y2, x1:x2]
+                mask = mask[y1:y2, x1:x2]
+        if binarize:
+            gray = np.where(mask, 0, 255).astype(np.uint8)
+
+    return Image.fromarray(gray)
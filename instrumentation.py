@@ -0,0 +1,507 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import cProfile
+import json
+import math
+import os
+import pstats
+import sys
+import time
+
+# 阶段名称在报告中显示的中文说明
+STAGE_LABELS = {
+    'ocr_tier1': 'OCR第一层(号码区域)',
+    'ocr_tier2': 'OCR第二层(全页)',
+    'page_embedded': 'PDF嵌入图像提取',
+    'page_render': 'PDF页面渲染',
+    'ocr_page': 'PDF页面OCR',
+    'preprocess': '图像预处理',
+    'image_decode': '图像解码',
+    'orientation': '方向检测(号码区域)',
+    'layout': '号码区域定位',
+    'split_write': 'PDF拆分写入',
+    'text_layer': 'PDF文本层提取',
+    'id_search': '号码查找',
+    'rename': '重命名',
+}
+
+# Prometheus文本文件中耗时直方图的桶上限（秒），以及处理过程中更新该文件的最短间隔（秒）
+PROMETHEUS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+PROMETHEUS_INTERVAL = 15.0
+PROMETHEUS_PREFIX = 'id_extractor'
+
+# 处理耗时超过该秒数的文件记入慢文件日志
+SLOW_FILE_SECONDS = 10.0
+# 每个文件记录的不同图像尺寸的数量上限（多页PDF的页面尺寸通常相同）
+TRACE_IMAGE_SIZES_LIMIT = 20
+
+
+def stage_label(name):
+    """阶段名称的中文说明，名称中@后面的部分（如分辨率）显示在括号中"""
+    base, _, detail = name.partition('@')
+    label = STAGE_LABELS.get(base, base)
+    return f"{label}({detail})" if detail else label
+
+class StageStats:
+    """按阶段累计调用次数、命中次数和耗时
+
+    每个进程各自累计，子进程通过 snapshot_and_reset() 把增量交给主进程合并。
+    在 begin_trace() 和 end_trace() 之间还会单独记录当前文件各阶段的耗时和CPU时间，
+    不记录时只多一次判断，几乎没有开销。
+    """
+
+    def __init__(self):
+        self.stages = {}
+        # 各子进程的内存峰值（字节），键为进程号
+        self.peaks = {}
+        # 正在记录的当前文件，见 begin_trace
+        self.trace = None
+
+    def _entry(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'calls': 0, 'checked': 0, 'hits': 0, 'seconds': 0.0}
+        return self.stages[name]
+
+    def record(self, name, seconds, hit=None, memory=None):
+        """记录一次阶段调用
+
+        seconds 为耗时（秒）或 Timer，传入 Timer 时当前文件的记录中还包括CPU时间。
+        hit为None表示该阶段不统计命中率；memory为本次调用占用的内存（字节），如渲染出的位图大小。
+        """
+        cpu_seconds = None
+        if isinstance(seconds, Timer):
+            seconds, cpu_seconds = seconds.seconds, seconds.cpu_seconds
+        if self.trace is not None:
+            add_trace_stage(self.trace, name, seconds, cpu_seconds)
+        entry = self._entry(name)
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        if hit is not None:
+            entry['checked'] += 1
+            entry['hits'] += 1 if hit else 0
+        if memory is not None:
+            entry['memory'] = entry.get('memory', 0) + memory
+            entry['max_memory'] = max(entry.get('max_memory', 0), memory)
+
+    def merge(self, stages):
+        """合并其他进程的统计增量"""
+        for name, values in stages.items():
+            entry = self._entry(name)
+            for key, value in values.items():
+                if key.startswith('max_'):
+                    entry[key] = max(entry.get(key, 0), value)
+                else:
+                    entry[key] = entry.get(key, 0) + value
+
+    def count(self, pages=0, size=None):
+        """记录当前文件处理的页数和解码或渲染出的图像尺寸 (宽, 高)，不记录当前文件时不做任何事"""
+        if self.trace is None:
+            return
+        self.trace['pages'] += pages
+        if size is not None:
+            width, height = size
+            self.trace['pixels'] += width * height
+            add_image_size(self.trace, [width, height])
+
+    def begin_trace(self, path=None):
+        """开始记录一个文件的各阶段耗时，指定 path 时记录文件大小"""
+        self.trace = new_trace()
+        if path is not None:
+            try:
+                self.trace['bytes'] = os.path.getsize(path)
+            except OSError:
+                pass
+        self.trace['start'] = time.perf_counter()
+        self.trace['cpu_start'] = cpu_time()
+
+    def end_trace(self):
+        """结束记录，返回当前文件的记录（可以序列化，子进程把它交给主进程）"""
+        trace = self.trace
+        self.trace = None
+        if trace is None:
+            return None
+        trace['seconds'] = time.perf_counter() - trace.pop('start')
+        trace['cpu_seconds'] = cpu_time() - trace.pop('cpu_start')
+        return trace
+
+    def record_peak(self, pid, memory):
+        """记录子进程的内存峰值"""
+        if memory is not None:
+            self.peaks[pid] = max(self.peaks.get(pid, 0), memory)
+
+    def snapshot_and_reset(self):
+        """返回当前统计并清空"""
+        stages = self.stages
+        self.stages = {}
+        return stages
+
+    def report(self):
+        """打印各阶段的命中率和耗时"""
+        if not self.stages:
+            return
+        print("识别统计:")
+        for name, entry in self.stages.items():
+            label = stage_label(name)
+            calls = entry['calls']
+            average = entry['seconds'] / calls if calls else 0
+            line = f"  {label}: 调用{calls}次"
+            if entry['checked']:
+                hit_rate = entry['hits'] / entry['checked'] * 100
+                line += f"，命中{entry['hits']}次({hit_rate:.1f}%)"
+            if entry.get('memory'):
+                line += (f"，平均内存{entry['memory'] / calls / 1024 / 1024:.1f}MB"
+                         f"，最大{entry['max_memory'] / 1024 / 1024:.1f}MB")
+            print(f"{line}，耗时{entry['seconds']:.2f}秒，平均{average:.3f}秒")
+        self.report_peaks()
+
+    def report_peaks(self):
+        """打印内存峰值：并行处理时为各子进程，否则为当前进程"""
+        if self.peaks:
+            peaks = list(self.peaks.values())
+            print(f"  内存峰值: {len(peaks)}个子进程，最大{max(peaks) / 1024 / 1024:.1f}MB，"
+                  f"平均{sum(peaks) / len(peaks) / 1024 / 1024:.1f}MB")
+        else:
+            peak = peak_memory()
+            if peak is not None:
+                print(f"  内存峰值: {peak / 1024 / 1024:.1f}MB")
+
+def peak_memory():
+    """当前进程的内存峰值（常驻内存，字节），系统不支持时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def address_space_size():
+    """当前进程已占用的地址空间（字节），无法获取时返回0"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def limit_memory(limit_mb):
+    """限制当前进程在已占用的内存之外最多再使用 limit_mb，超出时分配内存会抛出MemoryError
+    
+    通过 RLIMIT_AS 限制地址空间，上限为调用时已占用的地址空间（解释器和已加载的库）加上 limit_mb；
+    由本进程启动的tesseract等子进程继承同样的上限。
+    只在支持 resource 模块的系统（Linux、macOS）上有效，返回是否设置成功。
+    """
+    try:
+        import resource
+        limit = address_space_size() + int(limit_mb * 1024 * 1024)
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        return True
+    except (ImportError, ValueError, OSError) as e:
+        print(f"无法限制进程{os.getpid()}的内存: {e}")
+        return False
+
+def cpu_time():
+    """当前进程和已经结束的子进程（如pytesseract启动的tesseract）占用的CPU时间（秒）"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+class Timer:
+    """计时上下文管理器，正在记录当前文件时（见 StageStats.begin_trace）同时测量CPU时间"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.cpu_start = cpu_time() if STATS.trace is not None else None
+        self.seconds = 0.0
+        self.cpu_seconds = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.start
+        if self.cpu_start is not None:
+            self.cpu_seconds = cpu_time() - self.cpu_start
+        return False
+
+def new_trace():
+    """一个文件的记录：总耗时、CPU时间、文件大小、页数、像素数、图像尺寸和各阶段的调用次数、耗时、CPU时间"""
+    return {'seconds': 0.0, 'cpu_seconds': 0.0, 'bytes': 0, 'pages': 0, 'pixels': 0, 'image_sizes': [], 'stages': {}}
+
+def add_image_size(trace, size):
+    if size not in trace['image_sizes'] and len(trace['image_sizes']) < TRACE_IMAGE_SIZES_LIMIT:
+        trace['image_sizes'].append(size)
+
+def add_trace_stage(trace, name, seconds, cpu_seconds=None):
+    stage = trace['stages'].setdefault(name, {'calls': 0, 'seconds': 0.0, 'cpu_seconds': 0.0})
+    stage['calls'] += 1
+    stage['seconds'] += seconds
+    stage['cpu_seconds'] += cpu_seconds or 0.0
+
+def merge_traces(traces):
+    """合并同一文件分段处理得到的多个记录，总耗时和CPU时间为各段之和"""
+    merged = new_trace()
+    for trace in traces:
+        if trace is None:
+            continue
+        for key in ('seconds', 'cpu_seconds', 'pages', 'pixels'):
+            merged[key] += trace[key]
+        merged['bytes'] = max(merged['bytes'], trace['bytes'])
+        for size in trace['image_sizes']:
+            add_image_size(merged, size)
+        for name, values in trace['stages'].items():
+            stage = merged['stages'].setdefault(name, {'calls': 0, 'seconds': 0.0, 'cpu_seconds': 0.0})
+            for key, value in values.items():
+                stage[key] += value
+    return merged
+
+def percentile(sorted_values, fraction):
+    """已排序列表的分位数（最近秩法）"""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+    """固定桶的耗时直方图，内存占用与处理的文件数无关"""
+
+    def __init__(self, buckets=PROMETHEUS_BUCKETS):
+        self.buckets = buckets
+        # 最后一个位置为超过所有桶上限的值
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def write(self, lines, name, labels=''):
+        """按Prometheus histogram格式输出：累计的各桶计数、_sum 和 _count"""
+        separator = ',' if labels else ''
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}')
+        labels = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{labels} {self.sum:.6f}')
+        lines.append(f'{name}_count{labels} {self.count}')
+
+class FileMetrics:
+    """逐文件的处理记录
+    
+    每个文件一行JSON写入 jsonl_path：路径、状态、失败原因、总耗时和CPU时间、页数、像素数以及各阶段的耗时；
+    同时汇总为 node_exporter textfile collector 可以读取的Prometheus文本文件 prom_path：
+    处理数量、失败原因、吞吐量、总耗时和各阶段耗时的直方图。Prometheus文件在处理过程中定期更新，
+    先写入临时文件再替换，不会被读到一半。
+    
+    指定 slow_path 时，处理耗时达到 slow_seconds 的文件另外记入慢文件日志（JSON lines）：
+    文件大小、页数、图像尺寸和按耗时排序的各阶段，用于找出特别大的TIFF、几百页的PDF等异常输入。
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None, slow_path=None, slow_seconds=SLOW_FILE_SECONDS):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.slow_path = slow_path
+        self.slow_seconds = slow_seconds
+        self.file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self.slow_file = open(slow_path, 'a', encoding='utf-8') if slow_path else None
+        self.slow_count = 0
+        self.started = time.time()
+        self.last_written = 0.0
+        self.file_seconds = Histogram()
+        self.stage_seconds = {}
+        self.stage_cpu_seconds = {}
+        self.statuses = {}
+        self.failures = {}
+        self.pages = 0
+        self.pixels = 0
+
+    def record(self, path, trace, status, id_number=None, reason=None, error=None):
+        """记录一个文件的处理结果；reason 为失败原因，处理成功时为None"""
+        trace = trace or new_trace()
+        if self.file is not None:
+            entry = {
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'path': os.path.abspath(path),
+                'status': status,
+                'reason': reason,
+                'error': error,
+                'id_number': id_number,
+                'seconds': round(trace['seconds'], 6),
+                'cpu_seconds': round(trace['cpu_seconds'], 6),
+                'bytes': trace['bytes'],
+                'pages': trace['pages'],
+                'pixels': trace['pixels'],
+                'image_sizes': trace['image_sizes'],
+                'stages': {name: {key: round(value, 6) if isinstance(value, float) else value for key, value in values.items()}
+                           for name, values in trace['stages'].items()},
+            }
+            self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.file.flush()
+
+        self.file_seconds.observe(trace['seconds'])
+        for name, values in trace['stages'].items():
+            self.stage_seconds.setdefault(name, Histogram()).observe(values['seconds'])
+            self.stage_cpu_seconds[name] = self.stage_cpu_seconds.get(name, 0.0) + values['cpu_seconds']
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if reason is not None:
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+        self.pages += trace['pages']
+        self.pixels += trace['pixels']
+        if self.slow_file is not None and trace['seconds'] >= self.slow_seconds:
+            self.record_slow(path, trace, status)
+
+        if self.prom_path and time.time() - self.last_written >= PROMETHEUS_INTERVAL:
+            self.write_prometheus()
+
+    def record_slow(self, path, trace, status):
+        """把耗时超过阈值的文件记入慢文件日志，各阶段按耗时从多到少排列"""
+        stages = sorted(trace['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'path': os.path.abspath(path),
+            'status': status,
+            'seconds': round(trace['seconds'], 3),
+            'cpu_seconds': round(trace['cpu_seconds'], 3),
+            'bytes': trace['bytes'],
+            'pages': trace['pages'],
+            'pixels': trace['pixels'],
+            'image_sizes': trace['image_sizes'],
+            'stages': [{'stage': name, 'label': stage_label(name), 'calls': values['calls'],
+                        'seconds': round(values['seconds'], 3), 'cpu_seconds': round(values['cpu_seconds'], 3)}
+                       for name, values in stages],
+        }
+        self.slow_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.slow_file.flush()
+        self.slow_count += 1
+        slowest = f"，最慢的阶段: {stage_label(stages[0][0])} {stages[0][1]['seconds']:.1f}秒" if stages else ""
+        print(f"处理较慢（{trace['seconds']:.1f}秒，{trace['bytes'] / 1024 / 1024:.1f}MB，{trace['pages']}页{slowest}）: {path}")
+
+    def write_prometheus(self):
+        """写入Prometheus文本文件"""
+        prefix = PROMETHEUS_PREFIX
+        elapsed = max(time.time() - self.started, 1e-9)
+        lines = [
+            f'# HELP {prefix}_files_total 按状态统计的已处理文件数',
+            f'# TYPE {prefix}_files_total counter',
+        ]
+        lines += [f'{prefix}_files_total{{status="{prometheus_label(status)}"}} {count}' for status, count in self.statuses.items()]
+        lines += [
+            f'# HELP {prefix}_failures_total 按原因统计的失败文件数',
+            f'# TYPE {prefix}_failures_total counter',
+        ]
+        lines += [f'{prefix}_failures_total{{reason="{prometheus_label(reason)}"}} {count}' for reason, count in self.failures.items()]
+        lines += [
+            f'# HELP {prefix}_files_per_second 本批次开始以来的平均吞吐量（文件/秒）',
+            f'# TYPE {prefix}_files_per_second gauge',
+            f'{prefix}_files_per_second {self.file_seconds.count / elapsed:.6f}',
+            f'# HELP {prefix}_pages_total 已处理的页数',
+            f'# TYPE {prefix}_pages_total counter',
+            f'{prefix}_pages_total {self.pages}',
+            f'# HELP {prefix}_pixels_total 已解码或渲染的图像像素数',
+            f'# TYPE {prefix}_pixels_total counter',
+            f'{prefix}_pixels_total {self.pixels}',
+            f'# HELP {prefix}_last_update_timestamp_seconds 本文件的更新时间',
+            f'# TYPE {prefix}_last_update_timestamp_seconds gauge',
+            f'{prefix}_last_update_timestamp_seconds {time.time():.3f}',
+        ]
+        if self.file_seconds.count:
+            lines += [f'# HELP {prefix}_file_seconds 每个文件的处理耗时（秒）', f'# TYPE {prefix}_file_seconds histogram']
+            self.file_seconds.write(lines, f'{prefix}_file_seconds')
+        if self.stage_seconds:
+            lines += [f'# HELP {prefix}_stage_seconds 每个文件在各阶段的耗时（秒）', f'# TYPE {prefix}_stage_seconds histogram']
+            for name, histogram in self.stage_seconds.items():
+                histogram.write(lines, f'{prefix}_stage_seconds', f'stage="{prometheus_label(name)}"')
+            lines += [f'# HELP {prefix}_stage_cpu_seconds_total 各阶段占用的CPU时间（秒）',
+                      f'# TYPE {prefix}_stage_cpu_seconds_total counter']
+            lines += [f'{prefix}_stage_cpu_seconds_total{{stage="{prometheus_label(name)}"}} {seconds:.6f}'
+                      for name, seconds in self.stage_cpu_seconds.items()]
+
+        temp_path = f"{self.prom_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, self.prom_path)
+        self.last_written = time.time()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.slow_file is not None:
+            self.slow_file.close()
+            self.slow_file = None
+            print(f"慢文件日志: {self.slow_count}个文件处理超过{self.slow_seconds:g}秒，已记录到 {self.slow_path}")
+        if self.prom_path:
+            self.write_prometheus()
+
+class _ProfileData:
+    """子进程交回的cProfile统计，供 pstats.Stats 读取"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def profile_call(func, *args):
+    """在cProfile下执行 func，返回 (返回值, 统计)；统计可以序列化，由子进程交给主进程的 BatchProfiler.add 合并"""
+    profile = cProfile.Profile()
+    result = profile.runcall(func, *args)
+    profile.create_stats()
+    return result, profile.stats
+
+class BatchProfiler:
+    """用cProfile分析整个批次，写入pstats文件
+    
+    分析 start() 和 stop() 之间当前线程执行的代码；并行处理时子进程用 profile_call 分析每个任务，
+    统计随结果交回主进程，通过 add() 合并到同一个文件中。结果可以用 python -m pstats 或 snakeviz 查看。
+    """
+
+    def __init__(self):
+        self.path = None
+        self.profile = None
+        self.stats = None
+
+    def start(self, path):
+        self.path = path
+        self.stats = None
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def add(self, stats):
+        """合并子进程的统计，没有在分析时不做任何事"""
+        if self.profile is None or not stats:
+            return
+        if self.stats is None:
+            self.stats = pstats.Stats(_ProfileData(stats))
+        else:
+            self.stats.add(_ProfileData(stats))
+
+    def cancel(self):
+        """停止分析，不写入文件；以fork方式启动的子进程会继承主进程正在进行的分析"""
+        if self.profile is not None:
+            self.profile.disable()
+        self.profile = None
+        self.stats = None
+
+    def stop(self):
+        """停止分析并写入pstats文件，没有在分析时不做任何事"""
+        if self.profile is None:
+            return
+        self.profile.disable()
+        self.profile.create_stats()
+        self.add(self.profile.stats)
+        self.profile = None
+        self.stats.dump_stats(self.path)
+        print(f"性能分析结果已写入: {self.path}（用 python -m pstats {self.path} 查看）")
+        self.stats = None
+
+# 当前进程的统计
+STATS = StageStats()
+# 主进程的性能分析，见 BatchProfiler
+PROFILER = BatchProfiler()
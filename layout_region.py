@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+
+from id_candidates import ID_LABELS, extract_candidates
+
+# 号码区域四周留出的边距，为号码所在行高的倍数
+BAND_MARGIN_LINES = 0.6
+# 模板键中宽高比保留的小数位数：同一模板的扫描件分辨率不同，但宽高比基本相同
+ASPECT_DIGITS = 2
+# 每个进程记住的模板布局，键见 layout_key，值为号码区域（按图像宽高的比例）
+_layout_templates = {}
+LAYOUT_TEMPLATES_LIMIT = 1000
+
+def region_box(region, width, height):
+    """把区域换算为 width x height 图像中的像素坐标 (x1, y1, x2, y2)
+
+    区域的四个值都不超过1时为相对于图像宽高的比例，与分辨率无关；
+    否则为像素坐标（旧版本保存的区域）。
+    """
+    x1, y1, x2, y2 = region
+    if max(region) <= 1:
+        return (round(x1 * width), round(y1 * height), round(x2 * width), round(y2 * height))
+    return (int(x1), int(y1), int(x2), int(y2))
+
+def layout_key(image):
+    """图像的布局模板键：宽高比"""
+    width, height = image.size
+    return round(width / height, ASPECT_DIGITS)
+
+def layout_band(key):
+    """模板上次确认的号码区域，没有时返回None"""
+    return _layout_templates.get(key)
+
+def remember_layout(key, band):
+    if key not in _layout_templates and len(_layout_templates) >= LAYOUT_TEMPLATES_LIMIT:
+        _layout_templates.clear()
+    _layout_templates[key] = band
+
+def group_lines(words):
+    """按行分组，保持识别顺序"""
+    lines = {}
+    for word in words:
+        lines.setdefault(word['line'], []).append(word)
+    return list(lines.values())
+
+def words_to_text(words):
+    """把 image_to_data 识别出的单词拼接为与 image_to_string 相当的文本"""
+    return '\n'.join(' '.join(word['text'] for word in line) for line in group_lines(words))
+
+def union_box(words):
+    return (min(word['left'] for word in words), min(word['top'] for word in words),
+            max(word['left'] + word['width'] for word in words), max(word['top'] + word['height'] for word in words))
+
+def to_band(box, line_height, width, height):
+    """在像素框四周加上边距，换算为按图像宽高的比例"""
+    margin = line_height * BAND_MARGIN_LINES
+    x1, y1, x2, y2 = box
+    return (max(0.0, (x1 - margin) / width), max(0.0, (y1 - margin) / height),
+            min(1.0, (x2 + margin) / width), min(1.0, (y2 + margin) / height))
+
+def find_number_band(words, size, id_number=None):
+    """根据单词位置推算号码区域，返回 (区域, 依据)，区域为按图像宽高的比例；找不到时返回 (None, None)
+
+    优先使用号码本身所在的单词：一行文本中包含 id_number 时，取该行中含数字的单词。
+    没有识别出号码时，找到"公民身份号码"等标签，取同一行标签右侧直到图像右边缘的区域。
+    """
+    width, height = size
+    lines = group_lines(words)
+
+    if id_number:
+        for line in lines:
+            text = ' '.join(word['text'] for word in line)
+            if any(candidate.number == id_number for candidate in extract_candidates(text)):
+                digits = [word for word in line if re.search(r'\d', word['text'])]
+                box = union_box(digits)
+                return to_band(box, box[3] - box[1], width, height), 'number'
+
+    for line in lines:
+        joined = ''
+        for index, word in enumerate(line):
+            joined += word['text']
+            if any(label in joined for label in ID_LABELS):
+                label_box = union_box(line[:index + 1])
+                line_height = label_box[3] - label_box[1]
+                box = (label_box[2], label_box[1], width, label_box[3])
+                return to_band(box, line_height, width, height), 'label'
+    return None, None
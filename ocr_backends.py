@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing.util
+import os
+
+import pytesseract
+
+# 默认的OCR引擎
+DEFAULT_BACKEND = 'pytesseract'
+
+# 每个进程内已创建的OCR引擎，键为引擎名称
+_backends = {}
+# 创建 _backends 中的引擎的进程；fork出的子进程不使用继承来的引擎
+_owner_pid = None
+
+class OcrBackend:
+    """OCR引擎接口
+
+    psm为Tesseract页面分割模式，为None时使用默认值；whitelist为允许识别的字符。
+    """
+
+    name = None
+
+    def image_to_string(self, image, lang, psm=None, whitelist=None):
+        raise NotImplementedError
+
+    def image_to_data(self, image, lang, psm=None, whitelist=None):
+        """识别图像中的单词及其位置
+
+        返回单词列表，每个单词为字典：text、left、top、width、height（像素）、
+        conf（置信度）和 line（所在行的标识，同一行的单词相同）。
+        """
+        raise NotImplementedError
+
+    def version(self):
+        """引擎版本号，作为识别缓存键的一部分"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class PytesseractBackend(OcrBackend):
+    """通过pytesseract调用tesseract可执行文件，每次识别启动一个新进程"""
+
+    name = 'pytesseract'
+
+    def image_to_string(self, image, lang, psm=None, whitelist=None):
+        config = []
+        if psm is not None:
+            config.append(f'--psm {psm}')
+        if whitelist:
+            config.append(f'-c tessedit_char_whitelist={whitelist}')
+        return pytesseract.image_to_string(image, lang=lang, config=' '.join(config))
+
+    def image_to_data(self, image, lang, psm=None, whitelist=None):
+        config = []
+        if psm is not None:
+            config.append(f'--psm {psm}')
+        if whitelist:
+            config.append(f'-c tessedit_char_whitelist={whitelist}')
+        data = pytesseract.image_to_data(image, lang=lang, config=' '.join(config), output_type=pytesseract.Output.DICT)
+        words = []
+        for i, text in enumerate(data['text']):
+            if data['level'][i] != 5 or not text.strip():
+                continue
+            words.append({
+                'text': text.strip(),
+                'left': data['left'][i],
+                'top': data['top'][i],
+                'width': data['width'][i],
+                'height': data['height'][i],
+                'conf': float(data['conf'][i]),
+                'line': (data['page_num'][i], data['block_num'][i], data['par_num'][i], data['line_num'][i]),
+            })
+        return words
+
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+class TesserocrBackend(OcrBackend):
+    """通过tesserocr在进程内常驻Tesseract API
+
+    每种 (语言, 页面分割模式) 组合只加载一次模型，图像直接在内存中传递，
+    不需要启动tesseract进程，也不需要写临时文件。
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        import tesserocr
+        self.tesserocr = tesserocr
+        self.apis = {}
+
+    def _api(self, lang, psm):
+        key = (lang, psm)
+        if key not in self.apis:
+            self.apis[key] = self.tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+        return self.apis[key]
+
+    def image_to_string(self, image, lang, psm=None, whitelist=None):
+        api = self._api(lang, psm if psm is not None else self.tesserocr.PSM.AUTO)
+        api.SetVariable('tessedit_char_whitelist', whitelist or '')
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    def image_to_data(self, image, lang, psm=None, whitelist=None):
+        api = self._api(lang, psm if psm is not None else self.tesserocr.PSM.AUTO)
+        api.SetVariable('tessedit_char_whitelist', whitelist or '')
+        api.SetImage(image)
+        api.Recognize()
+        word_level = self.tesserocr.RIL.WORD
+        words = []
+        line = 0
+        iterator = api.GetIterator()
+        for word in self.tesserocr.iterate_level(iterator, word_level):
+            if word.IsAtBeginningOf(self.tesserocr.RIL.TEXTLINE):
+                line += 1
+            text = word.GetUTF8Text(word_level)
+            box = word.BoundingBox(word_level)
+            if not text or not text.strip() or box is None:
+                continue
+            x1, y1, x2, y2 = box
+            words.append({
+                'text': text.strip(),
+                'left': x1,
+                'top': y1,
+                'width': x2 - x1,
+                'height': y2 - y1,
+                'conf': word.Confidence(word_level),
+                'line': line,
+            })
+        return words
+
+    def version(self):
+        return self.tesserocr.tesseract_version().split()[1]
+
+    def close(self):
+        for api in self.apis.values():
+            api.End()
+        self.apis = {}
+
+BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+def get_backend(name=DEFAULT_BACKEND):
+    """获取当前进程中的OCR引擎，同一引擎只创建一次
+
+    无法创建时抛出异常，不会悄悄改用其他引擎：识别缓存的键中记录的是指定的引擎，
+    改用其他引擎的识别结果会被当作指定引擎的结果缓存。启动时用 check_backend 检查。
+    每个进程第一次创建引擎时注册退出时调用 close_backends（进程池的子进程退出时不执行 atexit，
+    因此使用 multiprocessing 的 Finalize）。
+    """
+    global _owner_pid
+    if _owner_pid != os.getpid():
+        _backends.clear()
+        _owner_pid = os.getpid()
+        multiprocessing.util.Finalize(None, close_backends, exitpriority=10)
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+def check_backend(name):
+    """检查OCR引擎能否使用，返回错误信息，可以使用时返回None"""
+    try:
+        get_backend(name)
+    except Exception as e:
+        return f"无法使用OCR引擎 {name}: {e}"
+    return None
+
+def close_backends():
+    """释放当前进程中的所有OCR引擎"""
+    for backend in _backends.values():
+        try:
+            backend.close()
+        except Exception as e:
+            print(f"释放OCR引擎 {backend.name} 时出错: {e}")
+    _backends.clear()
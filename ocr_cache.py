@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import multiprocessing.util
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 默认缓存目录和大小上限
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'id_card_extractor'
+DEFAULT_CACHE_SIZE_MB = 256
+CACHE_DB_NAME = 'ocr_cache.sqlite3'
+
+# 每写入多少条记录检查一次缓存大小
+EVICT_CHECK_INTERVAL = 100
+# 超出上限时淘汰到上限的比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+# 每条记录除文本外的估算开销（字节）
+ENTRY_OVERHEAD = 128
+
+# 每个进程内已打开的缓存，键为 (缓存目录, 大小上限)
+_open_caches = {}
+# 打开 _open_caches 中的缓存的进程；fork出的子进程继承的连接不能使用，需要重新打开
+_owner_pid = None
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA-256哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class OcrCache:
+    """基于SQLite的OCR结果缓存
+
+    键为文件内容哈希加上影响识别结果的参数（Tesseract版本、语言、裁剪区域、DPI等），
+    值为识别出的文本和身份证号码。总大小超过上限时按最近访问时间淘汰旧记录。
+    多个进程可以同时使用同一个缓存文件；同一进程内的多个线程共用一个连接，由锁串行访问。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.writes = 0
+        # put 在持有锁时调用 evict，因此使用可重入锁
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(str(self.cache_dir / CACHE_DB_NAME), timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, text TEXT NOT NULL, id_number TEXT, '
+            'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def make_key(self, content_hash, params):
+        """由文件内容哈希和识别参数生成缓存键"""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{content_hash}:{payload}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """查询缓存，命中时返回 (文本, 身份证号码)，否则返回None"""
+        with self.lock:
+            row = self.conn.execute('SELECT text, id_number FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        return row[0], row[1]
+
+    def put(self, key, text, id_number):
+        """写入识别结果"""
+        size = len(text.encode('utf-8')) + ENTRY_OVERHEAD
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO entries (key, text, id_number, size, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, text, id_number, size, time.time())
+            )
+            self.writes += 1
+            if self.writes % EVICT_CHECK_INTERVAL == 0:
+                self.evict()
+
+    def total_size(self):
+        """缓存记录的估算总大小（字节）"""
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def evict(self):
+        """总大小超过上限时，删除最久未访问的记录"""
+        with self.lock:
+            total = self.total_size()
+            if total <= self.max_size:
+                return 0
+
+            target = self.max_size * EVICT_TARGET_RATIO
+            rows = self.conn.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall()
+            stale_keys = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                stale_keys.append((key,))
+                total -= size
+
+            self.conn.execute('BEGIN')
+            self.conn.executemany('DELETE FROM entries WHERE key = ?', stale_keys)
+            self.conn.execute('COMMIT')
+        return len(stale_keys)
+
+    def close(self):
+        with self.lock:
+            self.evict()
+            self.conn.close()
+
+def open_cache(cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+    """获取当前进程中的缓存实例，同一目录只打开一次
+    
+    每个进程第一次打开时注册退出时的清理（见 close_caches）。使用 multiprocessing 的 Finalize
+    而不是 atexit：进程池的子进程退出时不执行 atexit，但会执行 Finalize 注册的函数。
+    """
+    global _owner_pid
+    if _owner_pid != os.getpid():
+        # 从父进程fork继承的连接不关闭（由父进程关闭），直接丢弃
+        _open_caches.clear()
+        _owner_pid = os.getpid()
+        multiprocessing.util.Finalize(None, close_caches, exitpriority=10)
+    cache_key = (str(cache_dir), max_size_mb)
+    if cache_key not in _open_caches:
+        _open_caches[cache_key] = OcrCache(cache_dir, max_size_mb)
+    return _open_caches[cache_key]
+
+def close_caches():
+    """淘汰超出大小上限的记录并关闭当前进程中打开的所有缓存
+    
+    淘汰平时每写入 EVICT_CHECK_INTERVAL 条才检查一次，写入较少的运行在退出时检查。
+    """
+    for cache in _open_caches.values():
+        try:
+            cache.close()
+        except Exception as e:
+            print(f"关闭识别缓存时出错: {cache.cache_dir}, 错误: {e}")
+    _open_caches.clear()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import fitz  # PyMuPDF
+
+# 并行拆分时每个任务识别的页数
+SPLIT_CHUNK_PAGES = 16
+
+def page_chunks(page_count, chunk_pages=SPLIT_CHUNK_PAGES):
+    """把页面分成连续的块，返回 [(起始页, 结束页)]，不包括结束页"""
+    return [(start, min(start + chunk_pages, page_count)) for start in range(0, page_count, chunk_pages)]
+
+def group_pages(page_ids):
+    """按每页识别出的号码把页面分给各个人，返回 {号码: [(起始页, 结束页), ...]}，页码从0开始，包括结束页
+
+    识别出号码的页面开始一个新的人；没有号码的页面（如身份证背面）属于前面最近的号码，
+    第一个号码之前的页面属于第一个号码。同一号码在不相邻的位置再次出现时，
+    这些页面都归入同一个号码，字典按号码第一次出现的顺序排列。
+    """
+    pages = {}
+    leading = []
+    current = None
+    for page_num, id_number in enumerate(page_ids):
+        if id_number is not None:
+            current = id_number
+        if current is None:
+            leading.append(page_num)
+        else:
+            pages.setdefault(current, []).append(page_num)
+    if not pages:
+        return {}
+    first = next(iter(pages))
+    pages[first] = leading + pages[first]
+    return {id_number: page_ranges(page_list) for id_number, page_list in pages.items()}
+
+def page_ranges(page_list):
+    """把页码列表合并为连续的范围 [(起始页, 结束页)]，包括结束页"""
+    ranges = []
+    for page_num in page_list:
+        if ranges and ranges[-1][1] == page_num - 1:
+            ranges[-1] = (ranges[-1][0], page_num)
+        else:
+            ranges.append((page_num, page_num))
+    return ranges
+
+def format_ranges(ranges):
+    """页码范围的显示文本，页码从1开始"""
+    return ','.join(f"{start + 1}" if start == stop else f"{start + 1}-{stop + 1}" for start, stop in ranges)
+
+def write_pages(doc, ranges, target):
+    """把文档中指定范围的页面复制到新的PDF
+
+    insert_pdf 直接复制页面对象和其中的图像、字体，不重新编码。
+    """
+    out = fitz.open()
+    try:
+        for start, stop in ranges:
+            out.insert_pdf(doc, from_page=start, to_page=stop)
+        out.save(str(target), garbage=1)
+    finally:
+        out.close()
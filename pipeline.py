@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+
+# 每个阶段输入队列的默认长度上限
+PIPELINE_QUEUE_SIZE = 8
+# 运行中报告各阶段队列长度和吞吐量的间隔（秒）
+REPORT_INTERVAL = 10.0
+
+# 上游阶段已经结束
+_DONE = object()
+
+class Stage:
+    """流水线中的一个阶段
+
+    func(item) 在 executor（线程池或进程池）中执行，返回值交给下一个阶段；
+    executor 为None时使用事件循环默认的线程池。同时处理 concurrency 个元素，
+    输入队列最多容纳 queue_size 个元素，队列满时上游阶段等待，内存占用不会随文件数量增长。
+    ordered 为True时按元素进入流水线的顺序依次处理（此时 concurrency 应为1），
+    提前到达、暂存等待前面元素的元素最多 queue_size 个，超过时上游阶段等待。
+    func 抛出异常时该元素在后续阶段中为None。
+    """
+
+    def __init__(self, name, func, executor=None, concurrency=1, queue_size=PIPELINE_QUEUE_SIZE, ordered=False):
+        self.name = name
+        self.func = func
+        self.executor = executor
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.ordered = ordered
+        self.queue = None
+        # 顺序处理时下一个要处理的序号，以及它变化时通知上游的条件变量
+        self.expected = 0
+        self.reorder = None
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+class Pipeline:
+    """用 asyncio 把多个阶段连接起来，各阶段之间用有界队列传递元素
+
+    每个阶段在自己的线程池或进程池中执行，读取文件、渲染和OCR、重命名可以同时进行：
+    一个文件在OCR时，后面的文件已经在读取，前面的文件正在重命名。
+    """
+
+    def __init__(self, stages, report_interval=REPORT_INTERVAL):
+        self.stages = stages
+        self.report_interval = report_interval
+        self.started = None
+
+    def run(self, items):
+        """依次把 items 送入流水线，直到所有元素经过最后一个阶段"""
+        self.started = time.perf_counter()
+        asyncio.run(self._run(items))
+        self.report(final=True)
+
+    async def _run(self, items):
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(stage.queue_size)
+            stage.expected = 0
+            stage.reorder = asyncio.Condition()
+        tasks = [asyncio.create_task(self._feed(items))]
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            tasks.append(asyncio.create_task(self._run_stage(stage, next_stage)))
+        reporter = asyncio.create_task(self._report_periodically()) if self.report_interval else None
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+
+    async def _put(self, stage, entry):
+        if stage.ordered:
+            # 限制顺序处理阶段的重排窗口：序号超前太多的元素等前面的元素处理后再送入，
+            # 否则一个很慢的元素会让后面所有的元素都堆积在暂存区中。
+            # 正好是下一个序号的元素不会等待，因此不会死锁
+            async with stage.reorder:
+                await stage.reorder.wait_for(lambda: entry[0] - stage.expected < stage.queue_size)
+        await stage.queue.put(entry)
+        stage.max_depth = max(stage.max_depth, stage.queue.qsize())
+
+    async def _finish(self, stage):
+        for _ in range(stage.concurrency):
+            await stage.queue.put(_DONE)
+
+    async def _feed(self, items):
+        """在线程中逐个取出元素（遍历目录可能阻塞），送入第一个阶段"""
+        loop = asyncio.get_running_loop()
+        first = self.stages[0]
+        iterator = iter(items)
+        sequence = 0
+        while True:
+            item = await loop.run_in_executor(None, next, iterator, _DONE)
+            if item is _DONE:
+                break
+            await self._put(first, (sequence, item))
+            sequence += 1
+        await self._finish(first)
+
+    async def _run_stage(self, stage, next_stage):
+        if stage.ordered:
+            workers = [self._ordered_worker(stage, next_stage)]
+        else:
+            workers = [self._worker(stage, next_stage) for _ in range(stage.concurrency)]
+        await asyncio.gather(*workers)
+        if next_stage is not None:
+            await self._finish(next_stage)
+
+    async def _process(self, stage, item):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            if item is None:
+                return None
+            return await loop.run_in_executor(stage.executor, stage.func, item)
+        except Exception as e:
+            print(f"流水线阶段 {stage.name} 出错: {e}")
+            return None
+        finally:
+            stage.processed += 1
+            stage.busy_seconds += time.perf_counter() - start
+
+    async def _worker(self, stage, next_stage):
+        while True:
+            entry = await stage.queue.get()
+            if entry is _DONE:
+                return
+            sequence, item = entry
+            result = await self._process(stage, item)
+            if next_stage is not None:
+                await self._put(next_stage, (sequence, result))
+
+    async def _ordered_worker(self, stage, next_stage):
+        """按进入流水线的顺序处理：先到的后面的元素暂存，等前面的元素到达"""
+        waiting = {}
+        remaining = stage.concurrency
+        while remaining:
+            entry = await stage.queue.get()
+            if entry is _DONE:
+                remaining -= 1
+                continue
+            sequence, item = entry
+            waiting[sequence] = item
+            while stage.expected in waiting:
+                result = await self._process(stage, waiting.pop(stage.expected))
+                if next_stage is not None:
+                    await self._put(next_stage, (stage.expected, result))
+                async with stage.reorder:
+                    stage.expected += 1
+                    stage.reorder.notify_all()
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    def report(self, final=False):
+        """打印各阶段的队列长度和吞吐量"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        if final:
+            print(f"流水线统计（共{elapsed:.1f}秒）:")
+            for stage in self.stages:
+                average = stage.busy_seconds / stage.processed if stage.processed else 0.0
+                print(f"  {stage.name}: 处理{stage.processed}个，{stage.processed / elapsed:.2f}个/秒，"
+                      f"平均{average:.3f}秒/个，并发{stage.concurrency}，队列最长{stage.max_depth}/{stage.queue_size}")
+            return
+        parts = [f"{stage.name} 队列{stage.depth()}/{stage.queue_size} {stage.processed / elapsed:.2f}个/秒"
+                 for stage in self.stages]
+        print("流水线: " + " | ".join(parts))
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from ocr_cache import file_sha256
+
+# 日志中记录的处理状态
+STATUS_RENAMED = 'renamed'
+STATUS_ALREADY_NAMED = 'already_named'
+STATUS_NO_ID = 'no_id'
+STATUS_TARGET_EXISTS = 'target_exists'
+STATUS_RENAME_FAILED = 'rename_failed'
+STATUS_UNDONE = 'undone'
+
+# 断点续传时视为已完成、不再重新处理的状态
+COMPLETED_STATUSES = {STATUS_RENAMED, STATUS_ALREADY_NAMED, STATUS_NO_ID}
+
+class RenameJournal:
+    """追加写入的重命名日志（JSON lines）
+
+    每处理完一个文件写入一行，记录源文件、内容哈希、识别出的号码、目标文件和状态，
+    路径一律记录为绝对路径。
+    每行写入后立即刷新到磁盘，程序中途崩溃时最多丢失正在写入的一行。
+    写入由锁保护，可以在多个线程中共用；进程池模式下只有主进程写入日志。
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = Path(journal_path)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def record(self, source, content_hash, id_number, target, status):
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'source': os.path.abspath(source),
+            'hash': content_hash,
+            'id_number': id_number,
+            'target': os.path.abspath(target) if target else None,
+            'status': status,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def read_journal(journal_path):
+    """读取日志中的所有记录，忽略崩溃时没有写完的行"""
+    entries = []
+    with open(journal_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+def journal_key(content_hash, file_path):
+    """断点续传时用于匹配文件的键：内容哈希加绝对路径"""
+    return content_hash, os.path.abspath(file_path)
+
+def completed_files(journal_path):
+    """日志中已经处理完成的文件，返回 {(内容哈希, 绝对路径)}
+
+    重命名成功的文件按目标路径记录，其余按源路径记录；每个文件以最后一条记录为准。
+    已经撤销的重命名不再算作完成：撤销后目标路径上已经没有该文件，原文件需要重新处理。
+    只按路径或只按哈希匹配都不可靠：前者无法发现内容已被替换的文件，
+    后者会把同一文件的另一份副本当作已完成。
+    """
+    latest = {}
+    for entry in read_journal(journal_path):
+        if not entry.get('hash'):
+            continue
+        if entry['status'] in (STATUS_RENAMED, STATUS_ALREADY_NAMED):
+            path = entry['target']
+        else:
+            path = entry['source']
+        latest[journal_key(entry['hash'], path)] = entry['status']
+        if entry['status'] == STATUS_UNDONE and entry.get('target'):
+            latest.pop(journal_key(entry['hash'], entry['target']), None)
+    return {key for key, status in latest.items() if status in COMPLETED_STATUSES}
+
+def undo_journal(journal_path):
+    """按相反顺序撤销日志中的重命名，返回 (成功数, 失败数)
+
+    只有目标文件仍然存在、内容哈希与记录一致并且源文件名没有被占用时才会撤销。
+    撤销结果追加写入同一个日志，重复执行不会重复撤销。
+    """
+    # 按目标文件找出仍然有效（没有被撤销过）的重命名记录，保持原来的顺序
+    active = {}
+    for entry in read_journal(journal_path):
+        if entry['status'] == STATUS_RENAMED:
+            active.pop(entry['target'], None)
+            active[entry['target']] = entry
+        elif entry['status'] == STATUS_UNDONE:
+            active.pop(entry['target'], None)
+    renamed = list(active.values())
+
+    success_count = 0
+    fail_count = 0
+    journal = RenameJournal(journal_path)
+    try:
+        for entry in reversed(renamed):
+            source, target = Path(entry['source']), Path(entry['target'])
+            if not target.exists():
+                print(f"目标文件不存在，无法撤销: {target}")
+                fail_count += 1
+                continue
+            if source.exists():
+                print(f"原文件名已被占用，无法撤销: {source}")
+                fail_count += 1
+                continue
+            if entry.get('hash') and file_sha256(target) != entry['hash']:
+                print(f"文件内容已改变，无法撤销: {target}")
+                fail_count += 1
+                continue
+            try:
+                target.rename(source)
+            except Exception as e:
+                print(f"撤销失败: {target}, 错误: {e}")
+                fail_count += 1
+                continue
+            print(f"撤销成功: {target} -> {source}")
+            journal.record(source, entry.get('hash'), entry.get('id_number'), target, STATUS_UNDONE)
+            success_count += 1
+    finally:
+        journal.close()
+    return success_count, fail_count
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import errno
+import json
+import os
+import re
+from pathlib import Path
+
+from rename_journal import STATUS_ALREADY_NAMED, STATUS_RENAME_FAILED, STATUS_RENAMED, STATUS_TARGET_EXISTS
+
+# 计划中等待执行的重命名
+STATUS_PLANNED = 'planned'
+
+# 目标文件名冲突时的处理方式：跳过、添加 _1/_2 后缀、移入以号码命名的子目录
+CONFLICT_SKIP = 'skip'
+CONFLICT_SUFFIX = 'suffix'
+CONFLICT_SUBDIR = 'subdir'
+CONFLICT_STRATEGIES = [CONFLICT_SKIP, CONFLICT_SUFFIX, CONFLICT_SUBDIR]
+
+PLAN_FIELDS = ['source', 'hash', 'id_number', 'target', 'status']
+
+class TargetResolver:
+    """在内存中为重命名选择不冲突的目标文件名
+
+    每个目录只列出一次文件名，之后已被占用和已分配的文件名都在内存中记录，
+    不需要为每个文件单独检查目标是否存在。原文件名在重命名后仍视为被占用，
+    因此按计划顺序执行重命名时不会覆盖还没有处理的文件。
+    列出文件名之后才出现的同名文件由 move_no_replace 在重命名时发现。
+    """
+
+    def __init__(self, on_conflict=CONFLICT_SKIP):
+        self.on_conflict = on_conflict
+        self.listings = {}
+
+    def _names(self, directory):
+        if directory not in self.listings:
+            try:
+                self.listings[directory] = {os.path.normcase(name) for name in os.listdir(directory)}
+            except FileNotFoundError:
+                self.listings[directory] = set()
+        return self.listings[directory]
+
+    def is_free(self, path):
+        return os.path.normcase(path.name) not in self._names(path.parent)
+
+    def claim(self, path):
+        self._names(path.parent).add(os.path.normcase(path.name))
+
+    def resolve(self, file_path, id_number):
+        """返回 (状态, 目标路径)，状态为 STATUS_PLANNED、STATUS_ALREADY_NAMED 或 STATUS_TARGET_EXISTS"""
+        directory = file_path.parent
+        suffix = file_path.suffix
+        target = directory / f"{id_number}{suffix}"
+
+        # 已经按号码命名，包括之前按冲突策略生成的 号码_N 和 号码/ 子目录中的文件
+        if re.fullmatch(rf'{id_number}(?:_\d+)?', file_path.stem, re.IGNORECASE) or directory.name == id_number:
+            return STATUS_ALREADY_NAMED, file_path
+
+        if self.is_free(target):
+            self.claim(target)
+            return STATUS_PLANNED, target
+
+        if self.on_conflict == CONFLICT_SUFFIX:
+            candidate = target
+            number = 1
+            while not self.is_free(candidate):
+                candidate = directory / f"{id_number}_{number}{suffix}"
+                number += 1
+        elif self.on_conflict == CONFLICT_SUBDIR:
+            sub_dir = directory / id_number
+            candidate = sub_dir / file_path.name
+            number = 1
+            while not self.is_free(candidate):
+                candidate = sub_dir / f"{file_path.stem}_{number}{suffix}"
+                number += 1
+        else:
+            return STATUS_TARGET_EXISTS, target
+
+        self.claim(candidate)
+        return STATUS_PLANNED, candidate
+
+def move_no_replace(source, target):
+    """把 source 重命名为 target，target 已存在时抛出 FileExistsError，不会覆盖
+    
+    POSIX上 rename 会直接替换已存在的目标文件，因此先创建硬链接（目标存在时失败）再删除原文件名。
+    文件系统不支持硬链接时（FAT、部分网络共享），改为在重命名前再检查一次目标是否存在。
+    """
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except (OSError, AttributeError, NotImplementedError):
+        if os.path.lexists(target):
+            raise FileExistsError(errno.EEXIST, "目标文件已存在", str(target))
+        os.rename(source, target)
+        return
+    try:
+        os.unlink(source)
+    except OSError:
+        # 无法删除原文件名时撤回硬链接，保持原状
+        os.unlink(target)
+        raise
+
+def plan_entry(file_path, content_hash, id_number, status, target):
+    """重命名计划中的一个条目，路径记录为绝对路径，计划可以在其他工作目录下执行"""
+    return {
+        'source': os.path.abspath(file_path),
+        'hash': content_hash,
+        'id_number': id_number,
+        'target': os.path.abspath(target) if target else None,
+        'status': status,
+    }
+
+def write_plan(plan_path, entries):
+    """写入重命名计划，扩展名为 .csv 时写CSV，否则写JSON"""
+    plan_path = Path(plan_path)
+    if plan_path.suffix.lower() == '.csv':
+        with open(plan_path, 'w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=PLAN_FIELDS)
+            writer.writeheader()
+            writer.writerows(entries)
+    else:
+        with open(plan_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file, ensure_ascii=False, indent=2)
+
+def read_plan(plan_path):
+    plan_path = Path(plan_path)
+    if plan_path.suffix.lower() == '.csv':
+        with open(plan_path, 'r', encoding='utf-8-sig', newline='') as file:
+            return [{key: value or None for key, value in row.items()} for row in csv.DictReader(file)]
+    with open(plan_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def print_entry(entry):
+    if entry['status'] == STATUS_PLANNED:
+        print(f"计划重命名: {entry['source']} -> {entry['target']}")
+    elif entry['status'] == STATUS_ALREADY_NAMED:
+        print(f"文件已经以身份证号码命名: {entry['source']}")
+    elif entry['status'] == STATUS_TARGET_EXISTS:
+        print(f"目标文件已存在，跳过: {entry['source']} -> {entry['target']}")
+    else:
+        print(f"未找到身份证号码: {entry['source']}")
+
+def apply_plan(entries, on_applied=None):
+    """批量执行计划中的重命名，返回 (成功数, 失败数)
+
+    每个目标目录只列出一次文件名，用来确认计划生成之后目标文件没有被占用；
+    列出之后才出现的同名文件不会被覆盖，见 move_no_replace。
+    on_applied(计划条目, 状态) 在每个条目执行后调用，用于写入处理日志。
+    """
+    listings = {}
+    success_count = 0
+    fail_count = 0
+    for entry in entries:
+        if entry['status'] != STATUS_PLANNED:
+            continue
+        source, target = Path(entry['source']), Path(entry['target'])
+        directory = target.parent
+        if directory not in listings:
+            try:
+                listings[directory] = {os.path.normcase(name) for name in os.listdir(directory)}
+            except FileNotFoundError:
+                directory.mkdir(parents=True, exist_ok=True)
+                listings[directory] = set()
+
+        name = os.path.normcase(target.name)
+        if name in listings[directory]:
+            print(f"目标文件已存在，无法重命名: {target}")
+            status = STATUS_TARGET_EXISTS
+        else:
+            try:
+                move_no_replace(source, target)
+                listings[directory].add(name)
+                print(f"重命名成功: {source} -> {target}")
+                status = STATUS_RENAMED
+            except FileExistsError:
+                listings[directory].add(name)
+                print(f"目标文件已存在，无法重命名: {target}")
+                status = STATUS_TARGET_EXISTS
+            except Exception as e:
+                print(f"重命名失败: {source}, 错误: {e}")
+                status = STATUS_RENAME_FAILED
+
+        if status == STATUS_RENAMED:
+            success_count += 1
+        else:
+            fail_count += 1
+        if on_applied is not None:
+            on_applied(entry, status)
+    return success_count, fail_count
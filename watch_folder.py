@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from pathlib import Path
+
+from file_walker import iter_files, matches_any
+
+# 文件大小和修改时间保持不变多少秒后，认为文件已经写入完成
+SETTLE_SECONDS = 2.0
+# 轮询模式下两次扫描目录的间隔（秒）
+POLL_INTERVAL = 5.0
+# 主循环每次等待事件的最长时间（秒）
+TICK_SECONDS = 0.5
+
+# inotify 常量，见 <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """通过ctypes调用Linux inotify，监视目录中写入完成或移入的文件"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.watches = {}
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"无法监视目录: {directory}")
+        self.watches[wd] = Path(directory)
+
+    def read_events(self, timeout):
+        """等待事件，返回 [(路径, 事件掩码)]；队列溢出时返回 [(None, IN_Q_OVERFLOW)]"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, IN_Q_OVERFLOW))
+            elif wd in self.watches and name:
+                events.append((self.watches[wd] / os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class FolderWatcher:
+    """持续监视目录，处理新写入或移入的PDF和图像文件
+
+    Linux上使用inotify，其他系统或inotify不可用时定期扫描目录。文件的大小和修改时间
+    在 settle_seconds 内保持不变才会被处理，避免处理尚未写完的文件。
+    所有文件在同一个进程中依次处理，OCR引擎在整个运行期间只加载一次。
+    process(文件路径) 返回True/False表示成功/失败，返回None表示跳过该文件。
+    收到SIGTERM或SIGINT后，处理完当前文件即退出。
+    """
+
+    def __init__(self, directory, suffixes, process, recursive=False, include=None, exclude=None,
+                 settle_seconds=SETTLE_SECONDS, poll_interval=POLL_INTERVAL, force_poll=False):
+        self.directory = Path(directory)
+        self.suffixes = suffixes
+        self.process = process
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.force_poll = force_poll
+        self.stopped = False
+        self.inotify = None
+        # 等待写入完成的文件: 路径 -> (大小, 修改时间, 最后一次变化的时间)
+        self.pending = {}
+        # 轮询模式下已经见过的文件: 路径 -> (大小, 修改时间)
+        self.seen = {}
+        self.success_count = 0
+        self.fail_count = 0
+
+    def stop(self, *args):
+        if not self.stopped:
+            print("收到停止信号，处理完当前文件后退出")
+        self.stopped = True
+
+    def scan(self):
+        """扫描目录，把新出现或有变化的文件加入等待队列"""
+        seen = {}
+        for file_path in iter_files(self.directory, self.suffixes, self.recursive, self.include, self.exclude):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            seen[file_path] = (stat.st_size, stat.st_mtime)
+            if self.seen.get(file_path) != seen[file_path]:
+                self.add_pending(file_path)
+        # 只保留目前仍然存在的文件，已经被重命名或删除的文件不再记录
+        self.seen = seen
+
+    def rel_path(self, path):
+        """相对于监视目录的路径（使用/分隔），与 iter_files 中匹配 include/exclude 的路径相同"""
+        return Path(path).relative_to(self.directory).as_posix()
+
+    def excluded(self, rel_path):
+        """路径本身或它所在的某一级子目录是否匹配 exclude"""
+        if not self.exclude:
+            return False
+        parts = rel_path.split('/')
+        return any(matches_any('/'.join(parts[:i + 1]), part, self.exclude) for i, part in enumerate(parts))
+
+    def add_pending(self, file_path):
+        if file_path.suffix.lower() not in self.suffixes or file_path in self.pending:
+            return
+        try:
+            rel_path = self.rel_path(file_path)
+        except ValueError:
+            return
+        if self.include and not matches_any(rel_path, file_path.name, self.include):
+            return
+        if self.excluded(rel_path):
+            return
+        self.pending[file_path] = (None, None, time.monotonic())
+
+    def watch_tree(self, directory=None):
+        """为目录（递归时包括所有子目录）添加inotify监视，跳过匹配 exclude 的子目录
+
+        返回添加了监视的目录列表。
+        """
+        directory = self.directory if directory is None else Path(directory)
+        self.inotify.add_watch(directory)
+        watched = [directory]
+        if self.recursive:
+            for root, dirs, _ in os.walk(directory):
+                # 原地修改 dirs，os.walk 不会进入被排除的子目录
+                dirs[:] = sorted(name for name in dirs if not self.excluded(self.rel_path(Path(root) / name)))
+                for name in dirs:
+                    try:
+                        self.inotify.add_watch(Path(root) / name)
+                    except OSError as e:
+                        print(f"无法监视目录: {Path(root) / name}, 错误: {e}")
+                        continue
+                    watched.append(Path(root) / name)
+        return watched
+
+    def handle_events(self, events):
+        for path, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                print("inotify事件队列溢出，重新扫描目录")
+                self.scan()
+            elif mask & IN_ISDIR:
+                # 新建或移入的子目录（不包括被排除的目录）：添加监视，并处理其中已有的文件
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not self.excluded(self.rel_path(path)):
+                    try:
+                        watched = self.watch_tree(path)
+                    except OSError as e:
+                        print(f"无法监视目录: {path}, 错误: {e}")
+                        continue
+                    for directory in watched:
+                        for file_path in iter_files(directory, self.suffixes):
+                            self.add_pending(file_path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.add_pending(path)
+
+    def ready_files(self):
+        """返回大小和修改时间已经稳定的文件"""
+        now = time.monotonic()
+        ready = []
+        for file_path, (size, mtime, changed) in list(self.pending.items()):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                # 文件已被删除或移走
+                del self.pending[file_path]
+                continue
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                self.pending[file_path] = (stat.st_size, stat.st_mtime, now)
+            elif now - changed >= self.settle_seconds:
+                del self.pending[file_path]
+                ready.append(file_path)
+        return sorted(ready)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if not self.force_poll and sys.platform.startswith('linux'):
+            try:
+                self.inotify = InotifyWatcher()
+                self.watch_tree()
+                print(f"正在监视目录(inotify): {self.directory}")
+            except Exception as e:
+                print(f"无法使用inotify，改为定期扫描: {e}")
+                if self.inotify is not None:
+                    self.inotify.close()
+                self.inotify = None
+        if self.inotify is None:
+            print(f"正在监视目录(每{self.poll_interval}秒扫描一次): {self.directory}")
+
+        # 先处理目录中已有的文件
+        self.scan()
+        last_scan = time.monotonic()
+
+        try:
+            while not self.stopped:
+                if self.inotify is not None:
+                    self.handle_events(self.inotify.read_events(TICK_SECONDS))
+                else:
+                    time.sleep(TICK_SECONDS)
+                    if time.monotonic() - last_scan >= self.poll_interval:
+                        self.scan()
+                        last_scan = time.monotonic()
+
+                for file_path in self.ready_files():
+                    if self.stopped:
+                        break
+                    result = self.process(file_path)
+                    if result is None:
+                        continue
+                    if result:
+                        self.success_count += 1
+                    else:
+                        self.fail_count += 1
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+
+        print(f"监视已停止，成功: {self.success_count}，失败: {self.fail_count}")